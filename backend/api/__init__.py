@@ -1,22 +1,32 @@
 # backend/api/__init__.py
 from flask import Flask
+import click
 from flask_restx import Api
 from .auth.views import auth_namespace
 from .friendships.views import friendships_namespace
 from .games.views import games_namespace
+from .leaderboard.views import leaderboard_namespace
 from .matchmaking.views import matchmaking_namespace
 from .users.views import users_namespace
 from .config.config import config_dict
 from .utils import db, socketio
+from .utils.clockScheduler import clock_scheduler
+from .utils.matchmakingScheduler import matchmaking_scheduler
+from .utils.presence import presence
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from .challenges.views import challenge_namespace
+from .commands.games import games_cli
+from .commands.matchmaking import matchmaking_cli
+from .commands.ratings import ratings_cli
+from .commands.users import users_cli
 from flask_cors import CORS
 
 
 def create_app(config = config_dict['dev']):
     app = Flask(__name__)
-    CORS(app)
+    # let browsers read the pagination headers
+    CORS(app, expose_headers=['X-Next-Cursor', 'X-Total-Count', 'X-Total-Count-Approximate'])
     app.config.from_object(config)
 
     api = Api(app)
@@ -27,13 +37,22 @@ def create_app(config = config_dict['dev']):
     api.add_namespace(matchmaking_namespace)
     api.add_namespace(users_namespace)
     api.add_namespace(challenge_namespace)
+    api.add_namespace(leaderboard_namespace)
 
     db.init_app(app)
-    socketio.init_app(app)
+    socketio.init_app(app, message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+    clock_scheduler.init_app(app)
+    matchmaking_scheduler.init_app(app)
+    presence.init_app(app)
 
     jwt = JWTManager(app)
     migrate = Migrate(app, db)
 
+    app.cli.add_command(games_cli)
+    app.cli.add_command(matchmaking_cli)
+    app.cli.add_command(ratings_cli)
+    app.cli.add_command(users_cli)
+
     @app.shell_context_processor
     def make_shell_context():
         return{
@@ -41,3 +60,18 @@ def create_app(config = config_dict['dev']):
         }
 
     return app
+
+
+def start_background_tasks(app):
+    """Start the loops that must run next to the socket server.
+
+    Call it from the serving process only (see runserver.py), never from
+    create_app: `flask <command>` runs would otherwise end games and race
+    the server on the same rows. Does nothing inside a `flask` CLI command.
+    """
+    if click.get_current_context(silent=True) is not None:
+        return
+    if app.config.get('CLOCK_SCHEDULER_ENABLED', True):
+        clock_scheduler.start()
+    if app.config.get('MATCHMAKING_SCHEDULER_ENABLED', True):
+        matchmaking_scheduler.start()
@@ -3,11 +3,15 @@ from flask_restx import Resource, Namespace, fields
 from http import HTTPStatus
 from ..models.users import User
 from ..models.elo import EloEntry
+from ..models.ratings import DailyRating
+from ..utils.leaderboard import leaderboard
+from ..utils.userSearch import user_search
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.exceptions import Conflict, BadRequest
 from flask import request
 from sqlalchemy.exc import IntegrityError
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -60,9 +64,14 @@ class SignUp(Resource):
             new_user.save()
 
             new_elo_entry = EloEntry(
-                user_id=new_user.id
+                user_id=new_user.id,
+                elo=new_user.elo,
+                created_at=datetime.utcnow()
             )
+            DailyRating.record(new_user.id, new_elo_entry.elo, new_elo_entry.created_at)
             new_elo_entry.save()
+            leaderboard.update(new_user.id, new_user.elo)
+            user_search.invalidate(new_user.username)
             return new_user, HTTPStatus.CREATED
         except IntegrityError as ie:
             logger.exception('IntegrityError during signup')
@@ -11,6 +11,8 @@ from ..models.challenges import Challenge
 from ..models.friendships import Friendship, FriendshipStatus
 from ..models.games import Game
 from ..utils import db, socketio
+from ..utils.clockScheduler import clock_scheduler
+from ..utils.presence import presence
 
 challenge_namespace = Namespace('challenges', description='Challenge related operations')
 
@@ -55,8 +57,15 @@ class CreateDeleteChallenge(Resource):
 
         if not friendship_status or friendship_status.status != FriendshipStatus.ACCEPTED:
             return {'message': 'You are not friends with this user'}, HTTPStatus.BAD_REQUEST
-        
-        #check if friend or you is in another game
+
+        # presence only knows sockets and games of this process, so it is
+        # trusted only when there are no other workers
+        if presence.authoritative and not presence.is_online(friend_id):
+            return {'message': 'Your friend is offline'}, HTTPStatus.BAD_REQUEST
+        if presence.authoritative and (presence.game_of(friend_id) is not None or presence.game_of(user_id) is not None):
+            return {'message': 'You or friend is already in an ongoing game'}, HTTPStatus.BAD_REQUEST
+
+        #check if friend or you is in another game (games started before this process, or on other workers)
         ongoing_game = Game.query.filter(
             ((Game.white_user_id == friend_id) | (Game.black_user_id == friend_id) | (Game.white_user_id == user_id) | (Game.black_user_id == user_id)) &
             (Game.in_progress == True)
@@ -153,7 +162,9 @@ class RespondChallenge(Resource):
             return {'message': 'You or challenger is already in an ongoing game'}, HTTPStatus.BAD_REQUEST
 
         if response == 'accept':
-            # Logic to create a game can be added here
+            if presence.authoritative and not presence.is_online(challenge.user1_id):
+                challenge.delete()
+                return {'message': 'Challenger is no longer online'}, HTTPStatus.BAD_REQUEST
 
 
             white_id = challenge.user1_id
@@ -170,6 +181,8 @@ class RespondChallenge(Resource):
             )
 
             new_game.save()
+            clock_scheduler.schedule_game(new_game)
+            presence.game_started(new_game.id, (new_game.white_user_id, new_game.black_user_id))
 
             socketio.emit('start_challenge', {
                 'game_id': new_game.id
@@ -0,0 +1 @@
+# backend/api/commands/__init__.py
@@ -0,0 +1,149 @@
+# backend/api/commands/games.py
+from flask.cli import AppGroup
+from sqlalchemy import update, delete
+import click
+import logging
+
+from ..models.games import Game
+from ..models.moves import Move
+from ..utils import db
+from ..utils.gameSummaries import rebuild_summaries
+from ..utils.moveCodec import encode_moves, pack_varint
+from ..utils.pgnImport import PgnImporter
+from ..utils.ratingHistory import rebuild_daily_ratings, sync_current_ratings
+from ..utils.userStats import rebuild_head_to_head, rebuild_user_stats
+
+logger = logging.getLogger(__name__)
+
+games_cli = AppGroup('games', help='Game maintenance commands.')
+
+
+@games_cli.command('pack-moves')
+@click.option('--batch-size', default=500, show_default=True, help='Games converted per transaction.')
+@click.option('--delete-rows', is_flag=True, help='Delete the moves rows of games once they are packed.')
+def pack_moves(batch_size, delete_rows):
+    """Move legacy per-ply moves rows into the packed Game.move_data blob.
+
+    Safe to interrupt and re-run: each batch commits on its own and only games
+    whose move_data is still NULL are picked up.
+    """
+    packed = 0
+    last_id = 0
+    while True:
+        game_ids = [gid for (gid,) in db.session.query(Game.id).filter(
+            (Game.move_data == None) & (Game.id > last_id)
+        ).order_by(Game.id).limit(batch_size)]
+        if not game_ids:
+            break
+        last_id = game_ids[-1]
+
+        ucis_by_game = {gid: [] for gid in game_ids}
+        rows = db.session.query(Move.game_id, Move.uci).filter(
+            Move.game_id.in_(game_ids)
+        ).order_by(Move.game_id, Move.move_number)
+        for game_id, uci in rows:
+            ucis_by_game[game_id].append(uci)
+
+        params = []
+        for gid, ucis in ucis_by_game.items():
+            try:
+                move_data = encode_moves(ucis)
+            except ValueError:
+                logger.warning('Skipping game %s: invalid UCI in moves rows', gid)
+                continue
+            params.append({
+                'id': gid,
+                'move_data': move_data,
+                # per-move clock usage was never recorded for these games
+                'clock_data': pack_varint(0) * len(ucis),
+                'ply_count': len(ucis),
+            })
+
+        if params:
+            db.session.execute(update(Game), params)
+            if delete_rows:
+                db.session.execute(delete(Move).where(Move.game_id.in_([p['id'] for p in params])))
+        db.session.commit()
+
+        packed += len(params)
+        click.echo(f'packed {packed} games (last id {last_id})')
+
+    click.echo(f'done: {packed} games packed')
+
+
+@games_cli.command('import-pgn')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Games inserted per transaction.')
+@click.option('--create-missing/--skip-missing', default=True, show_default=True,
+              help='Create accounts for players that have no user yet, or skip their games.')
+@click.option('--default-elo', default=1200, show_default=True, help='Starting rating for created accounts.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of a previous run and start from the top.')
+def import_pgn(path, batch_size, create_missing, default_elo, restart):
+    """Bulk-load finished games from a PGN file.
+
+    Progress is checkpointed next to the file after every batch; re-running
+    the same command after an interruption resumes from the last batch.
+    Games from a set-up position (FEN/SetUp tags) or of another variant are
+    skipped, since stored moves are always replayed from the standard start.
+    """
+    importer = PgnImporter(path, batch_size=batch_size, create_missing=create_missing,
+                           default_elo=default_elo, progress=click.echo)
+    if restart:
+        importer.reset()
+    imported, skipped = importer.run()
+    click.echo(f'done: {imported} games imported, {skipped} skipped')
+
+    # imported games carry historical Elo entries that users.elo and the
+    # rollups have not seen
+    click.echo('syncing current ratings')
+    changed, _ = sync_current_ratings(progress=click.echo)
+    click.echo(f'{changed} ratings changed')
+    click.echo('rebuilding daily rating rollups')
+    rebuild_daily_ratings(progress=click.echo)
+    click.echo('writing game summaries')
+    rebuild_summaries(progress=click.echo)
+    click.echo('rebuilding player stats')
+    rebuild_user_stats(progress=click.echo)
+    rebuild_head_to_head(progress=click.echo)
+
+
+@games_cli.command('build-summaries')
+@click.option('--all', 'rebuild_all', is_flag=True, help='Rewrite every summary, not only missing ones.')
+@click.option('--batch-size', default=1000, show_default=True, help='Games written per transaction.')
+def build_summaries(rebuild_all, batch_size):
+    """Write the history summary of finished games that have none.
+
+    Games finished after upgrading get theirs when they end; run this once
+    for older games. Until then they are summarized on first read.
+    """
+    written = rebuild_summaries(only_missing=not rebuild_all, batch_size=batch_size, progress=click.echo)
+    click.echo(f'done: {written} game summaries written')
+
+
+@games_cli.command('index-pairs')
+@click.option('--batch-size', default=5000, show_default=True, help='Games updated per transaction.')
+def index_pairs(batch_size):
+    """Fill games.pair_low_id/pair_high_id, the head-to-head index columns.
+
+    Needed once after adding the columns to an existing table; new games get
+    them on insert.
+    """
+    written = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Game.id, Game.white_user_id, Game.black_user_id).filter(
+            (Game.id > last_id) & (Game.pair_low_id == None)
+        ).order_by(Game.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        db.session.execute(update(Game), [
+            {'id': gid, 'pair_low_id': min(white, black), 'pair_high_id': max(white, black)}
+            for gid, white, black in rows
+        ])
+        db.session.commit()
+        written += len(rows)
+        click.echo(f'indexed {written} games (last id {last_id})')
+
+    click.echo(f'done: {written} games indexed')
@@ -0,0 +1,92 @@
+# backend/api/commands/matchmaking.py
+from flask import current_app
+from flask.cli import AppGroup
+import click
+import json
+
+from ..utils.matchmakingScheduler import MATCHMAKING_BACKENDS, matchmaking_scheduler
+from ..utils.matchmakingSimulator import PERCENTILES, RATING_DISTRIBUTIONS, MatchmakingSimulation
+from ..utils.timeControls import DEFAULT_TIME_CONTROL, TIME_CONTROLS
+
+matchmaking_cli = AppGroup('matchmaking', help='Matchmaking tools.')
+
+
+def _parse_mix(values):
+    """['3+2=2', '10+0'] -> {'3+2': 2.0, '10+0': 1.0}"""
+    mix = {}
+    for value in values:
+        key, _, weight = value.partition('=')
+        if key not in TIME_CONTROLS:
+            raise click.BadParameter(f"unknown time control {key!r} (choose from {', '.join(TIME_CONTROLS)})")
+        try:
+            mix[key] = float(weight) if weight else 1.0
+        except ValueError:
+            raise click.BadParameter(f'weight of {key} must be a number')
+    return mix or {DEFAULT_TIME_CONTROL: 1.0}
+
+
+def _format(summary, unit='s', scale=1.0, digits=1):
+    if not summary['count']:
+        return 'n/a'
+    parts = [f"p{pct} {summary[f'p{pct}'] * scale:.{digits}f}{unit}" for pct in PERCENTILES]
+    parts.append(f"max {summary['max'] * scale:.{digits}f}{unit}")
+    return ', '.join(parts)
+
+
+@matchmaking_cli.command('simulate')
+@click.option('--players', default=1000, show_default=True, help='Synthetic players that join the queue once each.')
+@click.option('--rate', 'arrival_rate', default=50.0, show_default=True, help='Mean arrivals per second (Poisson).')
+@click.option('--ratings', 'rating_distribution', type=click.Choice(RATING_DISTRIBUTIONS), default='normal', show_default=True)
+@click.option('--rating-mean', default=1500, show_default=True)
+@click.option('--rating-spread', default=200, show_default=True, help='Standard deviation (normal) or half width (uniform).')
+@click.option('--time-control', 'time_controls', multiple=True,
+              help="Pool and relative share of arrivals, e.g. --time-control 3+2=2 --time-control 10+0 (repeatable).")
+@click.option('--backend', type=click.Choice(MATCHMAKING_BACKENDS), default=None,
+              help='Queue backend to measure; defaults to MATCHMAKING_BACKEND.')
+@click.option('--drain', 'drain_seconds', default=60.0, show_default=True,
+              help='Seconds to keep pairing after the last arrival.')
+@click.option('--seed', type=int, default=None, help='Random seed, for repeatable runs.')
+@click.option('--keep', is_flag=True, help='Keep the synthetic users and games afterwards.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+def simulate(players, arrival_rate, rating_distribution, rating_mean, rating_spread, time_controls,
+             backend, drain_seconds, seed, keep, as_json):
+    """Load-test matchmaking with synthetic players and report latencies.
+
+    Use a scratch database, and start the app with
+    MATCHMAKING_SCHEDULER_ENABLED=false so that only this command pairs.
+    """
+    if matchmaking_scheduler._started:
+        raise click.ClickException('The matchmaking scheduler is running in this process; '
+                                   'set MATCHMAKING_SCHEDULER_ENABLED=false for the simulation.')
+    try:
+        simulation = MatchmakingSimulation(
+            current_app._get_current_object(), players=players, arrival_rate=arrival_rate,
+            rating_distribution=rating_distribution, rating_mean=rating_mean, rating_spread=rating_spread,
+            time_controls=_parse_mix(time_controls), backend=backend, drain_seconds=drain_seconds,
+            seed=seed, progress=click.echo,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    simulation.setup()
+    try:
+        simulation.run()
+    finally:
+        if not keep:
+            simulation.cleanup()
+    report = simulation.report()
+
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    click.echo(f"{report['players']:,} players in {report['elapsed_seconds']:.1f}s "
+               f"({report['joins_per_second']:.1f} joins/s sustained of {report['offered_joins_per_second']:.1f}/s offered, "
+               f"{report['join_errors']} join errors)")
+    click.echo(f"games: {report['games']:,} ({report['pairs_per_second']:.1f} pairs/s), unpaired: {report['unpaired']}")
+    click.echo(f"join latency: {_format(report['join_latency_seconds'], 'ms', 1000)}")
+    click.echo(f"pairing wait: {_format(report['pairing_wait_seconds'])}")
+    for key, summary in report['pairing_wait_seconds_by_time_control'].items():
+        click.echo(f"  {key}: {_format(summary)}")
+    click.echo(f"pairing pass: {_format(report['pass_seconds'], 'ms', 1000)}")
+    click.echo(f"lock wait: {report['lock_wait_seconds'] * 1000:.1f}ms total")
+    click.echo(f"rating gap: {_format(report['rating_gap'], '', 1, 0)}")
@@ -0,0 +1,82 @@
+# backend/api/commands/ratings.py
+from flask.cli import AppGroup
+import click
+
+from ..models.users import User
+from ..utils import db
+from ..utils.gameSummaries import rebuild_summaries
+from ..utils.ratingHistory import rebuild_daily_ratings, sync_current_ratings
+from ..utils.ratingRecompute import PERIOD_SECONDS, RatingRecompute, EloSystem, Glicko2System
+from ..utils.userStats import rebuild_head_to_head
+
+ratings_cli = AppGroup('ratings', help='Rating maintenance commands.')
+
+
+@ratings_cli.command('sync')
+@click.option('--batch-size', default=1000, show_default=True, help='Users updated per transaction.')
+def sync_ratings(batch_size):
+    """Rebuild users.elo from each user's newest Elo entry.
+
+    Needed once after upgrading, and whenever elo_entries was edited by hand.
+    Users without any entry keep their current value.
+    """
+    changed, total = sync_current_ratings(batch_size=batch_size, progress=click.echo)
+    click.echo(f'done: {changed} of {total} ratings changed')
+
+
+@ratings_cli.command('rollup')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only rebuild these users (repeatable).')
+@click.option('--batch-size', default=5000, show_default=True, help='Rollup rows inserted per statement.')
+def rollup_ratings(user_ids, batch_size):
+    """Rebuild the daily rating rollups from elo_entries.
+
+    New rating changes are rolled up as they happen; run this once after
+    upgrading and after bulk loads that write elo_entries directly.
+    """
+    written = rebuild_daily_ratings(list(user_ids) or None, batch_size=batch_size, progress=click.echo)
+    click.echo(f'done: {written} daily rows written')
+
+
+@ratings_cli.command('recompute')
+@click.option('--system', 'system_name', type=click.Choice(['elo', 'glicko2']), default='elo', show_default=True)
+@click.option('--period', type=click.Choice(list(PERIOD_SECONDS)), default='game', show_default=True,
+              help="Rate games one at a time ('game', same as live play) or per rating period.")
+@click.option('--k', default=32.0, show_default=True, help='Elo K-factor.')
+@click.option('--provisional-k', type=float, default=None, help='Elo K-factor for a player\'s first games.')
+@click.option('--provisional-games', default=0, show_default=True, help='Games played with the provisional K-factor.')
+@click.option('--tau', default=0.5, show_default=True, help='Glicko-2 volatility constraint.')
+@click.option('--default-elo', default=1200, show_default=True, help='Starting rating for players without a signup entry.')
+@click.option('--batch-size', default=10000, show_default=True, help='Games written per INSERT.')
+@click.option('--dry-run', is_flag=True, help='Compute and report, but write nothing.')
+def recompute_ratings(system_name, period, k, provisional_k, provisional_games, tau, default_elo, batch_size, dry_run):
+    """Replay every finished game and rewrite the per-game Elo entries.
+
+    Run it while the server is stopped: games finishing during the rewrite
+    would be rated against the old numbers. Needs numpy.
+    """
+    if system_name == 'elo':
+        system = EloSystem(k=k, provisional_k=provisional_k, provisional_games=provisional_games)
+    else:
+        system = Glicko2System(tau=tau)
+
+    try:
+        recompute = RatingRecompute(system, period=period, default_elo=default_elo,
+                                    batch_size=batch_size, progress=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    recompute.load()
+    recompute.compute()
+    if dry_run:
+        changed = sum(1 for uid, elo in db.session.query(User.id, User.elo) if recompute.final.get(uid, elo) != elo)
+        click.echo(f'dry run: {changed} of {len(recompute.final)} current ratings would change')
+        return
+
+    recompute.write()
+    click.echo('rebuilding daily rating rollups')
+    rebuild_daily_ratings(progress=click.echo)
+    click.echo('rebuilding game summaries')
+    rebuild_summaries(progress=click.echo)
+    click.echo('rebuilding head-to-head rating changes')
+    rebuild_head_to_head(progress=click.echo)
+    click.echo('done')
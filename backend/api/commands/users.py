@@ -0,0 +1,55 @@
+# backend/api/commands/users.py
+from flask.cli import AppGroup
+from sqlalchemy import update
+import click
+
+from ..models.users import User
+from ..utils import db
+from ..utils.userStats import rebuild_head_to_head, rebuild_user_stats
+
+users_cli = AppGroup('users', help='User maintenance commands.')
+
+
+@users_cli.command('normalize-usernames')
+@click.option('--batch-size', default=5000, show_default=True, help='Users updated per transaction.')
+def normalize_usernames(batch_size):
+    """Fill users.username_lower, the column prefix search runs on.
+
+    Needed once after adding the column to an existing table. Lowercasing
+    happens in Python, the same way the model does it on save.
+    """
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(User.id, User.username, User.username_lower).filter(
+            User.id > last_id
+        ).order_by(User.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        params = [{'id': uid, 'username_lower': username.lower()}
+                  for uid, username, current in rows if current != username.lower()]
+        if params:
+            db.session.execute(update(User), params)
+        db.session.commit()
+        changed += len(params)
+        click.echo(f'checked users up to id {last_id}, {changed} updated')
+
+    click.echo(f'done: {changed} usernames normalized')
+
+
+@users_cli.command('rebuild-stats')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only rebuild these users (repeatable).')
+@click.option('--batch-size', default=5000, show_default=True, help='Stats rows inserted per statement.')
+def rebuild_stats(user_ids, batch_size):
+    """Rebuild the per-user and head-to-head game counters from finished games.
+
+    Needed once after upgrading, and after games were imported or edited
+    outside the app. Finished games keep the counters up to date once the
+    tables are filled.
+    """
+    written = rebuild_user_stats(user_ids=user_ids or None, batch_size=batch_size, progress=click.echo)
+    click.echo(f'stats written for {written} users')
+    pairs = rebuild_head_to_head(user_ids=user_ids or None, batch_size=batch_size, progress=click.echo)
+    click.echo(f'done: head-to-head records written for {pairs} pairs')
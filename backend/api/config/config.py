@@ -24,6 +24,18 @@ class Config:
     JWT_SECRET_KEY = config('JWT_SECRET_KEY', default=None)
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=1)
+    # background task that ends games on flag-fall without client polling
+    CLOCK_SCHEDULER_ENABLED = True
+    # background task that pairs the matchmaking queue every few hundred ms
+    # (never started by `flask` commands); turn it off on a server sharing
+    # the database with `flask matchmaking simulate`
+    MATCHMAKING_SCHEDULER_ENABLED = config('MATCHMAKING_SCHEDULER_ENABLED', default=True, cast=bool)
+    # 'memory' pairs from an in-process index (single worker only);
+    # 'database' pairs from the queue table and works across workers
+    MATCHMAKING_BACKEND = config('MATCHMAKING_BACKEND', default='memory')
+    # needed for emits to reach clients connected to other workers,
+    # e.g. redis://localhost:6379/0
+    SOCKETIO_MESSAGE_QUEUE = config('SOCKETIO_MESSAGE_QUEUE', default=None)
 
 class DevConfig(Config):
     DEBUG = config('DEBUG', default=True, cast=bool)
@@ -38,6 +50,8 @@ class DevConfig(Config):
 
 class TestConfig(Config):
     TESTING = True
+    CLOCK_SCHEDULER_ENABLED = False
+    MATCHMAKING_SCHEDULER_ENABLED = False
     SQLALCHEMY_DATABASE_URI = 'sqlite://'
     SQLALCHEMY_ECHO = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -5,6 +5,7 @@ from flask import request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
 from ..models.friendships import Friendship, FriendshipStatus
+from ..utils.presence import presence
 from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import NotFound, BadRequest
 import logging
@@ -106,6 +107,7 @@ class UpdateDeleteEntry(Resource):
             logger.exception('DB error accepting friendship')
             return {'message': 'Database error'}, HTTPStatus.INTERNAL_SERVER_ERROR
 
+        presence.friendship_added(friendship.user1_id, friendship.user2_id)
         return friendship, HTTPStatus.OK
 
     @jwt_required()
@@ -131,4 +133,6 @@ class UpdateDeleteEntry(Resource):
             logger.exception('DB error deleting friendship')
             return {'message': 'Database error'}, HTTPStatus.INTERNAL_SERVER_ERROR
 
+        presence.friendship_removed(friendship.user1_id, friendship.user2_id)
+
         return friendship, HTTPStatus.OK
\ No newline at end of file
@@ -2,8 +2,8 @@
 from flask_restx import Resource, Namespace, fields
 from http import HTTPStatus
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import request
-from werkzeug.exceptions import BadRequest
+from flask import request, session
+from werkzeug.exceptions import BadRequest, Forbidden, HTTPException, Unauthorized
 
 from ..models.users import User
 from ..models.games import Game
@@ -12,7 +12,9 @@ from ..models.moves import Move
 from ..models.elo import EloEntry
 from ..models.challenges import Challenge
 from ..utils import db, socketio
-from ..utils.eloChange import calculate_new_elo_pair_after_draw, calculate_new_elo_pair_after_win
+from ..utils.liveGames import live_games
+from ..utils.clockScheduler import clock_scheduler
+from ..utils.gameFinalization import finalize_game, board_result, flag_fall_result, draw_claim_reason
 import chess
 from datetime import datetime
 import logging
@@ -26,6 +28,9 @@ def handle_db_errors(func):
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
+        except HTTPException:
+            # NotFound/BadRequest raised while loading a game are client errors
+            raise
         except SQLAlchemyError as e:
             logger.exception('Database error in %s', func.__name__)
             try:
@@ -42,23 +47,6 @@ from sqlalchemy import func
 games_namespace = Namespace('games', description= "games namespace")
 
 
-def get_latest_elo_map(user_ids):
-    """Return a map user_id -> latest EloEntry for the given user_ids."""
-    if not user_ids:
-        return {}
-    latest_sq = db.session.query(
-        EloEntry.user_id.label('user_id'),
-        func.max(EloEntry.created_at).label('max_created')
-    ).filter(EloEntry.user_id.in_(user_ids)).group_by(EloEntry.user_id).subquery()
-
-    latest_elos = db.session.query(EloEntry).join(
-        latest_sq,
-        (EloEntry.user_id == latest_sq.c.user_id) & (EloEntry.created_at == latest_sq.c.max_created)
-    ).all()
-
-    return {e.user_id: e for e in latest_elos}
-
-
 game_model = games_namespace.model('Game', {
     'id': fields.Integer(description='Game ID'),
     'in_progress': fields.Boolean(description='Is the game in progress'),
@@ -67,6 +55,8 @@ game_model = games_namespace.model('Game', {
     'black_user_id': fields.Integer(description='Black Player User ID'),
     'white_time_left': fields.Integer(),
     'black_time_left': fields.Integer(),
+    'time_control': fields.String(description="Time control, e.g. '3+2'"),
+    'increment_seconds': fields.Integer(),
     'created_at': fields.DateTime(description='Game creation timestamp'),
     'updated_at': fields.DateTime(description='Game last update timestamp'),
 })
@@ -97,187 +87,139 @@ class GameStatus(Resource):
 
         return game, HTTPStatus.OK
 
-@games_namespace.route('/games/<int:game_id>/<string:move>')
-class MakeMove(Resource):
+def make_move(game_id, user_id, move):
+    """Validate and apply ``move`` (UCI) for ``user_id``; shared by the HTTP and socket paths.
 
-    @handle_db_errors
-    @jwt_required()
-    @games_namespace.marshal_with(game_model)
-    def put(self, game_id, move):
-        """make a move"""
+    Returns the LiveGame after the move (or after the flag-fall that ended it).
+    Raises an HTTPException describing why the move was refused.
+    """
+    live = live_games.get(game_id)
 
-        game = Game.get_by_id(game_id)
-        if not game:
-            return {'message': 'Game not found'}, HTTPStatus.NOT_FOUND
-        
-        if not game.in_progress:
-            return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
+    if not live.is_player(user_id):
+        raise Unauthorized('Unauthorized')
 
-        user_id = int(get_jwt_identity())
-        if user_id != game.white_user_id and user_id != game.black_user_id:
-            return {'message': 'Unauthorized'}, HTTPStatus.UNAUTHORIZED
-        # Here you would add logic to validate and make the move
-        # For now, we just append the move to the moves list
-
-        game.draw_offer_from = None  # Clear any existing draw offers on move
-
-        board = chess.Board(game.current_fen) if game.current_fen else chess.Board()
-        
-        
-        current_turn_user_id = game.white_user_id if board.turn == chess.WHITE else game.black_user_id
-
-        if user_id != current_turn_user_id:
-            return {'message': "It is not your turn"}, HTTPStatus.FORBIDDEN
-        
-        
-        # 2. Update Clocks
-        
-        now = datetime.utcnow()
-        seconds_elapsed = int((now - game.updated_at).total_seconds())
+    with live.lock:
+        if not live.in_progress:
+            raise BadRequest('Game has already ended')
 
-        # If it was white's turn, subtract time from white
-        if board.turn == chess.WHITE:
-            game.white_time_left = max(0, game.white_time_left - seconds_elapsed)
-        else:
-            game.black_time_left = max(0, game.black_time_left - seconds_elapsed)
-        
-        # Check for time-out
-        if game.white_time_left <= 0 or game.black_time_left <= 0:
-            game.in_progress = False
-            game.winner_id = game.black_user_id if game.white_time_left <= 0 else game.white_user_id
-            reason = "Time out"
-
-            elo_map = get_latest_elo_map([game.black_user_id, game.white_user_id])
-            black_elo_entry = elo_map.get(game.black_user_id)
-            white_elo_entry = elo_map.get(game.white_user_id)
-            new_elos = calculate_new_elo_pair_after_win(black_elo_entry.elo, white_elo_entry.elo, game.winner_id == game.black_user_id)
-
-            if(board.is_insufficient_material()):
-                game.winner_id = None  # Draw due to insufficient material
-                reason = "Draw due to insufficient material"
-                new_elos = calculate_new_elo_pair_after_draw(black_elo_entry.elo, white_elo_entry.elo)
-            
-            new_black_elo = EloEntry(
-                user_id=game.black_user_id,
-                game_id=game.id,
-                elo=new_elos[0]
-            )
-            new_white_elo = EloEntry(
-                user_id=game.white_user_id,
-                game_id=game.id,
-                elo=new_elos[1]
-            )
-            new_black_elo.save()
-            new_white_elo.save()
-
-            game.save()
-
-            socketio.emit('game_over', {
-                'winner_id': game.winner_id,
-                'reason': reason
-            }, to=f"game_{game_id}")
-
-
-            return game, HTTPStatus.OK
-        
-        
-        
-        
-        
-        
-        # 3. Validate and Push Move
-        try:
-            # move is expected in UCI format like "e2e4"
-            chess_move = chess.Move.from_uci(move)
-            if chess_move in board.legal_moves:
-                board.push(chess_move)
-            else:
-                return {'message': 'Illegal move'}, HTTPStatus.BAD_REQUEST
-        except ValueError:
-            return {'message': 'Invalid move format (use UCI)'}, HTTPStatus.BAD_REQUEST
-        
-        # 4. Update Game Object
-        game.current_fen = board.fen()
-        
+        board = live.board
+
+        if user_id != live.side_to_move_user_id():
+            raise Forbidden("It is not your turn")
 
-        new_move = Move(
-            game_id=game.id,
-            move_number=Move.query.filter_by(game_id=game.id).count() + 1,
-            uci=move
-        )
 
-        new_move.save()
+        # 1. Check Clocks
 
+        now = datetime.utcnow()
+        white_ms, black_ms = live.clocks_at(now)
 
-            
+        # Check for time-out
+        if white_ms <= 0 or black_ms <= 0:
+            live.charge_clock(now)
+            winner_id, reason = flag_fall_result(live, live.white_ms <= 0)
+            finalize_game(live, winner_id, reason)
+            return live
 
 
-        # 5. Check for Game End (Checkmate/Draw)
-        if board.is_game_over():
-            game.in_progress = False
+        # 2. Validate and Push Move
+        try:
+            # move is expected in UCI format like "e2e4"
+            chess_move = chess.Move.from_uci(move)
+        except ValueError:
+            raise BadRequest('Invalid move format (use UCI)')
 
-            elo_map = get_latest_elo_map([game.black_user_id, game.white_user_id])
-            black_elo_entry = elo_map.get(game.black_user_id)
-            white_elo_entry = elo_map.get(game.white_user_id)
-            new_elos = None
+        if chess_move not in board.legal_moves:
+            raise BadRequest('Illegal move')
 
+        clocks = (live.white_ms, live.black_ms)
+        live.charge_clock(now)
+        live.add_increment(board.turn)
+        board.push(chess_move)
+        live.history.push(board)
+        result = board_result(live, user_id)
 
-            if board.is_checkmate():
-                # The winner is the one who just moved
-                game.winner_id = user_id
-                new_elos = calculate_new_elo_pair_after_win(black_elo_entry.elo, white_elo_entry.elo, game.winner_id == game.black_user_id)
-            else:
-                # Draw
-                game.winner_id = None
-                new_elos = calculate_new_elo_pair_after_draw(black_elo_entry.elo, white_elo_entry.elo)
-            
-            new_black_elo = EloEntry(
-                user_id=game.black_user_id,
-                game_id=game.id,
-                elo=new_elos[0]
-            )
-
-            new_white_elo = EloEntry(
-                user_id=game.white_user_id,
-                game_id=game.id,
-                elo=new_elos[1]
-            )
-
-            new_black_elo.save()
-            new_white_elo.save()
-
-        
-
-        game.save()
-
-        # 6. Socket Emit
+        # 3. Persist the move (single UPDATE, no reads)
+        try:
+            live_games.persist_move(live, now)
+        except Exception:
+            # requests waiting on live.lock still hold this copy; put it back
+            # so none of them builds on a move that was never stored
+            live.undo_move(*clocks)
+            raise
+
+        # 4. Socket Emit
         # We send the FEN and the UCI move to the game room
         socketio.emit('move_made', {
             'move': move,
-            'current_fen': game.current_fen,
-            'is_game_over': not game.in_progress,
-            #'winner_id': getattr(game, 'winner_id', None)
-            'white_time_left': game.white_time_left,
-            'black_time_left': game.black_time_left
+            'current_fen': live.current_fen,
+            'is_game_over': result is not None,
+            'white_time_left': live.white_time_left,
+            'black_time_left': live.black_time_left
         }, to=f"game_{game_id}")
 
+        # 5. Check for Game End (Checkmate/Draw)
+        if result is not None:
+            winner_id, reason = result
+            finalize_game(live, winner_id, reason)
+        else:
+            clock_scheduler.schedule_live(live)
 
-        # ADD THIS: Explicitly emit game_over if the board is done
-        if not game.in_progress:
-            reason = "draw"
-            if board.is_checkmate():
-                reason = "checkmate"
+    return live
 
-            elif game.white_time_left <= 0 or game.black_time_left <= 0:
-                reason = "time_out"
-            
-            socketio.emit('game_over', {
-                'winner_id': game.winner_id,
-                'reason': reason
-            }, to=f"game_{game_id}")
 
+@games_namespace.route('/games/<int:game_id>/<string:move>')
+class MakeMove(Resource):
 
-            return game, HTTPStatus.OK
+    @handle_db_errors
+    @jwt_required()
+    @games_namespace.marshal_with(game_model)
+    def put(self, game_id, move):
+        """make a move"""
+
+        user_id = int(get_jwt_identity())
+        return make_move(game_id, user_id, move), HTTPStatus.OK
+
+
+@socketio.on('make_move')
+def on_make_move(data):
+    """Socket equivalent of MakeMove for an already authenticated connection.
+
+    Expects { gameId, move } and acknowledges with the resulting position and
+    clocks, or with { ok: false, status, message } if the move was refused.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return {'ok': False, 'status': HTTPStatus.UNAUTHORIZED, 'message': 'authorization required'}
+
+    try:
+        game_id = int(data.get('gameId'))
+        move = str(data.get('move'))
+    except (AttributeError, TypeError, ValueError):
+        return {'ok': False, 'status': HTTPStatus.BAD_REQUEST, 'message': 'gameId and move are required'}
+
+    try:
+        live = make_move(game_id, user_id, move)
+    except HTTPException as e:
+        return {'ok': False, 'status': e.code, 'message': e.description}
+    except SQLAlchemyError:
+        logger.exception('Database error in make_move socket handler')
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+        return {'ok': False, 'status': HTTPStatus.INTERNAL_SERVER_ERROR, 'message': 'Database error'}
+
+    return {
+        'ok': True,
+        'game_id': live.id,
+        'current_fen': live.current_fen,
+        'in_progress': live.in_progress,
+        'ply': live.ply_count,
+        'white_time_left': live.white_time_left,
+        'black_time_left': live.black_time_left,
+        'white_time_left_ms': live.white_ms,
+        'black_time_left_ms': live.black_ms,
+    }
 
 @games_namespace.route('/games/<int:game_id>/resign')
 class Resign(Resource):
@@ -288,51 +230,21 @@ class Resign(Resource):
     def post(self, game_id):
         """resigns the game"""
 
-        game = Game.get_by_id(game_id)
-        if not game:
-            return {'message': 'Game not found'}, HTTPStatus.NOT_FOUND
-        if not game.in_progress:
-            return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
-        
+        live = live_games.get(game_id)
+
         user_id = int(get_jwt_identity())
-        if user_id != game.white_user_id and user_id != game.black_user_id:
+        if not live.is_player(user_id):
             return {'message': 'Unauthorized'}, HTTPStatus.UNAUTHORIZED
-        
-        game.winner_id = game.black_user_id if user_id == game.white_user_id else game.white_user_id
-
-        game.in_progress = False
-        game.win_by_resignation = True
-        game.save()
-
-        # Update Elo elos (batch fetch latest entries)
-        elo_map = get_latest_elo_map([game.black_user_id, game.white_user_id])
-        black_elo_entry = elo_map.get(game.black_user_id)
-        white_elo_entry = elo_map.get(game.white_user_id)
-        new_elos = calculate_new_elo_pair_after_win(black_elo_entry.elo, white_elo_entry.elo, game.winner_id == game.black_user_id)
-
-        
-
-        new_black_elo = EloEntry(
-            user_id=game.black_user_id,
-            game_id=game.id,
-            elo=new_elos[0]
-        )
-        new_white_elo = EloEntry(
-            user_id=game.white_user_id,
-            game_id=game.id,
-            elo=new_elos[1]
-        )
-
-        
-        new_black_elo.save()
-        new_white_elo.save()
-
-        socketio.emit('game_over', {
-            'winner_id': game.winner_id,
-            'reason': 'resignation'
-        }, to=f"game_{game_id}")
 
-        return game, HTTPStatus.OK
+        with live.lock:
+            if not live.in_progress:
+                return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
+
+            live.charge_clock(datetime.utcnow())
+            if not finalize_game(live, live.opponent_of(user_id), 'resignation', win_by_resignation=True):
+                return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
+
+        return live, HTTPStatus.OK
 
 @games_namespace.route('/games/<int:game_id>/offer-draw')
 class OfferDraw(Resource):
@@ -344,14 +256,16 @@ class OfferDraw(Resource):
 
         user_id = int(get_jwt_identity())
 
-        game = Game.get_by_id(game_id)
-        if not game:
-            return {'message': 'Game not found'}, HTTPStatus.NOT_FOUND
-        if not game.in_progress:
-            return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
+        live = live_games.get(game_id)
+        if not live.is_player(user_id):
+            return {'message': 'Unauthorized'}, HTTPStatus.UNAUTHORIZED
+
+        with live.lock:
+            if not live.in_progress:
+                return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
 
-        game.draw_offer_from = user_id
-        game.save()
+            live.draw_offer_from = user_id
+            live_games.persist_draw_offer(live)
 
         socketio.emit('draw_offered', {
             'offerer_id': user_id
@@ -394,55 +308,28 @@ class RespondDraw(Resource):
         else:
             raise BadRequest("Field 'accepted' must be a boolean.")
 
-        game = Game.get_by_id(game_id)
-        if not game:
-            return {'message': 'Game not found'}, HTTPStatus.NOT_FOUND
-        if not game.in_progress:
-            return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
-        
+        live = live_games.get(game_id)
+
         user_id = int(get_jwt_identity())
-        if (user_id != game.white_user_id and user_id != game.black_user_id) or game.draw_offer_from == user_id:
-            return {'message': 'Unauthorized'}, HTTPStatus.UNAUTHORIZED
-        
-
-        
-        if not accepted:
-            game.draw_offer_from = None
-            game.save()
-            socketio.emit('draw_declined', {}, to=f"game_{game_id}")
-            return {'message': 'Draw declined'}, HTTPStatus.OK
-        
-        game.in_progress = False
-        game.winner_id = None  # Draw
-        game.save()
-
-        elo_map = get_latest_elo_map([game.black_user_id, game.white_user_id])
-        black_elo_entry = elo_map.get(game.black_user_id)
-        white_elo_entry = elo_map.get(game.white_user_id)
-
-        new_elos = calculate_new_elo_pair_after_draw(black_elo_entry.elo, white_elo_entry.elo)
-
-        new_black_elo = EloEntry(
-            user_id=game.black_user_id,
-            game_id=game.id,
-            elo=new_elos[0]
-        )
-
-        new_white_elo = EloEntry(
-            user_id=game.white_user_id,
-            game_id=game.id,
-            elo=new_elos[1]
-        )
-        
-        new_black_elo.save()
-        new_white_elo.save()
-
-        socketio.emit('game_over', {
-            'winner_id': None,
-            'reason': 'draw_agreement'
-        }, to=f"game_{game_id}")
 
-        return game, HTTPStatus.OK
+        with live.lock:
+            if not live.in_progress:
+                return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
+
+            if not live.is_player(user_id) or live.draw_offer_from == user_id:
+                return {'message': 'Unauthorized'}, HTTPStatus.UNAUTHORIZED
+
+            if not accepted:
+                live.draw_offer_from = None
+                live_games.persist_draw_offer(live)
+                socketio.emit('draw_declined', {}, to=f"game_{game_id}")
+                return {'message': 'Draw declined'}, HTTPStatus.OK
+
+            live.charge_clock(datetime.utcnow())
+            if not finalize_game(live, None, 'draw_agreement'):
+                return {'message': 'Game has already ended'}, HTTPStatus.BAD_REQUEST
+
+        return live, HTTPStatus.OK
 
 
 @games_namespace.route('/games/<int:game_id>/claim-timeout')
@@ -450,59 +337,53 @@ class ClaimTimeout(Resource):
     @handle_db_errors
     @jwt_required()
     def post(self, game_id):
-        game = Game.get_by_id(game_id)
-        if not game.in_progress:
-            return {'message': 'Game already ended'}, HTTPStatus.BAD_REQUEST
+        live = live_games.get(game_id)
 
-        now = datetime.utcnow()
-        seconds_elapsed = int((now - game.updated_at).total_seconds())
-        
-        board = chess.Board(game.current_fen)
-        
-        # Calculate current actual time
-        w_time = game.white_time_left - (seconds_elapsed if board.turn == chess.WHITE else 0)
-        b_time = game.black_time_left - (seconds_elapsed if board.turn == chess.BLACK else 0)
-
-        if w_time <= 0 or b_time <= 0:
-            game.in_progress = False
-            game.winner_id = game.black_user_id if w_time <= 0 else game.white_user_id
-            reason = "Time out"
-
-            game.save()
-            
-            # Update Elo elos
-            elo_map = get_latest_elo_map([game.black_user_id, game.white_user_id])
-            black_elo_entry = elo_map.get(game.black_user_id)
-            white_elo_entry = elo_map.get(game.white_user_id)
-            new_elos = calculate_new_elo_pair_after_win(black_elo_entry.elo, white_elo_entry.elo, game.winner_id == game.black_user_id)
-            
-            if(board.is_insufficient_material()):
-                game.winner_id = None  # Draw due to insufficient material
-                reason = "Draw due to insufficient material"
-                new_elos = calculate_new_elo_pair_after_draw(black_elo_entry.elo, white_elo_entry.elo)
-
-            new_black_elo = EloEntry(
-                user_id=game.black_user_id,
-                game_id=game.id,
-                elo=new_elos[0]
-            )       
-            new_white_elo = EloEntry(
-                user_id=game.white_user_id,
-                game_id=game.id,
-                elo=new_elos[1]
-            )
-            new_black_elo.save()
-            new_white_elo.save()
-
-
-            
-            socketio.emit('game_over', {
-                'winner_id': game.winner_id,
-                'reason': reason
-            }, to=f"game_{game_id}")
-            return {'message': 'timeout claimed'}, HTTPStatus.OK
-            
-        return {'message': 'Time has not expired yet'}, HTTPStatus.BAD_REQUEST
-
-
-    
\ No newline at end of file
+        with live.lock:
+            if not live.in_progress:
+                return {'message': 'Game already ended'}, HTTPStatus.BAD_REQUEST
+
+            now = datetime.utcnow()
+
+            # Calculate current actual time
+            w_ms, b_ms = live.clocks_at(now)
+
+            if w_ms > 0 and b_ms > 0:
+                return {'message': 'Time has not expired yet'}, HTTPStatus.BAD_REQUEST
+
+            live.charge_clock(now)
+            winner_id, reason = flag_fall_result(live, live.white_ms <= 0)
+            if not finalize_game(live, winner_id, reason):
+                return {'message': 'Game already ended'}, HTTPStatus.BAD_REQUEST
+
+        return {'message': 'timeout claimed'}, HTTPStatus.OK
+
+
+@games_namespace.route('/games/<int:game_id>/claim-draw')
+class ClaimDraw(Resource):
+
+    @handle_db_errors
+    @jwt_required()
+    @games_namespace.marshal_with(game_model)
+    def post(self, game_id):
+        """claim a draw by threefold repetition or the fifty-move rule"""
+
+        live = live_games.get(game_id)
+
+        user_id = int(get_jwt_identity())
+        if not live.is_player(user_id):
+            raise Unauthorized('Unauthorized')
+
+        with live.lock:
+            if not live.in_progress:
+                raise BadRequest('Game has already ended')
+
+            reason = draw_claim_reason(live)
+            if reason is None:
+                raise BadRequest('No draw can be claimed in this position')
+
+            live.charge_clock(datetime.utcnow())
+            if not finalize_game(live, None, reason):
+                raise BadRequest('Game has already ended')
+
+        return live, HTTPStatus.OK
@@ -0,0 +1,73 @@
+# backend/api/leaderboard/views.py
+from flask_restx import Resource, Namespace, fields
+from flask import request
+from http import HTTPStatus
+
+from ..models.users import User
+from ..utils import db
+from ..utils.leaderboard import leaderboard
+
+MAX_PAGE_SIZE = 200
+MAX_RADIUS = 50
+
+leaderboard_namespace = Namespace('leaderboard', description='Rating leaderboard')
+
+entry_model = leaderboard_namespace.model('LeaderboardEntry', {
+    'rank': fields.Integer(description='Rank, shared by players on the same rating'),
+    'user_id': fields.Integer(description='User ID'),
+    'username': fields.String(description='Username'),
+    'elo': fields.Integer(description='Current Elo rating'),
+})
+
+standing_model = leaderboard_namespace.model('LeaderboardStanding', {
+    'user_id': fields.Integer(description='User ID'),
+    'rank': fields.Integer(description='Rank, shared by players on the same rating'),
+    'elo': fields.Integer(description='Current Elo rating'),
+    'total': fields.Integer(description='Number of ranked players'),
+    'percentile': fields.Float(description='Percentage of players rated below this user'),
+})
+
+
+def _with_usernames(entries):
+    user_ids = [e['user_id'] for e in entries]
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    for e in entries:
+        e['username'] = usernames.get(e['user_id'])
+    return entries
+
+
+@leaderboard_namespace.route('/leaderboard')
+class TopPlayers(Resource):
+
+    @leaderboard_namespace.marshal_list_with(entry_model)
+    def get(self):
+        """Best rated players first. Query params: limit (default 100), offset"""
+        limit = min(max(request.args.get('limit', 100, type=int), 0), MAX_PAGE_SIZE)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        entries = leaderboard.top(limit, offset)
+        return _with_usernames(entries), HTTPStatus.OK, {'X-Total-Count': len(leaderboard)}
+
+
+@leaderboard_namespace.route('/leaderboard/users/<int:user_id>')
+class UserStanding(Resource):
+
+    def get(self, user_id):
+        """Rank and percentile of a user"""
+        standing = leaderboard.rank_of(user_id)
+        if standing is None:
+            return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
+        return leaderboard_namespace.marshal(dict(standing, user_id=user_id), standing_model), HTTPStatus.OK
+
+
+@leaderboard_namespace.route('/leaderboard/users/<int:user_id>/around')
+class UserNeighbourhood(Resource):
+
+    def get(self, user_id):
+        """Players ranked just above and below a user. Query params: radius (default 5)"""
+        radius = min(max(request.args.get('radius', 5, type=int), 0), MAX_RADIUS)
+
+        entries = leaderboard.around(user_id, radius)
+        if entries is None:
+            return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
+        return leaderboard_namespace.marshal(_with_usernames(entries), entry_model), HTTPStatus.OK
@@ -2,141 +2,105 @@
 from flask_restx import Resource, Namespace, fields
 from http import HTTPStatus
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import request
-from ..models.queue import Queue
+from flask import request, session
+from ..models.users import User
 from ..models.games import Game
 
-from ..utils import db, socketio
-from sqlalchemy.exc import SQLAlchemyError
+from ..utils import socketio
+from ..utils.matchmakingScheduler import matchmaking_scheduler, queue_ack
+from ..utils.presence import presence
+from ..utils.timeControls import DEFAULT_TIME_CONTROL, TIME_CONTROLS
 import logging
-import threading
 
 logger = logging.getLogger(__name__)
 
-# Simple process-local lock to serialize pairing operations.
-# This is safe for a single-process dev server. For production use
-# prefer Redis or database-level locking.
-pair_lock = threading.Lock()
 
 matchmaking_namespace = Namespace('matchmaking', description = "matchmaking namespace")
 
+join_queue_model = matchmaking_namespace.model('JoinQueue', {
+    'time_control': fields.String(required=False, description="e.g. '3+2'; defaults to " + DEFAULT_TIME_CONTROL)
+})
+
+time_control_model = matchmaking_namespace.model('TimeControl', {
+    'key': fields.String(),
+    'category': fields.String(),
+    'initial_seconds': fields.Integer(),
+    'increment_seconds': fields.Integer()
+})
+
 
 
 @matchmaking_namespace.route('/matchmaking')
 class MatchMaking(Resource):
+    @matchmaking_namespace.expect(join_queue_model)
     @jwt_required()
     def post(self):
-        """join the queue"""
+        """join the queue for a time control"""
 
         user_id = int(get_jwt_identity())
-        #check if user is already in queue
-
-        existing_entry = Queue.query.filter_by(user_id=user_id).first()
-        if existing_entry:
-            return {'message': f'User already in queue'}, HTTPStatus.BAD_REQUEST
-
-        #check if user is already in a game
-        ongoing_game = Game.query.filter(
-            ((Game.white_user_id == user_id) | (Game.black_user_id == user_id)) &
-            (Game.in_progress == True)
-        ).first()
-        if ongoing_game:
+        data = request.get_json(silent=True) or {}
+        time_control = data.get('time_control') or DEFAULT_TIME_CONTROL
+        if time_control not in TIME_CONTROLS:
+            return {'message': f'Unknown time control {time_control}'}, HTTPStatus.BAD_REQUEST
+
+        #check if user is already in a game; the database is only asked when
+        #presence cannot know every running game (several workers, or not seeded yet)
+        if presence.knows_all_games():
+            in_game = presence.game_of(user_id) is not None
+        else:
+            in_game = ongoing_game_of(user_id) is not None
+        if in_game:
             return {'message': 'User is already in an ongoing game'}, HTTPStatus.BAD_REQUEST
-        #if not, add to queue
-        new_entry = Queue(user_id=user_id)
+        rating = User.get_elo_map([user_id]).get(user_id)
+        if rating is None:
+            return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
+
+        # Only queue the player (join refuses anyone already waiting in any
+        # pool); the matchmaking scheduler pairs waiting players in the
+        # background, pushes queue_status while they wait and notifies both
+        # through start_game.
         try:
-            new_entry.save()
-        except SQLAlchemyError:
-            logger.exception('DB error saving queue entry')
-            return {'message': 'Database error'}, HTTPStatus.INTERNAL_SERVER_ERROR
-
-        # Try to pair the first two users in queue. Use a lock to avoid races
-        # on a single-process server. We remove the two queue entries and
-        # create a Game for them inside the lock.
-        paired_game = None
-        with pair_lock:
-            # fetch two earliest entries
-            entries = Queue.query.order_by(Queue.created_at.asc()).limit(2).all()
-            if len(entries) >= 2:
-                u1 = entries[0].user_id
-                u2 = entries[1].user_id
-                try:
-                    # create the game (white = first queued)
-                    game = Game(white_user_id=u1, black_user_id=u2)
-                    db.session.add(game)
-
-                    # remove the two queue entries
-                    for e in entries:
-                        db.session.delete(e)
-                    db.session.commit()
-                    paired_game = game
-
-                    # --- SOCKET NOTIFICATION START ---
-                    
-                    # 1. Notify the WAITING user (u1)
-                    # They are sitting on the 'waiting' screen. This forces the redirect.
-                    socketio.emit('start_game', {
-                        'game_id': game.id,
-                        'opponent': u2,
-                        'color': 'white'
-                    }, to=f"user_{u1}")
-
-                    # 2. Notify the CURRENT user (u2)
-                    # Ideally, their HTTP response handles the redirect, but 
-                    # sending a socket event to them too ensures consistency 
-                    # (e.g., if they have multiple tabs open).
-                    socketio.emit('start_game', {
-                        'game_id': game.id,
-                        'opponent': u1,
-                        'color': 'black'
-                    }, to=f"user_{u2}")
-
-                    # --- SOCKET NOTIFICATION END ---
-                except SQLAlchemyError as e:
-                    logger.exception('Database error during matchmaking pairing')
-                    db.session.rollback()
-                except Exception as e:
-                    logger.exception('Unexpected error during matchmaking pairing')
-                    try:
-                        db.session.rollback()
-                    except Exception:
-                        pass
-
-        if paired_game:
-            return {
-                'message': 'Paired',
-                'game_id': paired_game.id,
-                'white_user_id': paired_game.white_user_id,
-                'black_user_id': paired_game.black_user_id
-            }, HTTPStatus.CREATED
-
-        return {'message': 'User added to queue'}, HTTPStatus.CREATED
+            matchmaking_scheduler.join(user_id, rating, time_control)
+        except ValueError:
+            return {'message': f'User already in queue'}, HTTPStatus.BAD_REQUEST
+
+        # position and estimated wait follow with the next queue_status push
+        return {
+            'message': 'User added to queue',
+            'time_control': time_control,
+            'status': queue_ack(time_control, rating)
+        }, HTTPStatus.CREATED
 
     @jwt_required()
     def delete(self):
         """leave the queue"""
         user_id = int(get_jwt_identity())
-        existing_entry = Queue.query.filter_by(user_id=user_id).first()
-        if not existing_entry:
+        if not matchmaking_scheduler.leave(user_id):
             return {'message': 'User not in queue'}, HTTPStatus.BAD_REQUEST
-        try:
-            existing_entry.delete()
-        except SQLAlchemyError:
-            logger.exception('DB error deleting queue entry')
-            return {'message': 'Database error'}, HTTPStatus.INTERNAL_SERVER_ERROR
+        # let the user's other tabs leave their waiting room too
+        socketio.emit('queue_status', {'queued': False}, to=f"user_{user_id}")
         return {'message': 'User removed from queue'}, HTTPStatus.OK
 
 
+@matchmaking_namespace.route('/time-controls')
+class TimeControls(Resource):
+    @matchmaking_namespace.marshal_list_with(time_control_model)
+    def get(self):
+        """List the time controls players can queue for."""
+        return [tc._asdict() for tc in TIME_CONTROLS.values()]
+
+
 @matchmaking_namespace.route('/status')
 class MatchStatus(Resource):
     @jwt_required()
     def get(self):
-        """Check whether the current user has been paired into a game."""
+        """Check whether the current user has been paired into a game.
+
+        Kept for older clients; the waiting room now gets queue_status and
+        start_game pushed over the socket instead of polling this.
+        """
         user_id = int(get_jwt_identity())
-        # look for an in-progress game where the user is white or black
-        game = Game.query.filter(
-            (Game.white_user_id == user_id) | (Game.black_user_id == user_id)
-        ).filter_by(in_progress=True).first()
+        game = ongoing_game_of(user_id)
 
         if not game:
             return {'paired': False}, HTTPStatus.OK
@@ -145,6 +109,54 @@ class MatchStatus(Resource):
             'paired': True,
             'game_id': game.id,
             'white_user_id': game.white_user_id,
-            'black_user_id': game.black_user_id
+            'black_user_id': game.black_user_id,
+            'time_control': game.time_control
         }, HTTPStatus.OK
 
+
+def ongoing_game_of(user_id):
+    """The in-progress game ``user_id`` plays in, or None."""
+    return Game.query.filter(
+        (Game.white_user_id == user_id) | (Game.black_user_id == user_id)
+    ).filter_by(in_progress=True).first()
+
+
+@socketio.on('queue_status')
+def on_queue_status(data=None):
+    """Socket request for the caller's current queue_status.
+
+    Clients call this after (re)connecting. When the user is no longer
+    queued because they were paired meanwhile, the game is included so a
+    start_game missed while disconnected is recovered without polling.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return {'queued': False}
+
+    status = matchmaking_scheduler.status_of(user_id)
+    if not status['queued']:
+        game = ongoing_game_of(user_id)
+        if game:
+            white = game.white_user_id == user_id
+            status.update({
+                'game_id': game.id,
+                'opponent': game.black_user_id if white else game.white_user_id,
+                'color': 'white' if white else 'black',
+                'time_control': game.time_control
+            })
+    return status
+
+
+@presence.on_offline
+def leave_queue_on_disconnect(user_id):
+    """Take the user out of the matchmaking queue when their last socket closes.
+
+    Otherwise a closed tab keeps waiting and gets paired into a game nobody
+    plays. Another open tab of the same user keeps them queued (sockets
+    connected to other workers are not visible here).
+    """
+    try:
+        if matchmaking_scheduler.leave(user_id):
+            logger.info('Socket: removed disconnected user %s from the queue', user_id)
+    except Exception:
+        logger.exception('Failed to remove disconnected user %s from the queue', user_id)
@@ -3,14 +3,18 @@ from ..utils import db
 import json
 from datetime import datetime
 import logging
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
 class EloEntry(db.Model):
     __tablename__ = 'elo_entries'
+    # rating history reads scan one user's entries in time order
+    __table_args__ = (db.Index('ix_elo_entries_user_created', 'user_id', 'created_at'),)
+
     id = db.Column(db.Integer(), primary_key=True, index=True)
-    user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False)
     game_id = db.Column(db.Integer(), db.ForeignKey('games.id'), nullable=True, index=True, default=None)
     elo = db.Column(db.Integer(), nullable=False, default=1200)
     created_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
@@ -47,4 +51,27 @@ class EloEntry(db.Model):
 
     @classmethod
     def get_by_id(cls, id):
-        return cls.query.get_or_404(id)
\ No newline at end of file
+        return cls.query.get_or_404(id)
+
+    @classmethod
+    def get_latest_ratings(cls, user_ids=None):
+        """Return a map user_id -> elo of each user's newest entry.
+
+        Only used to rebuild ``User.elo``; requests read the rating from the
+        users table. Entries sharing a created_at are ordered by id, so every
+        user maps to exactly one rating.
+        """
+        ranked = db.session.query(
+            cls.user_id.label('user_id'),
+            cls.elo.label('elo'),
+            func.row_number().over(
+                partition_by=cls.user_id,
+                order_by=(cls.created_at.desc(), cls.id.desc())
+            ).label('rn')
+        )
+        if user_ids is not None:
+            ranked = ranked.filter(cls.user_id.in_(user_ids))
+        ranked = ranked.subquery()
+
+        rows = db.session.query(ranked.c.user_id, ranked.c.elo).filter(ranked.c.rn == 1)
+        return dict(rows.all())
@@ -16,11 +16,16 @@ class FriendshipStatus(Enum):
 
 class Friendship(db.Model):
     __tablename__ = 'friendships'
-    __table_args__ = (db.UniqueConstraint('user1_id', 'user2_id', name='uq_friendship_pair'),)
+    __table_args__ = (
+        db.UniqueConstraint('user1_id', 'user2_id', name='uq_friendship_pair'),
+        # a user's friendships newest first, from either side (keyset pagination)
+        db.Index('ix_friendships_user1_status_created', 'user1_id', 'status', 'created_at', 'id'),
+        db.Index('ix_friendships_user2_status_created', 'user2_id', 'status', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer(), primary_key=True, index=True)
-    user1_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False, index=True)
-    user2_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False, index=True)
+    user1_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False)
+    user2_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False)
     status = db.Column(db.Enum(FriendshipStatus), default=FriendshipStatus.PENDING, nullable=False)
     created_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
@@ -6,20 +6,40 @@ from enum import Enum
 from datetime import datetime
 import logging
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from .moves import Move
+from ..utils.moveCodec import decode_ucis
 
 logger = logging.getLogger(__name__)
 
 
+def _pair_low_default(context):
+    params = context.get_current_parameters()
+    return min(params['white_user_id'], params['black_user_id'])
+
+
+def _pair_high_default(context):
+    params = context.get_current_parameters()
+    return max(params['white_user_id'], params['black_user_id'])
 
 
 class Game(db.Model):
     __tablename__ = 'games'
+    # a player's games newest first, one index per colour (keyset pagination)
+    __table_args__ = (
+        db.Index('ix_games_white_created', 'white_user_id', 'created_at', 'id'),
+        db.Index('ix_games_black_created', 'black_user_id', 'created_at', 'id'),
+        # games between two players newest first, whoever had white
+        db.Index('ix_games_pair_created', 'pair_low_id', 'pair_high_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer(), primary_key=True, index=True)
     in_progress = db.Column(db.Boolean(), default=True, index=True)
     current_fen = db.Column(db.String(100), nullable=False, default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
 
-    white_user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False, index=True)
-    black_user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False, index=True)
+    white_user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False)
+    black_user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False)
+    # the two players as (smaller id, larger id), filled in on insert
+    pair_low_id = db.Column(db.Integer(), nullable=True, default=_pair_low_default)
+    pair_high_id = db.Column(db.Integer(), nullable=True, default=_pair_high_default)
 
     winner_id = db.Column(db.Integer(), db.ForeignKey('users.id'), default=None, nullable=True, index=True)
     draw_offer_from = db.Column(db.Integer(), nullable=True, default=None)
@@ -27,6 +47,23 @@ class Game(db.Model):
 
     white_time_left = db.Column(db.Integer(), default=600) # 60 seconds
     black_time_left = db.Column(db.Integer(), default=600)
+    # key into utils/timeControls.TIME_CONTROLS; seconds added after each move
+    time_control = db.Column(db.String(10), nullable=False, default='10+0', server_default='10+0', index=True)
+    increment_seconds = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+
+    # number of plies played; bumped in the same UPDATE that writes current_fen
+    ply_count = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+    # packed 64-bit Zobrist keys of every position, see utils/positionHistory.py;
+    # written when the game ends (live games rebuild it by replaying move_data)
+    position_keys = db.Column(db.LargeBinary(), nullable=True, default=None)
+    # packed 16-bit moves and per-ply clock usage, see utils/moveCodec.py;
+    # NULL for games whose moves still live in the moves table
+    move_data = db.Column(db.LargeBinary(), nullable=True, default=None)
+    clock_data = db.Column(db.LargeBinary(), nullable=True, default=None)
+    # JSON history entry written when the game ends, see utils/gameSummaries.py
+    summary = db.Column(db.Text(), nullable=True, default=None)
+    # when summary was last written; part of the summary cache key and history ETag
+    summary_at = db.Column(db.DateTime(), nullable=True, default=None)
 
     created_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
@@ -64,5 +101,9 @@ class Game(db.Model):
     @classmethod
     def get_by_id(cls, id):
         return cls.query.get_or_404(id)
-    
-    
+
+    def uci_moves(self):
+        """UCI moves of this game, from the packed blob or the legacy moves rows."""
+        if self.move_data is not None:
+            return decode_ucis(self.move_data)
+        return [m.uci for m in Move.get_moves_by_game_id(self.id)]
@@ -9,8 +9,11 @@ logger = logging.getLogger(__name__)
 
 class Move(db.Model):
     __tablename__ = 'moves'
+    # one row per ply; also serves game_id lookups ordered by move_number
+    __table_args__ = (db.UniqueConstraint('game_id', 'move_number', name='uq_move_game_ply'),)
+
     id = db.Column(db.Integer(), primary_key=True, index=True)
-    game_id = db.Column(db.Integer(), db.ForeignKey('games.id'), nullable=False, index=True)
+    game_id = db.Column(db.Integer(), db.ForeignKey('games.id'), nullable=False)
     move_number = db.Column(db.Integer(), nullable=False)
     uci = db.Column(db.String(), nullable=False)  # Universal Chess Interface notation
     created_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
@@ -9,7 +9,11 @@ logger = logging.getLogger(__name__)
 class Queue(db.Model):
     __tablename__ = 'queue'
     id = db.Column(db.Integer(), primary_key=True, index=True)
-    user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False, unique=True, index=True)
+    # rating when the player joined; pairing passes read the queue in this order
+    rating = db.Column(db.Integer(), nullable=False, default=1200, index=True)
+    # pool the player is waiting in, see utils/timeControls.py
+    time_control = db.Column(db.String(10), nullable=False, default='10+0', index=True)
     created_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
 
     def __repr__(self):
@@ -0,0 +1,44 @@
+# backend/api/models/ratings.py
+from ..utils import db
+from sqlalchemy import case, update
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DailyRating(db.Model):
+    """One row per user per (UTC) day they had a rating change: the day's
+    opening, closing, lowest and highest rating and the number of changes."""
+    __tablename__ = 'daily_ratings'
+    user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date(), primary_key=True)
+    open_elo = db.Column(db.Integer(), nullable=False)
+    close_elo = db.Column(db.Integer(), nullable=False)
+    min_elo = db.Column(db.Integer(), nullable=False)
+    max_elo = db.Column(db.Integer(), nullable=False)
+    changes = db.Column(db.Integer(), nullable=False, default=1)
+
+    def __repr__(self):
+        return f"DailyRating {self.user_id} | Day: {self.day} | Close: {self.close_elo} | Changes: {self.changes}"
+
+    @classmethod
+    def record(cls, user_id, elo, at):
+        """Fold a new rating into the user's rollup for the day of ``at``.
+
+        Does not commit; call it inside the transaction that writes the
+        matching EloEntry. Callers must hold the user's row lock (as
+        finalize_game does) so two changes on the same day cannot race.
+        """
+        day = at.date()
+        result = db.session.execute(
+            update(cls).where(
+                (cls.user_id == user_id) & (cls.day == day)
+            ).values(
+                close_elo=elo,
+                min_elo=case((cls.min_elo < elo, cls.min_elo), else_=elo),
+                max_elo=case((cls.max_elo > elo, cls.max_elo), else_=elo),
+                changes=cls.changes + 1,
+            )
+        )
+        if result.rowcount == 0:
+            db.session.add(cls(user_id=user_id, day=day, open_elo=elo, close_elo=elo,
+                               min_elo=elo, max_elo=elo, changes=1))
@@ -0,0 +1,203 @@
+# backend/api/models/stats.py
+from ..utils import db
+from sqlalchemy import case, update
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Outcome -> name of its counter columns (wins, white_wins, black_wins, ...).
+COUNTERS = {'win': 'wins', 'loss': 'losses', 'draw': 'draws'}
+
+
+class UserStats(db.Model):
+    """Running totals of a user's finished games, kept by finalize_game.
+
+    ``streak`` is the current run of results: +n after n wins in a row, -n
+    after n losses in a row, 0 after a draw.
+    """
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer(), db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    games = db.Column(db.Integer(), nullable=False, default=0)
+    wins = db.Column(db.Integer(), nullable=False, default=0)
+    losses = db.Column(db.Integer(), nullable=False, default=0)
+    draws = db.Column(db.Integer(), nullable=False, default=0)
+    white_wins = db.Column(db.Integer(), nullable=False, default=0)
+    white_losses = db.Column(db.Integer(), nullable=False, default=0)
+    white_draws = db.Column(db.Integer(), nullable=False, default=0)
+    black_wins = db.Column(db.Integer(), nullable=False, default=0)
+    black_losses = db.Column(db.Integer(), nullable=False, default=0)
+    black_draws = db.Column(db.Integer(), nullable=False, default=0)
+    streak = db.Column(db.Integer(), nullable=False, default=0)
+    best_win_streak = db.Column(db.Integer(), nullable=False, default=0)
+    last_game_at = db.Column(db.DateTime(), nullable=True)
+
+    def __repr__(self):
+        return f"UserStats {self.user_id} | +{self.wins} ={self.draws} -{self.losses} | Streak: {self.streak}"
+
+    @staticmethod
+    def outcome_for(user_id, winner_id):
+        """'win', 'loss' or 'draw' for ``user_id`` in a game won by ``winner_id``."""
+        if winner_id is None:
+            return 'draw'
+        return 'win' if winner_id == user_id else 'loss'
+
+    def to_dict(self):
+        return {
+            'games': self.games,
+            'wins': self.wins,
+            'losses': self.losses,
+            'draws': self.draws,
+            'white': {'wins': self.white_wins, 'losses': self.white_losses, 'draws': self.white_draws},
+            'black': {'wins': self.black_wins, 'losses': self.black_losses, 'draws': self.black_draws},
+            'streak': self.streak,
+            'best_win_streak': self.best_win_streak,
+            'last_game_at': self.last_game_at.isoformat() if self.last_game_at else None,
+        }
+
+    @classmethod
+    def blank(cls, user_id):
+        """Unsaved row with every counter at zero."""
+        return cls(user_id=user_id, games=0, wins=0, losses=0, draws=0, white_wins=0, white_losses=0,
+                   white_draws=0, black_wins=0, black_losses=0, black_draws=0, streak=0, best_win_streak=0)
+
+    def count(self, color, outcome, at):
+        """Apply one game to this (in-memory) row; the Python twin of ``record``."""
+        total = COUNTERS[outcome]
+        self.games += 1
+        setattr(self, total, getattr(self, total) + 1)
+        setattr(self, f'{color}_{total}', getattr(self, f'{color}_{total}') + 1)
+        if outcome == 'win':
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            self.best_win_streak = max(self.best_win_streak, self.streak)
+        elif outcome == 'loss':
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+        else:
+            self.streak = 0
+        self.last_game_at = at
+
+    @classmethod
+    def record(cls, user_id, color, outcome, at):
+        """Count one finished game for ``user_id``, who played ``color`` and got ``outcome``.
+
+        Does not commit; call it inside the transaction that finalizes the
+        game. Callers must hold the user's row lock (as finalize_game does)
+        so two games ending at once for the same player cannot race.
+        """
+        total = COUNTERS[outcome]
+        by_color = f'{color}_{total}'
+        if outcome == 'win':
+            streak = case((cls.streak > 0, cls.streak + 1), else_=1)
+            best = case((streak > cls.best_win_streak, streak), else_=cls.best_win_streak)
+        elif outcome == 'loss':
+            streak = case((cls.streak < 0, cls.streak - 1), else_=-1)
+            best = cls.best_win_streak
+        else:
+            streak = 0
+            best = cls.best_win_streak
+
+        result = db.session.execute(
+            update(cls).where(cls.user_id == user_id).values({
+                cls.games: cls.games + 1,
+                getattr(cls, total): getattr(cls, total) + 1,
+                getattr(cls, by_color): getattr(cls, by_color) + 1,
+                cls.streak: streak,
+                cls.best_win_streak: best,
+                cls.last_game_at: at,
+            })
+        )
+        if result.rowcount == 0:
+            row = cls.blank(user_id)
+            row.count(color, outcome, at)
+            db.session.add(row)
+
+
+class HeadToHead(db.Model):
+    """Running totals of the finished games between two players.
+
+    One row per pair, keyed (smaller user id, larger user id) like
+    ``Game.pair_low_id``/``pair_high_id``; ``*_rating_change`` is the sum of
+    that player's rating changes over those games.
+    """
+    __tablename__ = 'head_to_head'
+    low_user_id = db.Column(db.Integer(), db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    high_user_id = db.Column(db.Integer(), db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    games = db.Column(db.Integer(), nullable=False, default=0)
+    low_wins = db.Column(db.Integer(), nullable=False, default=0)
+    high_wins = db.Column(db.Integer(), nullable=False, default=0)
+    draws = db.Column(db.Integer(), nullable=False, default=0)
+    low_rating_change = db.Column(db.Integer(), nullable=False, default=0)
+    high_rating_change = db.Column(db.Integer(), nullable=False, default=0)
+    last_game_at = db.Column(db.DateTime(), nullable=True)
+
+    def __repr__(self):
+        return f"HeadToHead {self.low_user_id} vs {self.high_user_id} | +{self.low_wins} ={self.draws} -{self.high_wins}"
+
+    @classmethod
+    def blank(cls, user_id, opponent_id):
+        """Unsaved row with every counter at zero."""
+        low, high = sorted((user_id, opponent_id))
+        return cls(low_user_id=low, high_user_id=high, games=0, low_wins=0, high_wins=0, draws=0,
+                   low_rating_change=0, high_rating_change=0)
+
+    @classmethod
+    def get(cls, user_id, opponent_id):
+        """The pair's row, or a blank one when they never finished a game."""
+        low, high = sorted((user_id, opponent_id))
+        return db.session.get(cls, (low, high)) or cls.blank(low, high)
+
+    def count(self, white_user_id, winner_id, white_change, black_change, at):
+        """Apply one game to this (in-memory) row; the Python twin of ``record``."""
+        low_is_white = white_user_id == self.low_user_id
+        self.games += 1
+        if winner_id is None:
+            self.draws += 1
+        elif winner_id == self.low_user_id:
+            self.low_wins += 1
+        else:
+            self.high_wins += 1
+        self.low_rating_change += white_change if low_is_white else black_change
+        self.high_rating_change += black_change if low_is_white else white_change
+        self.last_game_at = at
+
+    def as_seen_by(self, user_id):
+        """Counters from ``user_id``'s side of the pair."""
+        mine, theirs = ('low', 'high') if user_id == self.low_user_id else ('high', 'low')
+        return {
+            'games': self.games,
+            'wins': getattr(self, f'{mine}_wins'),
+            'losses': getattr(self, f'{theirs}_wins'),
+            'draws': self.draws,
+            'rating_change': getattr(self, f'{mine}_rating_change'),
+            'opponent_rating_change': getattr(self, f'{theirs}_rating_change'),
+            'last_game_at': self.last_game_at.isoformat() if self.last_game_at else None,
+        }
+
+    @classmethod
+    def record(cls, white_user_id, black_user_id, winner_id, white_change, black_change, at):
+        """Count one finished game between the two players.
+
+        Does not commit; call it inside the transaction that finalizes the
+        game, while holding both players' row locks (as finalize_game does).
+        """
+        low, high = sorted((white_user_id, black_user_id))
+        low_change, high_change = (white_change, black_change) if white_user_id == low else (black_change, white_change)
+        values = {
+            cls.games: cls.games + 1,
+            cls.low_rating_change: cls.low_rating_change + low_change,
+            cls.high_rating_change: cls.high_rating_change + high_change,
+            cls.last_game_at: at,
+        }
+        if winner_id is None:
+            values[cls.draws] = cls.draws + 1
+        elif winner_id == low:
+            values[cls.low_wins] = cls.low_wins + 1
+        else:
+            values[cls.high_wins] = cls.high_wins + 1
+
+        result = db.session.execute(
+            update(cls).where((cls.low_user_id == low) & (cls.high_user_id == high)).values(values)
+        )
+        if result.rowcount == 0:
+            row = cls.blank(low, high)
+            row.count(white_user_id, winner_id, white_change, black_change, at)
+            db.session.add(row)
@@ -5,17 +5,39 @@ import json
 from datetime import datetime
 import logging
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import validates
 
 logger = logging.getLogger(__name__)
 
+
+def _username_lower_default(context):
+    # covers Core inserts (imports, simulations); ORM objects go through validates
+    return context.get_current_parameters()['username'].lower()
+
+
 class User(db.Model):
     __tablename__ = 'users'
+    # prefix search pages through (username_lower, id)
+    __table_args__ = (db.Index('ix_users_username_lower_id', 'username_lower', 'id'),)
     id = db.Column(db.Integer(), primary_key=True, index=True)
     username = db.Column(db.String(50), unique=True, nullable=False, index=True)
+    # lowercased username for case-insensitive prefix search. On Postgres it
+    # uses the C collation, so every prefix is one contiguous btree range.
+    username_lower = db.Column(
+        db.String(50).with_variant(db.String(50, collation='C'), 'postgresql'),
+        nullable=False, default=_username_lower_default
+    )
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(128), nullable=False)
     created_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
+    # current rating, kept in step with the newest EloEntry by finalize_game
+    elo = db.Column(db.Integer(), nullable=False, default=1200, server_default='1200', index=True)
+
+    @validates('username')
+    def _normalize_username(self, key, username):
+        self.username_lower = username.lower() if username is not None else None
+        return username
 
     def __repr__(self):
         return f"User {self.id} | Username: {self.username} | Email: {self.email}"
@@ -53,4 +75,18 @@ class User(db.Model):
     
     @classmethod
     def get_by_username(cls, username):
-        return cls.query.filter_by(username=username).first()
\ No newline at end of file
+        return cls.query.filter_by(username=username).first()
+
+    @classmethod
+    def get_elo_map(cls, user_ids, for_update=False):
+        """Return a map user_id -> current rating for the given user_ids.
+
+        With ``for_update`` the rows are locked until the transaction ends, so
+        two games finishing at once for the same player apply in turn.
+        """
+        if not user_ids:
+            return {}
+        q = db.session.query(cls.id, cls.elo).filter(cls.id.in_(user_ids))
+        if for_update:
+            q = q.with_for_update()
+        return dict(q.all())
@@ -4,21 +4,34 @@ from http import HTTPStatus
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.exceptions import NotFound
 from sqlalchemy.exc import IntegrityError
+import hashlib
+import json
 import logging
 
 from ..models.users import User
 from ..models.games import Game
-from ..models.elo import EloEntry
-from flask import request
+from flask import current_app, request, Response, stream_with_context
 from werkzeug.security import generate_password_hash
 from ..models.friendships import Friendship
 from ..models.friendships import FriendshipStatus
-from ..models.moves import Move
+from ..models.stats import UserStats
 from ..utils import db
-from sqlalchemy import func
+from ..utils.gameExport import EXPORT_FORMATS, stream_export
+from ..utils.gameSummaries import game_summaries, load_moves
+from ..utils.headToHead import DEFAULT_RECENT, MAX_RECENT, head_to_head
+from ..utils.leaderboard import leaderboard
+from ..utils.ratingHistory import rating_history, DEFAULT_POINTS, MAX_POINTS
+from ..utils.userSearch import user_search
+from ..utils.pagination import after, decode_cursor, encode_cursor, page_args, total_headers
+from ..utils.presence import presence
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, union_all
 
 logger = logging.getLogger(__name__)
 
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
 
 users_namespace = Namespace('users', description = "namespace for users")
 
@@ -49,6 +62,44 @@ game_list_model = users_namespace.model('GameListElement', {
     'winner_id': fields.Integer(description='Winner User ID, null if draw or ongoing'),
 })
 
+rating_point_model = users_namespace.model('RatingPoint', {
+    't': fields.DateTime(description='Time of the rating (start of day for daily points)'),
+    'elo': fields.Integer(description='Rating at that time (closing rating for daily points)'),
+    'min_elo': fields.Integer(description='Lowest rating that day, daily points only'),
+    'max_elo': fields.Integer(description='Highest rating that day, daily points only'),
+})
+
+rating_history_model = users_namespace.model('RatingHistory', {
+    'user_id': fields.Integer(description='User ID'),
+    'source': fields.String(description='raw or daily'),
+    'points': fields.List(fields.Nested(rating_point_model)),
+})
+
+head_to_head_game_model = users_namespace.model('HeadToHeadGame', {
+    'id': fields.Integer(description='Game ID'),
+    'created_at': fields.String(description='Game creation timestamp'),
+    'color': fields.String(description="The user's colour: white or black"),
+    'result': fields.String(description="The user's result: win, loss or draw"),
+    'winner_id': fields.Integer(description='Winner User ID, null if draw'),
+    'elo': fields.Integer(description="The user's rating after the game"),
+    'opponent_elo': fields.Integer(description="The opponent's rating after the game"),
+    'rating_change': fields.Integer(description="The user's rating change from the game"),
+    'opponent_rating_change': fields.Integer(description="The opponent's rating change from the game"),
+})
+
+head_to_head_model = users_namespace.model('HeadToHead', {
+    'user_id': fields.Integer(description='User ID'),
+    'opponent_id': fields.Integer(description='Opponent User ID'),
+    'games': fields.Integer(description='Finished games between the two'),
+    'wins': fields.Integer(description='Games the user won'),
+    'losses': fields.Integer(description='Games the opponent won'),
+    'draws': fields.Integer(description='Drawn games'),
+    'rating_change': fields.Integer(description="The user's total rating change over these games"),
+    'opponent_rating_change': fields.Integer(description="The opponent's total rating change over these games"),
+    'last_game_at': fields.String(description='When their last game ended'),
+    'recent': fields.List(fields.Nested(head_to_head_game_model)),
+})
+
 
 @users_namespace.route('/users/<int:user_id>')
 class UserInfoAndStatus(Resource):
@@ -63,15 +114,15 @@ class UserInfoAndStatus(Resource):
                 (Game.in_progress == True)
             ).first() is not None
 
-            elo_entry = EloEntry.query.filter_by(user_id=user.id).order_by(EloEntry.created_at.desc()).first()
-            elo = elo_entry.elo if elo_entry else 'N/A'
+            stats = db.session.get(UserStats, user.id) or UserStats.blank(user.id)
 
             return {
                 'id': user.id,
                 'username': user.username,
                 'email': user.email,
                 'in_game': in_game,
-                'elo': elo
+                'elo': user.elo,
+                'stats': stats.to_dict()
             }, HTTPStatus.OK
         except NotFound:
             return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
@@ -98,6 +149,7 @@ class UserInfoAndStatus(Resource):
         except NotFound:
             return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
 
+        old_username = user.username
         try:
             if 'username' in data:
                 user.username = data['username']
@@ -112,6 +164,9 @@ class UserInfoAndStatus(Resource):
                 logger.exception('Integrity error updating user')
                 return {'message': 'Username or email already taken'}, HTTPStatus.CONFLICT
 
+            if user.username != old_username:
+                user_search.invalidate(old_username)
+                user_search.invalidate(user.username)
             return {'message': 'User updated successfully'}, HTTPStatus.OK
         except Exception as e:
             logger.exception('Failed to update user')
@@ -132,7 +187,10 @@ class UserInfoAndStatus(Resource):
             return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
 
         try:
+            username = user.username
             user.delete()
+            leaderboard.remove(user_id)
+            user_search.invalidate(username)
             return {'message': 'User deleted successfully'}, HTTPStatus.OK
         except Exception as e:
             logger.exception('Failed to delete user')
@@ -143,67 +201,65 @@ class GetFriendsOfUser(Resource):
     
 
     def get(self, user_id):
-        """ get json list of friends of user with user_id"""
-        limit = request.args.get('limit', type=int)
-        offset = request.args.get('offset', type=int)
-
-        # Base query for accepted friendships involving the user
-        base_q = Friendship.query.filter(
-            ((Friendship.user1_id == user_id) | (Friendship.user2_id == user_id)) &
-            (Friendship.status == FriendshipStatus.ACCEPTED)
-        ).order_by(Friendship.created_at.desc())
-
-        total_count = base_q.count()
-
-        if offset is not None:
-            base_q = base_q.offset(offset)
+        """ get json list of friends of user with user_id, newest friendship first.
+        Query params: limit, then either offset or cursor (from X-Next-Cursor), total=exact|approx"""
+        limit, offset, cursor = page_args(request.args)
+        key = decode_cursor(cursor, 2) if cursor else None
+
+        def side(mine, theirs):
+            # one branch per column the user can sit in, each read from its own index
+            q = select(Friendship.id, Friendship.created_at, theirs.label('friend_id')).where(
+                (mine == user_id) & (Friendship.status == FriendshipStatus.ACCEPTED)
+            )
+            if key is not None:
+                q = q.where(after((Friendship.created_at, Friendship.id), key, descending=True))
+            q = q.order_by(Friendship.created_at.desc(), Friendship.id.desc())
+            if limit is not None:
+                q = q.limit(limit + (offset or 0))
+            return select(q.subquery())
+
+        both = union_all(
+            side(Friendship.user1_id, Friendship.user2_id),
+            side(Friendship.user2_id, Friendship.user1_id)
+        ).subquery()
+        # friends come with their current rating in the same query
+        page_q = select(both.c.id, both.c.created_at, User.id, User.username, User.elo).join(
+            User, User.id == both.c.friend_id
+        ).order_by(both.c.created_at.desc(), both.c.id.desc())
+        if offset:
+            page_q = page_q.offset(offset)
         if limit is not None:
-            base_q = base_q.limit(limit)
-
-        friendListFetch = base_q.all()
-
-        if not friendListFetch:
-            return [], HTTPStatus.OK, {'X-Total-Count': total_count}
-
-        # Determine friend user ids in the same order as friendships
-        friendIds = [entry.user1_id if entry.user1_id != user_id else entry.user2_id for entry in friendListFetch]
-
-        # Fetch users and elos in bulk to avoid N+1 queries
-        users = User.query.filter(User.id.in_(friendIds)).all()
-
-        # Map user id -> user object
-        user_by_id = {u.id: u for u in users}
-
-        elo_by_user = {}
-        if friendIds:
-            # subquery to get latest created_at per user
-            latest_sq = db.session.query(
-                EloEntry.user_id.label('user_id'),
-                func.max(EloEntry.created_at).label('max_created')
-            ).filter(EloEntry.user_id.in_(friendIds)).group_by(EloEntry.user_id).subquery()
-
-            latest_elos = db.session.query(EloEntry).join(
-                latest_sq,
-                (EloEntry.user_id == latest_sq.c.user_id) & (EloEntry.created_at == latest_sq.c.max_created)
-            ).all()
-
-            for e in latest_elos:
-                elo_by_user[e.user_id] = e.elo
+            page_q = page_q.limit(limit)
+        rows = db.session.execute(page_q).all()
+        # presence comes from this process's socket registry, not the database
+        statuses = presence.lookup([row[2] for row in rows])
 
         response = []
-        for idx, friendship in enumerate(friendListFetch):
-            fid = friendIds[idx]
-            friend = user_by_id.get(fid)
-            if not friend:
-                continue
+        for friendship_id, _, friend_id, username, elo in rows:
+            status = statuses[friend_id]
             response.append({
-                'id': friend.id,
-                'friendshipId': friendship.id,
-                'username': friend.username,
-                'elo': elo_by_user.get(friend.id, 'N/A')
+                'id': friend_id,
+                'friendshipId': friendship_id,
+                'username': username,
+                'elo': elo,
+                'online': status['online'],
+                'in_game': status['in_game'],
+                'last_seen': status['last_seen']
             })
 
-        return response, HTTPStatus.OK, {'X-Total-Count': total_count}
+        headers = {}
+        if limit is not None and len(rows) == limit:
+            headers['X-Next-Cursor'] = encode_cursor(rows[-1][1], rows[-1][0])
+        # older clients paging by offset always got the exact count
+        total_mode = request.args.get('total', 'exact' if offset is not None else None)
+        if total_mode is not None:
+            count_q = select(Friendship.id).where(
+                ((Friendship.user1_id == user_id) | (Friendship.user2_id == user_id)) &
+                (Friendship.status == FriendshipStatus.ACCEPTED)
+            )
+            headers.update(total_headers(count_q, total_mode))
+
+        return response, HTTPStatus.OK, headers
 
 @users_namespace.route('/users/<int:user_id>/friends/pending')
 class GetPendingFriendsRequestsToUser(Resource):
@@ -242,123 +298,185 @@ class GetPendingFriendsRequestsToUser(Resource):
 @users_namespace.route('/users/<int:user_id>/history')
 class GetGameHistoryOfUser(Resource):
 
-    @users_namespace.marshal_list_with(game_list_model)
+    @users_namespace.response(HTTPStatus.OK, 'Success', [game_list_model])
     def get(self, user_id):
-        """get game history for a user. Supports pagination via ?limit=&offset="""
+        """get game history for a user, newest first.
+        Supports pagination via ?limit= with ?offset= or ?cursor= (from X-Next-Cursor),
+        and ?fields=summary to leave out the move lists. Honours If-None-Match."""
 
-        limit = request.args.get('limit', type=int)
-        offset = request.args.get('offset', type=int)
+        limit, offset, cursor = page_args(request.args)
+        fields_param = request.args.get('fields', 'full')
+        if fields_param not in ('full', 'summary'):
+            return {'message': "fields must be 'full' or 'summary'"}, HTTPStatus.BAD_REQUEST
+        with_moves = fields_param == 'full'
+        key = decode_cursor(cursor, 2) if cursor else None
 
         user = User.get_by_id(user_id)
         if not user:
             return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
 
-        games_as_white = Game.query.filter_by(white_user_id=user_id)
-        games_as_black = Game.query.filter_by(black_user_id=user_id)
+        def side(column):
+            # each colour is read newest-first from its (user, created_at, id) index
+            q = select(Game.id, Game.created_at, Game.summary_at).where(column == user_id)
+            if key is not None:
+                q = q.where(after((Game.created_at, Game.id), key, descending=True))
+            q = q.order_by(Game.created_at.desc(), Game.id.desc())
+            if limit is not None:
+                q = q.limit(limit + (offset or 0))
+            return select(q.subquery())
+
+        both = union_all(side(Game.white_user_id), side(Game.black_user_id)).subquery()
+        page_q = select(both.c.id, both.c.created_at, both.c.summary_at).order_by(both.c.created_at.desc(), both.c.id.desc())
+        if offset:
+            page_q = page_q.offset(offset)
+        if limit is not None:
+            page_q = page_q.limit(limit)
+        page = db.session.execute(page_q).all()
+        versions = {gid: summary_at for gid, _, summary_at in page}
+        game_ids = list(versions)
+
+        # Finished games come pre-serialized from the summary cache; only
+        # games still being played are assembled from their rows
+        finished = game_summaries.fetch(versions)
+        moves_by_game = load_moves(game_ids) if with_moves else {}
+        live_ids = [gid for gid in game_ids if gid not in finished]
+        live = {}
+        if live_ids:
+            for g in db.session.execute(
+                select(Game.id, Game.in_progress, Game.white_user_id, Game.black_user_id, Game.winner_id, Game.created_at)
+                .where(Game.id.in_(live_ids))
+            ):
+                live[g.id] = {
+                    'id': g.id,
+                    'in_progress': g.in_progress,
+                    'white_user_id': g.white_user_id,
+                    'black_user_id': g.black_user_id,
+                    'white_elo': None,
+                    'black_elo': None,
+                    'created_at': g.created_at.isoformat() if g.created_at else None,
+                    'winner_id': g.winner_id,
+                }
+
+        # Usernames can change, so they are looked up fresh for the page
+        entries = [finished.get(gid) or live.get(gid) for gid in game_ids]
+        entries = [e for e in entries if e is not None]
+        user_ids = {e[key] for e in entries for key in ('white_user_id', 'black_user_id')}
+        username_by_id = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids))) if user_ids else {}
 
-        all_games_query = games_as_white.union_all(games_as_black).order_by(Game.created_at.desc())
+        all_games_formatted = []
+        for summary in entries:
+            game_data = dict(summary)
+            game_data['white_username'] = username_by_id.get(summary['white_user_id'])
+            game_data['black_username'] = username_by_id.get(summary['black_user_id'])
+            if with_moves:
+                game_data['moves'] = moves_by_game.get(summary['id'], [])
+            all_games_formatted.append(game_data)
 
-        if offset is not None:
-            all_games_query = all_games_query.offset(offset)
-        if limit is not None:
-            all_games_query = all_games_query.limit(limit)
+        response = current_app.response_class(json.dumps(all_games_formatted), mimetype='application/json')
+        if limit is not None and len(page) == limit:
+            response.headers['X-Next-Cursor'] = encode_cursor(page[-1][1], page[-1][0])
+        # clients revalidate with If-None-Match and get a bodyless 304 while
+        # nothing changed; the summary stamps make a rebuilt page a new version
+        response.headers['Cache-Control'] = 'private, no-cache'
+        etag = hashlib.sha1(response.get_data())
+        etag.update(','.join(f'{gid}@{at.isoformat() if at else "-"}' for gid, at in versions.items()).encode())
+        response.set_etag(etag.hexdigest())
+        return response.make_conditional(request)
+
+
+@users_namespace.route('/users/<int:user_id>/rating-history')
+class GetRatingHistoryOfUser(Resource):
 
-        all_games = all_games_query.all()
+    def get(self, user_id):
+        """Rating over time, downsampled for charts. Query params: from, to (ISO dates, to inclusive), points (default 500)"""
+        try:
+            start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+            # the whole ``to`` day is included: stop at the following midnight
+            end = (datetime.combine(datetime.fromisoformat(request.args['to']).date(), datetime.min.time())
+                   + timedelta(days=1)) if request.args.get('to') else None
+        except ValueError:
+            return {'message': 'from and to must be ISO 8601 dates'}, HTTPStatus.BAD_REQUEST
+        points = min(max(request.args.get('points', DEFAULT_POINTS, type=int), 3), MAX_POINTS)
 
-        # Bulk-fetch related data to avoid N+1 queries
-        game_ids = [g.id for g in all_games]
+        try:
+            User.get_by_id(user_id)
+        except NotFound:
+            return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
 
-        # Moves grouped by game_id
-        moves_q = Move.query.filter(Move.game_id.in_(game_ids)).order_by(Move.move_number).all() if game_ids else []
-        moves_by_game = {}
-        for m in moves_q:
-            moves_by_game.setdefault(m.game_id, []).append(m.uci)
+        source, history = rating_history(user_id, start, end, points)
+        return users_namespace.marshal(
+            {'user_id': user_id, 'source': source, 'points': history}, rating_history_model
+        ), HTTPStatus.OK
 
-        # Fetch all involved users in bulk
-        user_ids = set()
-        for g in all_games:
-            user_ids.add(g.white_user_id)
-            user_ids.add(g.black_user_id)
-        users = User.query.filter(User.id.in_(list(user_ids))).all() if user_ids else []
-        username_by_id = {u.id: u.username for u in users}
 
-        # Fetch Elo entries tied to these games (game-specific elos)
-        elo_entries = EloEntry.query.filter(EloEntry.game_id.in_(game_ids)).all() if game_ids else []
-        elo_by_user_game = {}
-        for e in elo_entries:
-            elo_by_user_game[(e.user_id, e.game_id)] = e.elo
+@users_namespace.route('/users/<int:user_id>/vs/<int:opponent_id>')
+class GetHeadToHead(Resource):
 
-        all_games_formatted = []
-        for game in all_games:
-            moves = moves_by_game.get(game.id, [])
-            white_username = username_by_id.get(game.white_user_id)
-            black_username = username_by_id.get(game.black_user_id)
-            white_elo = elo_by_user_game.get((game.white_user_id, game.id))
-            black_elo = elo_by_user_game.get((game.black_user_id, game.id))
-
-            game_data = {
-                'id': game.id,
-                'in_progress': game.in_progress,
-                'white_user_id': game.white_user_id,
-                'black_user_id': game.black_user_id,
-                'white_username': white_username,
-                'black_username': black_username,
-                'white_elo': white_elo,
-                'black_elo': black_elo,
-                'created_at': game.created_at,
-                'moves': moves,
-                'winner_id': game.winner_id
-            }
-            all_games_formatted.append(game_data)
+    @users_namespace.response(HTTPStatus.OK, 'Success', head_to_head_model)
+    def get(self, user_id, opponent_id):
+        """Record of a user against an opponent, with their latest games. Query param: limit (default 10)"""
+        if user_id == opponent_id:
+            return {'message': 'A user has no record against themselves'}, HTTPStatus.BAD_REQUEST
+        recent = min(max(request.args.get('limit', DEFAULT_RECENT, type=int), 0), MAX_RECENT)
 
-        return all_games_formatted, HTTPStatus.OK
+        found = db.session.scalar(select(func.count(User.id)).where(User.id.in_((user_id, opponent_id))))
+        if found != 2:
+            return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
 
+        return users_namespace.marshal(head_to_head(user_id, opponent_id, recent), head_to_head_model), HTTPStatus.OK
 
-@users_namespace.route('/users/search')
-class SearchUsers(Resource):
 
-    def get(self):
-        """Search users by username prefix. Query params: q, limit, offset"""
-        q = request.args.get('q', '').strip()
-        limit = request.args.get('limit', type=int)
-        offset = request.args.get('offset', type=int)
+@users_namespace.route('/users/<int:user_id>/export')
+class ExportGamesOfUser(Resource):
 
-        if q == '':
-            return {'message': 'Query parameter q required'}, HTTPStatus.BAD_REQUEST
+    def get(self, user_id):
+        """Stream every finished game of a user. Query params: format=pgn|ndjson (default pgn)"""
+        fmt = request.args.get('format', 'pgn').lower()
+        if fmt not in EXPORT_FORMATS:
+            return {'message': f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}"}, HTTPStatus.BAD_REQUEST
 
-        base_q = User.query.filter(User.username.ilike(f"{q}%")).order_by(User.username.asc())
+        try:
+            user = User.get_by_id(user_id)
+        except NotFound:
+            return {'message': 'User not found'}, HTTPStatus.NOT_FOUND
 
-        total_count = base_q.count()
+        _, mimetype = EXPORT_FORMATS[fmt]
+        # no Content-Length: the body is sent with chunked transfer encoding
+        return Response(
+            stream_with_context(stream_export(user.id, fmt)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{user.username}_games.{fmt}"'}
+        )
 
-        if offset is not None:
-            base_q = base_q.offset(offset)
-        if limit is not None:
-            base_q = base_q.limit(limit)
 
-        users = base_q.all()
+@users_namespace.route('/users/search')
+class SearchUsers(Resource):
 
-        result = []
-        user_ids = [u.id for u in users]
+    def get(self):
+        """Search users by username prefix, case-insensitively.
+        Query params: q, limit (default 20, max 100), then either offset or cursor (from X-Next-Cursor)
 
-        elo_by_user = {}
-        if user_ids:
-            latest_sq = db.session.query(
-                EloEntry.user_id.label('user_id'),
-                func.max(EloEntry.created_at).label('max_created')
-            ).filter(EloEntry.user_id.in_(user_ids)).group_by(EloEntry.user_id).subquery()
+        X-Total-Count is capped at 1000 matches (or the end of the requested
+        page); it is sent for the first page and offset pages, and omitted for
+        cursor pages.
+        """
+        q = request.args.get('q', '').strip()
+        limit, offset, cursor = page_args(request.args, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT)
 
-            latest_elos = db.session.query(EloEntry).join(
-                latest_sq,
-                (EloEntry.user_id == latest_sq.c.user_id) & (EloEntry.created_at == latest_sq.c.max_created)
-            ).all()
+        if q == '':
+            return {'message': 'Query parameter q required'}, HTTPStatus.BAD_REQUEST
 
-            for e in latest_elos:
-                elo_by_user[e.user_id] = e.elo
+        key = decode_cursor(cursor, 2) if cursor else None
+        rows, total_count = user_search.search(q, limit, offset or 0, key)
 
-        for u in users:
-            result.append({'id': u.id, 'username': u.username, 'elo': elo_by_user.get(u.id, 'N/A')})
+        result = []
+        for user_id, username, elo, _ in rows:
+            result.append({'id': user_id, 'username': username, 'elo': elo})
 
-        return result, HTTPStatus.OK, {'X-Total-Count': total_count}
+        headers = {} if total_count is None else {'X-Total-Count': total_count}
+        if len(rows) == limit:
+            headers['X-Next-Cursor'] = encode_cursor(rows[-1][3], rows[-1][0])
+        return result, HTTPStatus.OK, headers
 
 
 
@@ -1,7 +1,7 @@
 # backend/api/utils/__init__.py
 from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO, join_room, leave_room
-from flask import session
+from flask import request, session
 from flask_jwt_extended import decode_token
 import logging
 
@@ -10,6 +10,9 @@ logger = logging.getLogger(__name__)
 db = SQLAlchemy()
 socketio = SocketIO(cors_allowed_origins="*")
 
+# needs db and socketio defined above
+from .presence import presence  # noqa: E402
+
 
 @socketio.on('connect')
 def handle_connect(auth):
@@ -34,6 +37,16 @@ def handle_connect(auth):
         logger.exception('Socket connect authentication failed')
         raise ConnectionRefusedError('invalid token')
 
+    if session.get('user_id'):
+        presence.connect(session['user_id'], request.sid)
+
+
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    user_id = session.get('user_id')
+    if user_id:
+        presence.disconnect(user_id, request.sid)
+
 
 
 @socketio.on('join_game')
@@ -0,0 +1,154 @@
+# backend/api/utils/clockScheduler.py
+from . import socketio
+from .liveGames import live_games
+from .gameFinalization import finalize_game, flag_fall_result
+from .presence import presence
+from ..models.games import Game
+from werkzeug.exceptions import Conflict, HTTPException
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long the loop sleeps when nothing is due; new deadlines
+# wake it early, so this only matters if a wakeup is ever missed.
+MAX_SLEEP_SECONDS = 1.0
+
+
+class ClockScheduler:
+    """Server-side flag-fall detection.
+
+    Keeps a min-heap of (deadline, game_id, ply) entries, one pushed per move.
+    A Socket.IO background task sleeps until the earliest deadline, then
+    re-checks the live game at millisecond precision and finalizes it if the
+    side to move really has run out of time. Entries for games that have moved
+    on (different ply) or ended are simply discarded when they come due, so
+    nothing ever needs to be removed from the heap.
+
+    Running one scheduler per worker process is safe: finalize_game only lets
+    one caller end a game.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._started = False
+
+    def init_app(self, app):
+        # started by start_background_tasks, only in the serving process
+        self.app = app
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._wakeup = socketio.server.eio.create_event()
+        socketio.start_background_task(self._run)
+        logger.info('Clock scheduler started')
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, game_id, deadline, ply):
+        with self._lock:
+            head = self._heap[0][0] if self._heap else None
+            heapq.heappush(self._heap, (deadline, next(self._counter), game_id, ply))
+        # only the loop's current sleep target can be made stale by a push
+        if self._wakeup is not None and (head is None or deadline < head):
+            self._wakeup.set()
+
+    def schedule_live(self, live):
+        self.schedule(live.id, live.flag_deadline(), live.ply_count)
+
+    def schedule_game(self, game):
+        """Schedule a freshly created or freshly loaded Game row."""
+        fen_turn = game.current_fen.split()[1] if game.current_fen else 'w'
+        seconds_left = game.white_time_left if fen_turn == 'w' else game.black_time_left
+        self.schedule(game.id, game.updated_at + timedelta(seconds=seconds_left), game.ply_count or 0)
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, game_id, ply = heapq.heappop(self._heap)
+                due.append((game_id, ply))
+            next_deadline = self._heap[0][0] if self._heap else None
+        return due, next_deadline
+
+    def _seed(self):
+        """Pick up games that were already running before this process started."""
+        games = Game.query.filter(Game.in_progress == True).all()
+        for game in games:
+            self.schedule_game(game)
+            presence.game_started(game.id, (game.white_user_id, game.black_user_id), notify=False)
+        presence.games_seeded()
+        logger.info('Clock scheduler seeded with %d in-progress games', len(games))
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                self._seed()
+            except Exception:
+                logger.exception('Clock scheduler failed to seed from the database')
+
+        while True:
+            # cleared before looking at the heap so a push that lands while we
+            # are busy makes the wait below return immediately
+            self._wakeup.clear()
+            now = datetime.utcnow()
+            due, next_deadline = self._pop_due(now)
+
+            for game_id, ply in due:
+                try:
+                    with self.app.app_context():
+                        self._check(game_id, ply)
+                except Exception:
+                    logger.exception('Clock scheduler failed to check game %s', game_id)
+
+            if due:
+                continue
+
+            timeout = MAX_SLEEP_SECONDS
+            if next_deadline is not None:
+                timeout = min(timeout, max(0.0, (next_deadline - now).total_seconds()))
+            self._wakeup.wait(timeout)
+
+    def _check(self, game_id, ply):
+        try:
+            live = live_games.get(game_id)
+        except HTTPException:
+            # game was deleted or has already ended
+            return
+
+        with live.lock:
+            if not live.in_progress or live.ply_count != ply:
+                return
+
+            now = datetime.utcnow()
+            w_ms, b_ms = live.clocks_at(now)
+            if w_ms > 0 and b_ms > 0:
+                # woke up early (e.g. the deadline was computed from a rounded clock)
+                self.schedule_live(live)
+                return
+
+            live.charge_clock(now)
+            winner_id, reason = flag_fall_result(live, live.white_ms <= 0)
+            try:
+                finalize_game(live, winner_id, reason)
+            except Conflict:
+                # another worker moved in this game; re-arm from its fresh state
+                game = Game.query.filter(Game.id == game_id).first()
+                if game is not None and game.in_progress:
+                    self.schedule_game(game)
+                return
+            logger.info('Clock scheduler flagged game %s (%s)', game_id, reason)
+
+
+clock_scheduler = ClockScheduler()
@@ -0,0 +1,48 @@
+# backend/api/utils/downsample.py
+
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    ``points`` is a sequence of tuples sorted by x whose first two items are
+    x and y (any further items are carried along untouched). Returns at most
+    ``threshold`` of them, always keeping the first and last point and, from
+    every bucket in between, the point that spans the largest triangle with
+    its neighbours, so peaks and dips survive while flat stretches thin out.
+    """
+    n = len(points)
+    if threshold >= n:
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]][2 - max(threshold, 0):]
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0  # index of the last selected point
+
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # average of the next bucket is the third triangle vertex
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / span
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / span
+
+        ax, ay = points[a][0], points[a][1]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            x, y = points[j][0], points[j][1]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,130 @@
+# backend/api/utils/gameExport.py
+from . import db
+from .moveCodec import decode_moves
+from .timeControls import pgn_time_control
+from ..models.games import Game
+from ..models.moves import Move
+from ..models.users import User
+from ..models.elo import EloEntry
+from sqlalchemy import select
+import chess
+import chess.pgn
+import json
+
+# Games fetched per round trip from the server-side cursor. Related users,
+# Elo entries and legacy moves are fetched once per batch of this size.
+EXPORT_BATCH_SIZE = 500
+
+
+def iter_finished_games(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield (game, context) for every finished game of ``user_id``, oldest first.
+
+    Games are read through a server-side cursor (``yield_per``) so memory stays
+    bounded by one batch no matter how many games the user has. ``context``
+    carries the usernames, per-game Elo and decoded moves for that game.
+    """
+    stmt = select(Game).where(
+        ((Game.white_user_id == user_id) | (Game.black_user_id == user_id)) &
+        (Game.in_progress == False)
+    ).order_by(Game.created_at, Game.id).execution_options(yield_per=batch_size)
+
+    usernames = {}
+    for batch in db.session.execute(stmt).scalars().partitions():
+        game_ids = [g.id for g in batch]
+
+        missing = {g.white_user_id for g in batch} | {g.black_user_id for g in batch}
+        missing -= usernames.keys()
+        if missing:
+            usernames.update(db.session.query(User.id, User.username).filter(User.id.in_(missing)).all())
+
+        elo_by_user_game = {
+            (uid, gid): elo for uid, gid, elo in db.session.query(
+                EloEntry.user_id, EloEntry.game_id, EloEntry.elo
+            ).filter(EloEntry.game_id.in_(game_ids))
+        }
+
+        legacy_ids = [g.id for g in batch if g.move_data is None]
+        legacy_moves = {}
+        if legacy_ids:
+            rows = db.session.query(Move.game_id, Move.uci).filter(
+                Move.game_id.in_(legacy_ids)
+            ).order_by(Move.game_id, Move.move_number)
+            for gid, uci in rows:
+                legacy_moves.setdefault(gid, []).append(chess.Move.from_uci(uci))
+
+        for g in batch:
+            yield g, {
+                'white_username': usernames.get(g.white_user_id),
+                'black_username': usernames.get(g.black_user_id),
+                'white_elo': elo_by_user_game.get((g.white_user_id, g.id)),
+                'black_elo': elo_by_user_game.get((g.black_user_id, g.id)),
+                'moves': decode_moves(g.move_data) if g.move_data is not None else legacy_moves.get(g.id, []),
+            }
+
+        # finished games are never modified; drop them from the identity map
+        db.session.expunge_all()
+
+
+def game_result(game):
+    if game.in_progress:
+        return '*'
+    if game.winner_id is None:
+        return '1/2-1/2'
+    return '1-0' if game.winner_id == game.white_user_id else '0-1'
+
+
+def game_to_pgn(game, context):
+    pgn = chess.pgn.Game()
+    pgn.headers['Event'] = 'Rated game'
+    pgn.headers['Site'] = f"game/{game.id}"
+    pgn.headers['Date'] = game.created_at.strftime('%Y.%m.%d') if game.created_at else '????.??.??'
+    pgn.headers['Round'] = '-'
+    pgn.headers['White'] = context['white_username'] or '?'
+    pgn.headers['Black'] = context['black_username'] or '?'
+    pgn.headers['Result'] = game_result(game)
+    pgn.headers['TimeControl'] = pgn_time_control(game.time_control)
+    if context['white_elo'] is not None:
+        pgn.headers['WhiteElo'] = str(context['white_elo'])
+    if context['black_elo'] is not None:
+        pgn.headers['BlackElo'] = str(context['black_elo'])
+    if game.win_by_resignation:
+        pgn.headers['Termination'] = 'resignation'
+
+    try:
+        pgn.add_line(context['moves'])
+    except (AssertionError, ValueError):
+        # corrupted history; still export the headers
+        pass
+
+    exporter = chess.pgn.StringExporter(headers=True, variations=False, comments=False)
+    return pgn.accept(exporter) + '\n\n'
+
+
+def game_to_ndjson(game, context):
+    return json.dumps({
+        'id': game.id,
+        'white_user_id': game.white_user_id,
+        'black_user_id': game.black_user_id,
+        'white_username': context['white_username'],
+        'black_username': context['black_username'],
+        'white_elo': context['white_elo'],
+        'black_elo': context['black_elo'],
+        'winner_id': game.winner_id,
+        'result': game_result(game),
+        'win_by_resignation': bool(game.win_by_resignation),
+        'created_at': game.created_at.isoformat() if game.created_at else None,
+        'moves': [m.uci() for m in context['moves']],
+    }) + '\n'
+
+
+EXPORT_FORMATS = {
+    'pgn': (game_to_pgn, 'application/x-chess-pgn'),
+    'ndjson': (game_to_ndjson, 'application/x-ndjson'),
+}
+
+
+def stream_export(user_id, fmt):
+    """Generator of export chunks (one game each) in ``fmt``."""
+    formatter, _ = EXPORT_FORMATS[fmt]
+    for game, context in iter_finished_games(user_id):
+        yield formatter(game, context)
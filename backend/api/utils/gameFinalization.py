@@ -0,0 +1,163 @@
+# backend/api/utils/gameFinalization.py
+from . import db, socketio
+from .eloChange import calculate_new_elo_pair_after_draw, calculate_new_elo_pair_after_win
+from .gameSummaries import build_summary, dump_summary, game_summaries
+from .leaderboard import leaderboard
+from .liveGames import live_games
+from .presence import presence
+from ..models.games import Game
+from ..models.elo import EloEntry
+from ..models.users import User
+from ..models.ratings import DailyRating
+from ..models.stats import HeadToHead, UserStats
+from sqlalchemy import select, update
+from werkzeug.exceptions import Conflict
+from datetime import datetime
+import chess
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def board_result(live, mover_id):
+    """Return (winner_id, reason) if the game is over after ``mover_id`` moved, else None.
+
+    Equivalent to ``board.is_game_over()`` but answers fivefold repetition from
+    the position history instead of walking back through the move stack.
+    """
+    board = live.board
+    if board.is_checkmate():
+        # The winner is the one who just moved
+        return mover_id, 'checkmate'
+    if board.is_stalemate():
+        return None, 'stalemate'
+    if board.is_insufficient_material():
+        return None, 'insufficient_material'
+    if live.history.repetitions() >= 5:
+        return None, 'fivefold_repetition'
+    if board.is_seventyfive_moves():
+        return None, 'seventyfive_moves'
+    return None
+
+
+def draw_claim_reason(live):
+    """Return the reason a draw may be claimed in the current position, else None."""
+    if live.history.repetitions() >= 3:
+        return 'threefold_repetition'
+    if live.board.halfmove_clock >= 100:
+        return 'fifty_moves'
+    return None
+
+
+def flag_fall_result(live, white_flagged):
+    """Return (winner_id, reason) when one side has run out of time.
+
+    The flagged side loses unless the opponent has no material left to mate with.
+    """
+    opponent_color = chess.BLACK if white_flagged else chess.WHITE
+    if live.board.has_insufficient_material(opponent_color):
+        return None, 'insufficient_material'
+    winner_id = live.black_user_id if white_flagged else live.white_user_id
+    return winner_id, 'time_out'
+
+
+def finalize_game(live, winner_id, reason, win_by_resignation=False):
+    """End ``live`` and record the result.
+
+    The Game update and its history summary, both EloEntry rows, the
+    players' current ratings on ``users``, their daily rating rollups, their
+    game counters and their head-to-head record are written in one
+    transaction.
+    The UPDATE only matches while the game is still in progress, so when two
+    requests race to end the same game exactly one of them commits; the other
+    gets False back and writes nothing. ``game_over`` is emitted only by the
+    winner of that race. It is also guarded on the ply counter, like
+    persist_move, so a ``live`` copy that another worker has moved past
+    cannot overwrite the real final position and clocks.
+
+    Returns True if this call ended the game. Raises Conflict (after
+    evicting ``live``) if the game is still running but has moved on.
+    """
+    now = datetime.utcnow()
+    try:
+        result = db.session.execute(
+            update(Game).where(
+                (Game.id == live.id) &
+                (Game.ply_count == live.ply_count) &
+                (Game.in_progress == True)
+            ).values(
+                in_progress=False,
+                winner_id=winner_id,
+                win_by_resignation=win_by_resignation,
+                draw_offer_from=None,
+                current_fen=live.current_fen,
+                white_time_left=live.white_time_left,
+                black_time_left=live.black_time_left,
+                position_keys=live.history.to_bytes(),
+                updated_at=now,
+            )
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            live_games.evict(live.id)
+            still_running = db.session.scalar(select(Game.in_progress).where(Game.id == live.id))
+            if still_running:
+                logger.info('Game %s moved on since this copy was loaded', live.id)
+                raise Conflict('Game state changed, please reload and retry')
+            live.in_progress = False
+            presence.game_ended(live.id, (live.white_user_id, live.black_user_id))
+            logger.info('Game %s was already finalized', live.id)
+            return False
+
+        elo_map = User.get_elo_map([live.black_user_id, live.white_user_id], for_update=True)
+        black_elo = elo_map[live.black_user_id]
+        white_elo = elo_map[live.white_user_id]
+
+        if winner_id is None:
+            new_elos = calculate_new_elo_pair_after_draw(black_elo, white_elo)
+        else:
+            new_elos = calculate_new_elo_pair_after_win(black_elo, white_elo, winner_id == live.black_user_id)
+
+        summary = build_summary(live.id, live.white_user_id, live.black_user_id,
+                                new_elos[1], new_elos[0], winner_id, live.created_at)
+        db.session.execute(update(Game).where(Game.id == live.id).values(summary=dump_summary(summary), summary_at=now))
+        db.session.add_all([
+            EloEntry(user_id=live.black_user_id, game_id=live.id, elo=new_elos[0]),
+            EloEntry(user_id=live.white_user_id, game_id=live.id, elo=new_elos[1]),
+        ])
+        db.session.execute(update(User), [
+            {'id': live.black_user_id, 'elo': new_elos[0]},
+            {'id': live.white_user_id, 'elo': new_elos[1]},
+        ])
+        DailyRating.record(live.black_user_id, new_elos[0], now)
+        DailyRating.record(live.white_user_id, new_elos[1], now)
+        UserStats.record(live.white_user_id, 'white', UserStats.outcome_for(live.white_user_id, winner_id), now)
+        UserStats.record(live.black_user_id, 'black', UserStats.outcome_for(live.black_user_id, winner_id), now)
+        HeadToHead.record(live.white_user_id, live.black_user_id, winner_id,
+                          new_elos[1] - white_elo, new_elos[0] - black_elo, now)
+        db.session.commit()
+    except Conflict:
+        raise
+    except Exception:
+        db.session.rollback()
+        live_games.evict(live.id)
+        logger.exception('Failed to finalize game %s', live.id)
+        raise
+
+    live.in_progress = False
+    live.winner_id = winner_id
+    live.win_by_resignation = win_by_resignation
+    live.draw_offer_from = None
+    live.updated_at = now
+    live_games.evict(live.id)
+    game_summaries.put(live.id, now, summary)
+    leaderboard.update(live.black_user_id, new_elos[0])
+    leaderboard.update(live.white_user_id, new_elos[1])
+    presence.game_ended(live.id, (live.white_user_id, live.black_user_id))
+
+    socketio.emit('game_over', {
+        'winner_id': winner_id,
+        'reason': reason
+    }, to=f"game_{live.id}")
+
+    return True
@@ -0,0 +1,173 @@
+# backend/api/utils/gameSummaries.py
+"""Pre-serialized summaries of finished games for the history endpoint.
+
+A finished game never changes, so its history entry (players, ratings after
+the game, result, start time) is serialized once when the game ends and kept
+in ``games.summary``, stamped with ``games.summary_at``. Only maintenance
+commands (``ratings recompute``, ``games build-summaries --all``) rewrite a
+summary, and they move its stamp. Servers keep recently read summaries in a
+per-process LRU keyed on (game id, stamp), so a rewritten summary is simply a
+miss; move lists are not cached, they are decoded per request. Usernames are
+not part of the summary (they can change) and are looked up per request.
+"""
+from . import db
+from .moveCodec import decode_ucis
+from ..models.elo import EloEntry
+from ..models.games import Game
+from ..models.moves import Move
+from sqlalchemy import select, update
+from collections import OrderedDict
+from datetime import datetime
+import json
+import threading
+
+CACHE_SIZE = 20000
+
+
+def build_summary(game_id, white_user_id, black_user_id, white_elo, black_elo, winner_id, created_at):
+    """History entry of a finished game, ready for JSON."""
+    return {
+        'id': game_id,
+        'in_progress': False,
+        'white_user_id': white_user_id,
+        'black_user_id': black_user_id,
+        'white_elo': white_elo,
+        'black_elo': black_elo,
+        'created_at': created_at.isoformat() if created_at else None,
+        'winner_id': winner_id,
+    }
+
+
+def dump_summary(summary):
+    return json.dumps(summary, separators=(',', ':'))
+
+
+def load_moves(game_ids):
+    """Map game id -> UCI move list, from packed move_data or legacy moves rows."""
+    if not game_ids:
+        return {}
+    moves_by_game = {}
+    legacy_ids = []
+    for gid, move_data in db.session.execute(select(Game.id, Game.move_data).where(Game.id.in_(game_ids))):
+        if move_data is None:
+            legacy_ids.append(gid)
+        else:
+            moves_by_game[gid] = decode_ucis(move_data)
+    if legacy_ids:
+        rows = db.session.query(Move.game_id, Move.uci).filter(
+            Move.game_id.in_(legacy_ids)
+        ).order_by(Move.game_id, Move.move_number)
+        for gid, uci in rows:
+            moves_by_game.setdefault(gid, []).append(uci)
+    return moves_by_game
+
+
+def summaries_from_elo_entries(game_rows):
+    """Build summaries for finished ``game_rows`` (id, white, black, winner, created_at)
+    from their EloEntry rows; used for games that ended before summaries existed."""
+    game_ids = [row[0] for row in game_rows]
+    elo_by_user_game = {}
+    if game_ids:
+        for uid, gid, elo in db.session.query(EloEntry.user_id, EloEntry.game_id, EloEntry.elo).filter(
+            EloEntry.game_id.in_(game_ids)
+        ):
+            elo_by_user_game[(uid, gid)] = elo
+    return {
+        gid: build_summary(gid, white, black, elo_by_user_game.get((white, gid)),
+                           elo_by_user_game.get((black, gid)), winner, created_at)
+        for gid, white, black, winner, created_at in game_rows
+    }
+
+
+def rebuild_summaries(only_missing=True, batch_size=1000, progress=None):
+    """Write games.summary for finished games (only those without one, by default).
+
+    Returns the number of games written.
+    """
+    progress = progress or (lambda message: None)
+    written = 0
+    last_id = 0
+    while True:
+        stmt = select(Game.id, Game.white_user_id, Game.black_user_id, Game.winner_id, Game.created_at).where(
+            (Game.in_progress == False) & (Game.id > last_id)
+        )
+        if only_missing:
+            stmt = stmt.where(Game.summary == None)
+        rows = db.session.execute(stmt.order_by(Game.id).limit(batch_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        summaries = summaries_from_elo_entries(rows)
+        now = datetime.utcnow()
+        db.session.execute(update(Game), [
+            {'id': gid, 'summary': dump_summary(s), 'summary_at': now} for gid, s in summaries.items()
+        ])
+        db.session.commit()
+        written += len(rows)
+        progress(f'wrote {written} game summaries (last id {last_id})')
+    return written
+
+
+class GameSummaryCache:
+    """Per-process LRU of game id -> (summary_at, summary) for finished games.
+
+    An entry is only served while its stamp matches the caller's
+    ``Game.summary_at``, so summaries rewritten by another process are
+    reloaded instead of going stale.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, versions):
+        """Cached summaries among ``versions`` (game id -> summary_at) whose stamp still matches."""
+        found = {}
+        with self._lock:
+            for gid, summary_at in versions.items():
+                entry = self._entries.get(gid)
+                if entry is None or summary_at is None or entry[0] != summary_at:
+                    continue
+                self._entries.move_to_end(gid)
+                found[gid] = entry[1]
+        return found
+
+    def put(self, game_id, summary_at, summary):
+        with self._lock:
+            self._entries[game_id] = (summary_at, summary)
+            self._entries.move_to_end(game_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def fetch(self, versions):
+        """Summaries of the finished games among ``versions`` (game id -> summary_at),
+        loading misses from the database.
+
+        In-progress games are left out; the caller serves those live. Games
+        without a stored summary are summarized from their Elo entries and
+        not cached, since they carry no stamp to check against.
+        """
+        found = self.get_many(versions)
+        missing = [gid for gid in versions if gid not in found]
+        if not missing:
+            return found
+
+        rows = db.session.execute(
+            select(Game.id, Game.white_user_id, Game.black_user_id, Game.winner_id, Game.created_at,
+                   Game.summary, Game.summary_at)
+            .where(Game.id.in_(missing) & (Game.in_progress == False))
+        ).all()
+        for gid, *_, summary, summary_at in rows:
+            if summary is not None:
+                found[gid] = json.loads(summary)
+                self.put(gid, summary_at, found[gid])
+        found.update(summaries_from_elo_entries([row[:5] for row in rows if row[5] is None]))
+        return found
+
+
+game_summaries = GameSummaryCache()
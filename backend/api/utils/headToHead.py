@@ -0,0 +1,73 @@
+# backend/api/utils/headToHead.py
+from . import db
+from .gameSummaries import game_summaries
+from ..models.elo import EloEntry
+from ..models.games import Game
+from ..models.stats import HeadToHead, UserStats
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import aliased
+
+DEFAULT_RECENT = 10
+MAX_RECENT = 50
+
+
+def rating_changes(game_ids, user_ids):
+    """Map (user_id, game_id) -> rating change of ``user_ids`` in ``game_ids``.
+
+    Each change is the game's Elo entry minus the player's previous entry,
+    one index probe per entry on (user_id, created_at).
+    """
+    if not game_ids:
+        return {}
+    previous = aliased(EloEntry)
+    previous_elo = select(previous.elo).where(
+        (previous.user_id == EloEntry.user_id) &
+        (tuple_(previous.created_at, previous.id) < tuple_(EloEntry.created_at, EloEntry.id))
+    ).order_by(previous.created_at.desc(), previous.id.desc()).limit(1).scalar_subquery()
+    rows = db.session.execute(
+        select(EloEntry.user_id, EloEntry.game_id, EloEntry.elo, previous_elo).where(
+            EloEntry.game_id.in_(game_ids) & EloEntry.user_id.in_(user_ids)
+        )
+    )
+    return {(uid, gid): elo - before if before is not None else None for uid, gid, elo, before in rows}
+
+
+def head_to_head(user_id, opponent_id, recent=DEFAULT_RECENT):
+    """``user_id``'s record against ``opponent_id`` and their ``recent`` newest finished games.
+
+    The totals are one primary-key read of head_to_head and the games one
+    range of the (pair_low_id, pair_high_id, created_at, id) index, so the
+    cost does not grow with either player's history.
+    """
+    low, high = sorted((user_id, opponent_id))
+    record = HeadToHead.get(user_id, opponent_id).as_seen_by(user_id)
+
+    versions = dict(db.session.execute(
+        select(Game.id, Game.summary_at).where(
+            (Game.pair_low_id == low) & (Game.pair_high_id == high) & (Game.in_progress == False)
+        ).order_by(Game.created_at.desc(), Game.id.desc()).limit(recent)
+    ).all())
+    page = list(versions)
+    summaries = game_summaries.fetch(versions)
+    changes = rating_changes(page, (user_id, opponent_id))
+
+    games = []
+    for gid in page:
+        if gid not in summaries:
+            continue
+        summary = summaries[gid]
+        is_white = summary['white_user_id'] == user_id
+        games.append({
+            'id': gid,
+            'created_at': summary['created_at'],
+            'color': 'white' if is_white else 'black',
+            'result': UserStats.outcome_for(user_id, summary['winner_id']),
+            'winner_id': summary['winner_id'],
+            'elo': summary['white_elo'] if is_white else summary['black_elo'],
+            'opponent_elo': summary['black_elo'] if is_white else summary['white_elo'],
+            'rating_change': changes.get((user_id, gid)),
+            'opponent_rating_change': changes.get((opponent_id, gid)),
+        })
+
+    record.update({'user_id': user_id, 'opponent_id': opponent_id, 'recent': games})
+    return record
@@ -0,0 +1,239 @@
+# backend/api/utils/leaderboard.py
+from . import db
+from ..models.users import User
+from bisect import bisect_left, insort
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ratings outside this range are ranked as if they were at the nearest bound
+# (their real value is still reported).
+MIN_RATING = 0
+MAX_RATING = 4000
+# Rating changes made by other processes (CLI commands, other workers) are
+# picked up by rebuilding from the users table at least this often.
+REBUILD_INTERVAL_SECONDS = 10 * 60
+
+
+class _Fenwick:
+    """Binary indexed tree of counts over slots 1..size."""
+
+    def __init__(self, counts):
+        # counts[0] is unused; build in O(size)
+        self.size = len(counts) - 1
+        self.tree = list(counts)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, i, delta):
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of slots 1..i."""
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def select(self, k):
+        """Smallest slot i with prefix(i) >= k (1 <= k <= total)."""
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] < k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos + 1
+
+
+class Leaderboard:
+    """Ranked index of every user's current rating.
+
+    Counts per rating live in a Fenwick tree whose slots run from the highest
+    rating down, so "how many players are rated above r" is a prefix sum and
+    "who is in position k" is a tree descent, both O(log R) for a rating range
+    of R. Players on the same rating share a rank and are listed by user id.
+
+    Built lazily from ``users.elo`` on first use, kept current by
+    ``finalize_game`` and signup, and rebuilt periodically to pick up changes
+    written by other processes.
+    """
+
+    def __init__(self, min_rating=MIN_RATING, max_rating=MAX_RATING, rebuild_interval=REBUILD_INTERVAL_SECONDS):
+        self.min_rating = min_rating
+        self.max_rating = max_rating
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._tree = None
+        self._buckets = {}
+        self._ratings = {}
+        self._built_at = None
+        # updates that arrive while a rebuild is reading the database
+        self._pending = None
+
+    def __len__(self):
+        self._ensure_built()
+        return len(self._ratings)
+
+    def _slot(self, rating):
+        rating = min(max(rating, self.min_rating), self.max_rating)
+        return self.max_rating - rating + 1
+
+    # ------------------------------------------------------------------
+    # maintenance
+    # ------------------------------------------------------------------
+
+    def _is_stale(self):
+        built_at = self._built_at
+        return built_at is None or time.monotonic() - built_at > self.rebuild_interval
+
+    def _ensure_built(self):
+        if self._is_stale():
+            with self._build_lock:
+                # another request may have rebuilt it while we waited
+                if self._is_stale():
+                    self._rebuild()
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending = {}
+
+        try:
+            rows = db.session.query(User.id, User.elo).all()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            logger.exception('Failed to rebuild the leaderboard')
+            raise
+
+        with self._lock:
+            ratings = dict(rows)
+            for user_id, rating in self._pending.items():
+                if rating is None:
+                    ratings.pop(user_id, None)
+                else:
+                    ratings[user_id] = rating
+            self._pending = None
+
+            counts = [0] * (self.max_rating - self.min_rating + 2)
+            buckets = {}
+            for user_id, rating in ratings.items():
+                slot = self._slot(rating)
+                counts[slot] += 1
+                buckets.setdefault(slot, []).append(user_id)
+            for bucket in buckets.values():
+                bucket.sort()
+
+            self._tree = _Fenwick(counts)
+            self._buckets = buckets
+            self._ratings = ratings
+            self._built_at = time.monotonic()
+
+    def _remove_locked(self, user_id):
+        old = self._ratings.pop(user_id, None)
+        if old is None:
+            return
+        slot = self._slot(old)
+        bucket = self._buckets[slot]
+        del bucket[bisect_left(bucket, user_id)]
+        if not bucket:
+            del self._buckets[slot]
+        self._tree.add(slot, -1)
+
+    def update(self, user_id, rating):
+        """Record ``user_id``'s new rating (after it has been committed)."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending[user_id] = rating
+            if self._tree is None:
+                return  # not built yet; the first build reads it from the database
+            self._remove_locked(user_id)
+            slot = self._slot(rating)
+            self._ratings[user_id] = rating
+            insort(self._buckets.setdefault(slot, []), user_id)
+            self._tree.add(slot, 1)
+
+    def remove(self, user_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending[user_id] = None
+            if self._tree is not None:
+                self._remove_locked(user_id)
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+
+    def _position_locked(self, user_id):
+        """0-based position of ``user_id`` in leaderboard order and the count above its rating."""
+        slot = self._slot(self._ratings[user_id])
+        higher = self._tree.prefix(slot - 1)
+        return higher + bisect_left(self._buckets[slot], user_id), higher
+
+    def _slice_locked(self, start, count):
+        total = len(self._ratings)
+        end = min(total, start + count)
+        entries = []
+        k = start + 1
+        while k <= end:
+            slot = self._tree.select(k)
+            higher = self._tree.prefix(slot - 1)
+            bucket = self._buckets[slot]
+            taken = bucket[k - 1 - higher:k - 1 - higher + (end - k + 1)]
+            for user_id in taken:
+                entries.append({'rank': higher + 1, 'user_id': user_id, 'elo': self._ratings[user_id]})
+            k += len(taken)
+        return entries
+
+    def top(self, limit, offset=0):
+        """Entries in positions offset .. offset+limit-1, best first."""
+        self._ensure_built()
+        with self._lock:
+            return self._slice_locked(max(offset, 0), max(limit, 0))
+
+    def rank_of(self, user_id):
+        """Return {rank, elo, total, percentile} for ``user_id``, or None if unranked.
+
+        ``percentile`` is the share of players rated strictly below the user.
+        """
+        self._ensure_built()
+        with self._lock:
+            if user_id not in self._ratings:
+                return None
+            rating = self._ratings[user_id]
+            _, higher = self._position_locked(user_id)
+            total = len(self._ratings)
+            below = total - higher - len(self._buckets[self._slot(rating)])
+            return {
+                'rank': higher + 1,
+                'elo': rating,
+                'total': total,
+                'percentile': round(100.0 * below / total, 2),
+            }
+
+    def around(self, user_id, radius):
+        """Entries within ``radius`` positions of ``user_id``, or None if unranked."""
+        self._ensure_built()
+        with self._lock:
+            if user_id not in self._ratings:
+                return None
+            position, _ = self._position_locked(user_id)
+            start = max(position - radius, 0)
+            return self._slice_locked(start, position - start + radius + 1)
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,310 @@
+# backend/api/utils/liveGames.py
+from . import db
+from ..models.games import Game
+from .moveCodec import encode_moves, pack_move, pack_varint
+from .positionHistory import PositionHistory
+from sqlalchemy import LargeBinary, cast, literal, update
+from werkzeug.exceptions import BadRequest, Conflict
+from datetime import datetime, timedelta
+import chess
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Games nobody has touched for this long are dropped from memory. They are
+# reloaded from the database on the next request, so eviction is always safe.
+IDLE_TIMEOUT_SECONDS = 30 * 60
+SWEEP_INTERVAL_SECONDS = 60
+
+
+def _append(column, data):
+    """SQL ``column || data`` for a binary column (the CAST stops SQLite returning TEXT)."""
+    return cast(column.op('||')(literal(data, LargeBinary)), LargeBinary)
+
+
+def _ms_to_seconds(ms):
+    # round up so a player is never shown (or saved with) less time than they have
+    return max(0, -(-ms // 1000))
+
+
+class LiveGame:
+    """In-memory state of an in-progress game.
+
+    Exposes the same attribute names as the Game model so it can be passed
+    straight to ``marshal_with(game_model)``.
+    """
+
+    def __init__(self, game, board, history):
+        self.id = game.id
+        self.white_user_id = game.white_user_id
+        self.black_user_id = game.black_user_id
+        self.board = board
+        self.history = history
+        self.move_data = bytearray(game.move_data or b'')
+        self.clock_data = bytearray(game.clock_data or b'')
+        # False until the packed blobs exist in the row and can be appended to
+        self.blobs_stored = game.move_data is not None
+        self.in_progress = game.in_progress
+        self.winner_id = game.winner_id
+        self.draw_offer_from = game.draw_offer_from
+        self.win_by_resignation = game.win_by_resignation
+        # clocks are tracked in milliseconds; the games table keeps whole seconds
+        self.white_ms = game.white_time_left * 1000
+        self.black_ms = game.black_time_left * 1000
+        self.time_control = game.time_control
+        self.increment_seconds = game.increment_seconds or 0
+        self.increment_ms = self.increment_seconds * 1000
+        self.ply_count = game.ply_count
+        self.created_at = game.created_at
+        self.updated_at = game.updated_at
+        # the side to move has been on the clock since the last move
+        self.turn_started_at = game.updated_at
+        self.last_activity = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"LiveGame {self.id} | Ply: {self.ply_count} | In Progress: {self.in_progress}"
+
+    @property
+    def current_fen(self):
+        return self.board.fen()
+
+    def is_player(self, user_id):
+        return user_id == self.white_user_id or user_id == self.black_user_id
+
+    def side_to_move_user_id(self):
+        return self.white_user_id if self.board.turn == chess.WHITE else self.black_user_id
+
+    def opponent_of(self, user_id):
+        return self.black_user_id if user_id == self.white_user_id else self.white_user_id
+
+    @property
+    def white_time_left(self):
+        return _ms_to_seconds(self.white_ms)
+
+    @property
+    def black_time_left(self):
+        return _ms_to_seconds(self.black_ms)
+
+    def clocks_at(self, now):
+        """Return (white_ms, black_ms) as of ``now`` without mutating state."""
+        ms_elapsed = (now - self.turn_started_at) // timedelta(milliseconds=1)
+        if self.board.turn == chess.WHITE:
+            return self.white_ms - ms_elapsed, self.black_ms
+        return self.white_ms, self.black_ms - ms_elapsed
+
+    def charge_clock(self, now):
+        """Subtract the time spent on the current turn from the side to move."""
+        white_ms, black_ms = self.clocks_at(now)
+        self.white_ms = max(0, white_ms)
+        self.black_ms = max(0, black_ms)
+
+    def add_increment(self, color):
+        """Credit ``color``, who has just moved, with the time control's increment."""
+        if color == chess.WHITE:
+            self.white_ms += self.increment_ms
+        else:
+            self.black_ms += self.increment_ms
+
+    def undo_move(self, white_ms, black_ms):
+        """Take back the last pushed move and restore the clocks from before it."""
+        self.board.pop()
+        self.history.pop()
+        self.white_ms = white_ms
+        self.black_ms = black_ms
+
+    def is_flagged(self):
+        return self.white_ms <= 0 or self.black_ms <= 0
+
+    def flag_deadline(self):
+        """Moment the side to move runs out of time if it does not move."""
+        ms_left = self.white_ms if self.board.turn == chess.WHITE else self.black_ms
+        return self.turn_started_at + timedelta(milliseconds=ms_left)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+
+class LiveGameRegistry:
+    """Process-level cache of in-progress games keyed by game id.
+
+    Boards are kept with their full move stack so move validation never has to
+    reparse a FEN or count ``moves`` rows. All writes go through to the
+    ``games`` table, so the database stays the source of truth and an evicted
+    game is simply reloaded on demand.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT_SECONDS):
+        self.idle_timeout = idle_timeout
+        self._games = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._games)
+
+    def get(self, game_id):
+        """Return the LiveGame for ``game_id``, loading it from the database if needed.
+
+        Raises NotFound if the game does not exist and BadRequest if it has ended.
+        """
+        self._maybe_sweep()
+
+        live = self._games.get(game_id)
+        if live is None:
+            loaded = self._load(game_id)
+            with self._lock:
+                # another request may have loaded it while we hit the database
+                live = self._games.setdefault(game_id, loaded)
+
+        live.touch()
+        return live
+
+    def evict(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [gid for gid, live in self._games.items() if live.last_activity < cutoff]
+            for gid in idle:
+                del self._games[gid]
+        if idle:
+            logger.info('Evicted %d idle live games', len(idle))
+        return idle
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        self.evict_idle()
+
+    def _load(self, game_id):
+        game = Game.get_by_id(game_id)
+        if not game.in_progress:
+            raise BadRequest('Game has already ended')
+
+        # Replay the stored moves so the board carries its full move stack.
+        board = chess.Board()
+        ucis = game.uci_moves()
+        try:
+            for uci in ucis:
+                board.push_uci(uci)
+        except ValueError:
+            logger.exception('Could not replay moves for game %s', game_id)
+            board = None
+
+        if board is None or board.fen() != game.current_fen:
+            logger.warning('Move history of game %s does not match its FEN; loading from FEN', game_id)
+            board = chess.Board(game.current_fen)
+        elif game.ply_count != len(board.move_stack):
+            # rows written before games carried a ply counter
+            game.ply_count = len(board.move_stack)
+            db.session.commit()
+
+        # position_keys is only written at finalize, so a running game
+        # normally rebuilds its history from the replayed move stack
+        history = PositionHistory.from_bytes(game.position_keys)
+        if len(history) != len(board.move_stack) + 1:
+            history = PositionHistory.from_board(board)
+
+        live = LiveGame(game, board, history)
+        if game.move_data is None:
+            # legacy game still stored as moves rows: pack it, clock usage unknown (0)
+            live.move_data = bytearray(encode_moves(ucis))
+            live.clock_data = bytearray(pack_varint(0) * len(ucis))
+        return live
+
+    # ------------------------------------------------------------------
+    # persistence
+    # ------------------------------------------------------------------
+
+    def persist_move(self, live, now):
+        """Write a move that has already been pushed onto ``live.board`` and ``live.history``.
+
+        The packed move and its clock usage are appended to the stored blobs
+        (``||`` in SQL, so the rest of the game is never resent) in the same
+        UPDATE as the FEN, clocks and ply counter, so a move is one statement
+        and no longer adds a row to the moves table. The ply counter is guarded
+        on its previous value, so a concurrent writer (another worker process
+        holding its own copy of the game) makes the UPDATE match no rows
+        instead of silently forking the game. ``live.history`` is not written
+        here; finalize_game stores it once the game ends.
+
+        Raises Conflict if the game changed underneath us.
+        """
+        ply = live.ply_count + 1
+        spent_ms = (now - live.turn_started_at) // timedelta(milliseconds=1)
+        packed_move = pack_move(live.board.peek())
+        packed_clock = pack_varint(spent_ms)
+        move_data = live.move_data + packed_move
+        clock_data = live.clock_data + packed_clock
+        if live.blobs_stored:
+            stored_moves = _append(Game.move_data, packed_move)
+            stored_clocks = _append(Game.clock_data, packed_clock)
+        else:
+            # legacy game packed on load: write the whole blobs once
+            stored_moves = bytes(move_data)
+            stored_clocks = bytes(clock_data)
+        try:
+            result = db.session.execute(
+                update(Game).where(
+                    (Game.id == live.id) &
+                    (Game.ply_count == live.ply_count) &
+                    (Game.in_progress == True)
+                ).values(
+                    current_fen=live.current_fen,
+                    white_time_left=live.white_time_left,
+                    black_time_left=live.black_time_left,
+                    draw_offer_from=None,
+                    ply_count=Game.ply_count + 1,
+                    move_data=stored_moves,
+                    clock_data=stored_clocks,
+                    updated_at=now,
+                )
+            )
+            if result.rowcount != 1:
+                raise Conflict('Game state changed, please reload and retry')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # memory is now ahead of the database; drop it and reload next time
+            self.evict(live.id)
+            raise
+
+        live.ply_count = ply
+        live.move_data = move_data
+        live.clock_data = clock_data
+        live.blobs_stored = True
+        live.turn_started_at = now
+        live.updated_at = now
+        live.draw_offer_from = None
+
+    def persist_draw_offer(self, live):
+        """Write ``live.draw_offer_from``, guarded on the ply counter like ``persist_move``.
+
+        Raises Conflict if the game moved on or ended underneath us, so an
+        offer made against a stale copy is never attached to a later position.
+        """
+        try:
+            result = db.session.execute(
+                update(Game).where(
+                    (Game.id == live.id) &
+                    (Game.ply_count == live.ply_count) &
+                    (Game.in_progress == True)
+                ).values(draw_offer_from=live.draw_offer_from)
+            )
+            if result.rowcount != 1:
+                raise Conflict('Game state changed, please reload and retry')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.evict(live.id)
+            raise
+
+
+live_games = LiveGameRegistry()
@@ -0,0 +1,238 @@
+# backend/api/utils/matchmakingIndex.py
+from . import db
+from ..models.games import Game
+from .timeControls import DEFAULT_TIME_CONTROL, game_clock_kwargs
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Waiting players are grouped by rating into buckets this wide.
+BUCKET_WIDTH = 50
+# A player accepts opponents within BASE_WINDOW rating points at first; the
+# window widens the longer they wait, up to MAX_WINDOW.
+BASE_WINDOW = 100
+WINDOW_GROWTH_PER_SECOND = 10
+MAX_WINDOW = 1000
+
+
+class QueuedPlayer:
+    __slots__ = ('user_id', 'rating', 'joined_at')
+
+    def __init__(self, user_id, rating, joined_at):
+        self.user_id = user_id
+        self.rating = rating
+        self.joined_at = joined_at
+
+    def __repr__(self):
+        return f"QueuedPlayer {self.user_id} | Rating: {self.rating}"
+
+    def window(self, now):
+        """Largest rating gap this player accepts after waiting until ``now``."""
+        waited = max(now - self.joined_at, 0)
+        return min(BASE_WINDOW + WINDOW_GROWTH_PER_SECOND * waited, MAX_WINDOW)
+
+
+class MatchmakingIndex:
+    """In-memory matchmaking queue keyed by rating, for one time control.
+
+    Players sit in narrow rating buckets, so a rating-ordered snapshot for
+    the pairing pass only needs the bucket keys sorted plus a tiny sort inside
+    each bucket. Joining and leaving touch one bucket under a short lock and
+    never wait on pairing or the database.
+    """
+
+    def __init__(self, time_control=DEFAULT_TIME_CONTROL):
+        self.time_control = time_control
+        self._buckets = {}
+        self._players = {}
+        self._lock = threading.Lock()
+        # seconds each player paired by the last pass had waited
+        self.last_waits = []
+
+    def __len__(self):
+        return len(self._players)
+
+    def __contains__(self, user_id):
+        return user_id in self._players
+
+    @staticmethod
+    def now():
+        """Current time on the clock ``joined_at`` is measured with."""
+        return time.monotonic()
+
+    @staticmethod
+    def _bucket_of(rating):
+        return rating // BUCKET_WIDTH
+
+    def _insert_locked(self, player):
+        self._players[player.user_id] = player
+        self._buckets.setdefault(self._bucket_of(player.rating), {})[player.user_id] = player
+
+    def _remove_locked(self, user_id):
+        player = self._players.pop(user_id, None)
+        if player is None:
+            return None
+        bucket_no = self._bucket_of(player.rating)
+        bucket = self._buckets[bucket_no]
+        del bucket[user_id]
+        if not bucket:
+            del self._buckets[bucket_no]
+        return player
+
+    def add(self, user_id, rating, now=None):
+        """Queue ``user_id``. Raises ValueError if the user is already queued."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if user_id in self._players:
+                raise ValueError('User already in queue')
+            self._insert_locked(QueuedPlayer(user_id, rating, now))
+
+    def snapshot(self):
+        """All waiting players, sorted by rating (ties: longest waiting first)."""
+        with self._lock:
+            buckets = [(bucket_no, list(bucket.values())) for bucket_no, bucket in self._buckets.items()]
+        buckets.sort(key=lambda item: item[0])
+        players = []
+        for _, bucket in buckets:
+            # buckets are narrow, so this is a cheap sort of a few players
+            bucket.sort(key=lambda p: (p.rating, p.joined_at))
+            players.extend(bucket)
+        return players
+
+    def take_pairs(self, pairs):
+        """Remove the players of ``pairs`` from the queue.
+
+        Pairs in which either player has left since the snapshot are dropped
+        (the remaining player keeps waiting). Returns the pairs taken.
+        """
+        taken = []
+        with self._lock:
+            for a, b in pairs:
+                if self._players.get(a.user_id) is a and self._players.get(b.user_id) is b:
+                    self._remove_locked(a.user_id)
+                    self._remove_locked(b.user_id)
+                    taken.append((a, b))
+        return taken
+
+    def restore(self, players):
+        """Put players back (e.g. when creating their game failed), keeping their wait time."""
+        with self._lock:
+            for player in players:
+                if player.user_id not in self._players:
+                    self._insert_locked(player)
+
+    def remove(self, user_id):
+        """Take ``user_id`` out of the queue; returns False if they were not queued."""
+        with self._lock:
+            return self._remove_locked(user_id) is not None
+
+    def pair_pass(self, now=None):
+        """Pair everyone currently waiting; returns the committed Games."""
+        self.last_waits = []
+        if len(self) < 2:
+            return []
+        now = time.monotonic() if now is None else now
+        pairs = self.take_pairs(pair_players(self.snapshot(), now))
+        if not pairs:
+            return []
+
+        games = games_for_pairs(pairs, self.time_control)
+        try:
+            db.session.add_all(games)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.restore([p for pair in pairs for p in pair])
+            logger.exception('Failed to create %d matchmaking games', len(games))
+            raise
+        self.last_waits = [now - p.joined_at for pair in pairs for p in pair]
+        return games
+
+
+# how many sorted neighbours a player may skip over to reach its partner
+PAIRING_LOOKBACK = 3
+
+
+def pair_players(players, now):
+    """Pick pairs from ``players`` (sorted by rating) for one pairing pass.
+
+    Two players are acceptable partners when their rating gap fits in either
+    player's window. Among acceptable pairings this minimises
+
+        sum of rating gaps of the pairs + sum of windows of unpaired players
+
+    so the gap is kept small, and a player who has waited longer (wider
+    window) costs more to leave behind and is paired first. Solved by
+    dynamic programming over the sorted order, letting a partner sit up to
+    PAIRING_LOOKBACK places away (pairs never cross); O(n) per pass.
+    """
+    n = len(players)
+    windows = [p.window(now) for p in players]
+    # best[i] = cost of the first i players; choice[i] = partner index or -1
+    best = [0.0] * (n + 1)
+    choice = [-1] * (n + 1)
+    for i in range(1, n + 1):
+        last = i - 1
+        best[i] = best[i - 1] + windows[last]
+        skipped = 0.0
+        for j in range(last - 1, max(last - 1 - PAIRING_LOOKBACK, -1), -1):
+            gap = players[last].rating - players[j].rating
+            if gap <= max(windows[last], windows[j]):
+                cost = best[j] + skipped + gap
+                if cost < best[i]:
+                    best[i] = cost
+                    choice[i] = j
+            skipped += windows[j]
+
+    pairs = []
+    i = n
+    while i > 0:
+        j = choice[i]
+        if j < 0:
+            i -= 1
+        else:
+            pairs.append((players[j], players[i - 1]))
+            i = j
+    pairs.reverse()
+    return pairs
+
+
+def estimate_waits(players, now):
+    """Estimated seconds until each of ``players`` (sorted by rating) is paired.
+
+    A player can be paired once the rating gap to a nearby waiting player
+    fits in either of their growing windows, so the estimate is the earliest
+    such moment among the PAIRING_LOOKBACK neighbours on each side. None
+    when no waiting player will ever fit (alone, or gap above MAX_WINDOW).
+    """
+    waits = []
+    n = len(players)
+    for i, player in enumerate(players):
+        best = None
+        for j in range(max(i - PAIRING_LOOKBACK, 0), min(i + PAIRING_LOOKBACK + 1, n)):
+            if j == i:
+                continue
+            other = players[j]
+            gap = abs(player.rating - other.rating)
+            if gap > MAX_WINDOW:
+                continue
+            # the wider window reaches the gap first
+            needed = (gap - BASE_WINDOW) / WINDOW_GROWTH_PER_SECOND
+            waited = max(now - player.joined_at, now - other.joined_at, 0)
+            wait = max(needed - waited, 0.0)
+            if best is None or wait < best:
+                best = wait
+        waits.append(best)
+    return waits
+
+
+def games_for_pairs(pairs, time_control=DEFAULT_TIME_CONTROL):
+    """New ``time_control`` Game rows for ``pairs``; white is the player who has waited longer."""
+    clock = game_clock_kwargs(time_control)
+    games = []
+    for a, b in pairs:
+        white, black = (a, b) if a.joined_at <= b.joined_at else (b, a)
+        games.append(Game(white_user_id=white.user_id, black_user_id=black.user_id, **clock))
+    return games
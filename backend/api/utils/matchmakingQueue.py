@@ -0,0 +1,126 @@
+# backend/api/utils/matchmakingQueue.py
+from . import db
+from .matchmakingIndex import QueuedPlayer, games_for_pairs, pair_players
+from .timeControls import DEFAULT_TIME_CONTROL
+from ..models.queue import Queue
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Queue rows one pairing pass locks at most. Several workers pairing at once
+# each lock a different slice of the (rating ordered) queue.
+PAIRING_BATCH_SIZE = 200
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(dt):
+    return (dt - _EPOCH).total_seconds()
+
+
+class DatabaseMatchmakingQueue:
+    """Matchmaking queue kept in the ``queue`` table, safe across worker processes.
+
+    Same interface as MatchmakingIndex; each instance works on the rows of
+    one time control, so every pool locks and pairs only its own players. A pairing pass runs in one
+    transaction: it locks a batch of waiting rows, pairs them with the same
+    ``pair_players`` logic, deletes the paired rows and inserts their games.
+
+    On Postgres the rows are read with ``FOR UPDATE SKIP LOCKED``, so workers
+    pairing concurrently never see each other's rows and never block on them.
+    SQLite has no row locks; there the pass takes the database write lock up
+    front (``BEGIN IMMEDIATE``), which serialises passes instead.
+    """
+
+    def __init__(self, time_control=DEFAULT_TIME_CONTROL, batch_size=PAIRING_BATCH_SIZE):
+        self.time_control = time_control
+        self.batch_size = batch_size
+        # seconds the last pass spent waiting for its locks
+        self.last_lock_wait = 0.0
+        # seconds each player paired by the last pass had waited
+        self.last_waits = []
+
+    @staticmethod
+    def now():
+        """Current time on the clock ``joined_at`` is measured with."""
+        return _seconds(datetime.utcnow())
+
+    def _in_pool(self):
+        return Queue.time_control == self.time_control
+
+    def __len__(self):
+        return db.session.scalar(select(func.count()).select_from(Queue).where(self._in_pool()))
+
+    def __contains__(self, user_id):
+        return db.session.scalar(
+            select(Queue.id).where(Queue.user_id == user_id, self._in_pool())
+        ) is not None
+
+    @staticmethod
+    def pool_of(user_id):
+        """Time control ``user_id`` waits in, or None; one lookup across every pool."""
+        return db.session.scalar(select(Queue.time_control).where(Queue.user_id == user_id))
+
+    def add(self, user_id, rating, now=None):
+        """Queue ``user_id``. Raises ValueError if the user is already queued."""
+        try:
+            Queue(user_id=user_id, rating=rating, time_control=self.time_control).save()
+        except IntegrityError:
+            raise ValueError('User already in queue')
+
+    def snapshot(self):
+        """All waiting players of this pool, sorted by rating (ties: longest waiting first)."""
+        rows = db.session.execute(
+            select(Queue.user_id, Queue.rating, Queue.created_at)
+            .where(self._in_pool()).order_by(Queue.rating, Queue.created_at)
+        ).all()
+        return [QueuedPlayer(user_id, rating, _seconds(created_at)) for user_id, rating, created_at in rows]
+
+    def remove(self, user_id):
+        result = db.session.execute(delete(Queue).where(Queue.user_id == user_id, self._in_pool()))
+        db.session.commit()
+        return result.rowcount > 0
+
+    def _begin_locked(self):
+        """Start the pass's transaction; returns the SELECT for the rows to pair."""
+        stmt = select(Queue).where(self._in_pool()).order_by(Queue.rating, Queue.created_at).limit(self.batch_size)
+        conn = db.session.connection()
+        if conn.dialect.name == 'sqlite':
+            if not conn.connection.driver_connection.in_transaction:
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+            return stmt
+        return stmt.with_for_update(skip_locked=True)
+
+    def pair_pass(self, now=None):
+        """Pair one batch of waiting rows; returns the committed Games."""
+        self.last_waits = []
+        try:
+            lock_started = time.monotonic()
+            rows = db.session.execute(self._begin_locked()).scalars().all()
+            self.last_lock_wait = time.monotonic() - lock_started
+            if len(rows) < 2:
+                db.session.rollback()
+                return []
+
+            now = self.now() if now is None else now
+            players = [QueuedPlayer(r.user_id, r.rating, _seconds(r.created_at)) for r in rows]
+            pairs = pair_players(players, now)
+            if not pairs:
+                db.session.rollback()
+                return []
+
+            paired_ids = [p.user_id for pair in pairs for p in pair]
+            db.session.execute(delete(Queue).where(Queue.user_id.in_(paired_ids)))
+            games = games_for_pairs(pairs, self.time_control)
+            db.session.add_all(games)
+            db.session.commit()
+            self.last_waits = [now - p.joined_at for pair in pairs for p in pair]
+        except Exception:
+            db.session.rollback()
+            logger.exception('Database matchmaking pass failed')
+            raise
+        return games
@@ -0,0 +1,279 @@
+# backend/api/utils/matchmakingScheduler.py
+from . import db, socketio
+from .clockScheduler import clock_scheduler
+from .matchmakingIndex import BUCKET_WIDTH, MatchmakingIndex, estimate_waits
+from .matchmakingQueue import DatabaseMatchmakingQueue
+from .presence import presence
+from .timeControls import DEFAULT_TIME_CONTROL, PAIRING_TICK_SECONDS, TIME_CONTROLS
+from sqlalchemy import text
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MATCHMAKING_BACKENDS = ('memory', 'database')
+
+# Waiting players get a queue_status push at most this often per pool.
+STATUS_PUSH_SECONDS = 2.0
+# Weight of the newest pass in a pool's running average wait.
+WAIT_SMOOTHING = 0.2
+# Postgres advisory lock held by the one worker that pushes queue_status
+# with the database backend; the others retry this often.
+LEADER_LOCK_KEY = 7305618
+LEADER_RETRY_SECONDS = 5.0
+
+
+def queue_ack(time_control, rating=None):
+    """Cheap ``queue_status`` for a player whose position is not known yet."""
+    ack = {'queued': True, 'time_control': time_control}
+    if rating is not None:
+        low = rating // BUCKET_WIDTH * BUCKET_WIDTH
+        ack['rating_bucket'] = [low, low + BUCKET_WIDTH - 1]
+    return ack
+
+
+class MatchmakingScheduler:
+    """Background pairing loops for the matchmaking pools.
+
+    Every time control in TIME_CONTROLS has its own pool (``queues[key]``),
+    so a bullet player is only ever paired with another bullet player of the
+    same control. Joining only adds the player to a pool. Each pool has its
+    own loop that, every tick of its category (PAIRING_TICK_SECONDS), runs
+    one pairing pass over its waiting players (see ``pair_players``), which
+    creates every resulting Game in a single transaction, and then emits
+    ``start_game`` to both players' ``user_<id>`` rooms. Request handlers
+    therefore never wait on pairing, and a busy pool never delays another.
+
+    Every STATUS_PUSH_SECONDS the loop also pushes ``queue_status`` (position,
+    estimated wait) to everyone still waiting, so the waiting room never has
+    to poll.
+
+    ``MATCHMAKING_BACKEND`` picks the queues: ``memory`` (MatchmakingIndex,
+    one process only) or ``database`` (DatabaseMatchmakingQueue, shared by
+    any number of worker processes). With the database backend every worker
+    runs the pairing passes, each claiming its own batch of waiting rows
+    with ``FOR UPDATE SKIP LOCKED``, so pairing throughput grows with the
+    workers. Status pushes read the whole pool, so on Postgres only the
+    worker holding the LEADER_LOCK_KEY advisory lock sends them; if it dies
+    its connection closes, the lock is released and another worker takes
+    over. Other workers answer ``status_of`` with ``queue_ack``.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.backend = 'memory'
+        self.queues = {key: MatchmakingIndex(key) for key in TIME_CONTROLS}
+        self._lock = threading.Lock()
+        self._join_lock = threading.Lock()
+        self._started = False
+        # time control -> running average of how long paired players waited
+        self.average_wait = {}
+        self._last_status_push = {}
+        # time control -> {user_id: last pushed queue_status}
+        self._last_statuses = {}
+        self._elect = False
+        self._leader_lock = threading.Lock()
+        self._leader_conn = None
+        self._last_election = float('-inf')
+        self.reset_stats()
+
+    def init_app(self, app):
+        self.app = app
+        backend = app.config.get('MATCHMAKING_BACKEND', 'memory')
+        if backend not in MATCHMAKING_BACKENDS:
+            raise RuntimeError(f"MATCHMAKING_BACKEND must be one of {', '.join(MATCHMAKING_BACKENDS)}")
+        self.backend = backend
+        queue_class = DatabaseMatchmakingQueue if backend == 'database' else MatchmakingIndex
+        self.queues = {key: queue_class(key) for key in TIME_CONTROLS}
+        self._elect = backend == 'database'
+        # started by start_background_tasks, only in the serving process
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'passes': 0, 'games': 0, 'pass_seconds': 0.0, 'lock_wait_seconds': 0.0}
+
+    def is_leader(self):
+        """True if this process should push ``queue_status`` for the pools.
+
+        Always true for the memory backend and on databases without advisory
+        locks (SQLite serves one host, and its passes serialise anyway).
+        """
+        if not self._elect:
+            return True
+        with self._leader_lock:
+            now = time.monotonic()
+            if now - self._last_election < LEADER_RETRY_SECONDS:
+                return self._leader_conn is not None
+            self._last_election = now
+            try:
+                if self._leader_conn is not None:
+                    # the lock lives as long as this connection; make sure it still does
+                    self._leader_conn.execute(text('SELECT 1'))
+                    return True
+                if db.engine.dialect.name != 'postgresql':
+                    self._elect = False
+                    return True
+                conn = db.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+                if conn.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': LEADER_LOCK_KEY}).scalar():
+                    self._leader_conn = conn
+                    logger.info('Matchmaking: this worker now pushes queue statuses')
+                    return True
+                conn.close()
+            except Exception:
+                logger.exception('Matchmaking leader election failed')
+                if self._leader_conn is not None:
+                    self._leader_conn.invalidate()
+                    self._leader_conn = None
+            return False
+
+    def queue_for(self, time_control=None):
+        """The pool for ``time_control``; raises KeyError for unknown controls."""
+        return self.queues[time_control or DEFAULT_TIME_CONTROL]
+
+    def queued_in(self, user_id):
+        """Time control ``user_id`` is waiting for, or None."""
+        if self.backend == 'database':
+            # queue.user_id is unique, so one row says which pool
+            return DatabaseMatchmakingQueue.pool_of(user_id)
+        for key, queue in self.queues.items():
+            if user_id in queue:
+                return key
+        return None
+
+    def join(self, user_id, rating, time_control=None):
+        """Queue ``user_id`` in one pool. Raises ValueError if they already wait in any pool."""
+        queue = self.queue_for(time_control)
+        with self._join_lock:
+            if self.queued_in(user_id) is not None:
+                raise ValueError('User already in queue')
+            queue.add(user_id, rating)
+
+    def leave(self, user_id):
+        """Take ``user_id`` out of whichever pool holds them; False if none did."""
+        time_control = self.queued_in(user_id)
+        removed = time_control is not None and self.queues[time_control].remove(user_id)
+        for statuses in self._last_statuses.values():
+            statuses.pop(user_id, None)
+        return removed
+
+    def queue_statuses(self, time_control):
+        """``queue_status`` payloads for everyone waiting in one pool, by user id."""
+        queue = self.queues[time_control]
+        players = queue.snapshot()
+        now = queue.now()
+        estimates = estimate_waits(players, now)
+        by_wait = sorted(players, key=lambda p: p.joined_at)
+        positions = {p.user_id: position for position, p in enumerate(by_wait, 1)}
+        average = self.average_wait.get(time_control)
+
+        statuses = {}
+        for player, estimate in zip(players, estimates):
+            waited = max(now - player.joined_at, 0.0)
+            if estimate is None and average is not None:
+                # nobody compatible is waiting; fall back on how long the pool usually takes
+                estimate = max(average - waited, 0.0)
+            statuses[player.user_id] = {
+                'queued': True,
+                'time_control': time_control,
+                'position': positions[player.user_id],
+                'waiting': len(players),
+                'waited_seconds': round(waited, 1),
+                'estimated_wait_seconds': None if estimate is None else round(estimate, 1),
+            }
+        return statuses
+
+    def status_of(self, user_id):
+        """``queue_status`` payload for ``user_id``; ``{'queued': False}`` if not waiting.
+
+        Answers from the last push of the user's pool instead of taking a
+        fresh snapshot; players queued since then get ``queue_ack``.
+        """
+        time_control = self.queued_in(user_id)
+        if time_control is None:
+            return {'queued': False}
+        return self._last_statuses.get(time_control, {}).get(user_id) or queue_ack(time_control)
+
+    def push_queue_status(self, time_control):
+        """Emit ``queue_status`` to every player waiting in one pool."""
+        self._last_status_push[time_control] = time.monotonic()
+        statuses = self.queue_statuses(time_control)
+        self._last_statuses[time_control] = statuses
+        for user_id, status in statuses.items():
+            socketio.emit('queue_status', status, to=f"user_{user_id}")
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for key in self.queues:
+            socketio.start_background_task(self._run, key)
+        logger.info('Matchmaking scheduler started for %d pools', len(self.queues))
+
+    def _run(self, time_control):
+        tick_seconds = PAIRING_TICK_SECONDS[TIME_CONTROLS[time_control].category]
+        while True:
+            started = time.monotonic()
+            try:
+                with self.app.app_context():
+                    self.run_once(time_control=time_control)
+            except Exception:
+                logger.exception('Matchmaking pass failed for %s', time_control)
+            socketio.sleep(max(0.0, tick_seconds - (time.monotonic() - started)))
+
+    def run_once(self, now=None, time_control=None):
+        """Run one pairing pass of one pool, or of every pool when
+        ``time_control`` is None; returns the list of created Games."""
+        keys = [time_control] if time_control is not None else list(self.queues)
+        games = []
+        for key in keys:
+            games.extend(self._pair_pool(self.queues[key], now))
+        return games
+
+    def _pair_pool(self, queue, now):
+        started = time.monotonic()
+        games = queue.pair_pass(now)
+
+        # one loop per pool updates these concurrently
+        with self._lock:
+            self.stats['passes'] += 1
+            self.stats['games'] += len(games)
+            self.stats['pass_seconds'] += time.monotonic() - started
+            self.stats['lock_wait_seconds'] += getattr(queue, 'last_lock_wait', 0.0)
+
+        for game in games:
+            clock_scheduler.schedule_game(game)
+            presence.game_started(game.id, (game.white_user_id, game.black_user_id))
+            socketio.emit('start_game', {
+                'game_id': game.id,
+                'opponent': game.black_user_id,
+                'color': 'white',
+                'time_control': game.time_control
+            }, to=f"user_{game.white_user_id}")
+            socketio.emit('start_game', {
+                'game_id': game.id,
+                'opponent': game.white_user_id,
+                'color': 'black',
+                'time_control': game.time_control
+            }, to=f"user_{game.black_user_id}")
+
+        waits = getattr(queue, 'last_waits', None)
+        if waits:
+            mean = sum(waits) / len(waits)
+            with self._lock:
+                previous = self.average_wait.get(queue.time_control)
+                self.average_wait[queue.time_control] = (
+                    mean if previous is None else previous + WAIT_SMOOTHING * (mean - previous)
+                )
+
+        if (time.monotonic() - self._last_status_push.get(queue.time_control, float('-inf')) >= STATUS_PUSH_SECONDS
+                and self.is_leader()):
+            self.push_queue_status(queue.time_control)
+
+        if games:
+            logger.info('Matchmaking paired %d %s games', len(games), queue.time_control)
+        return games
+
+
+matchmaking_scheduler = MatchmakingScheduler()
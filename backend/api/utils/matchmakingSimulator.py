@@ -0,0 +1,243 @@
+# backend/api/utils/matchmakingSimulator.py
+"""Load simulation of the matchmaking namespace.
+
+Synthetic players arrive as a Poisson process, each joining the queue through
+``POST /matchmaking/matchmaking`` exactly like a client would. The pools are
+paired on their normal ticks by calling ``matchmaking_scheduler.run_once``
+inline, so every pass, game and wait is observed directly. Run it against a
+scratch database: the synthetic users, queue rows and games are created for
+real (and removed again by ``cleanup``).
+"""
+from . import db
+from .matchmakingIndex import MatchmakingIndex
+from .matchmakingQueue import DatabaseMatchmakingQueue
+from .matchmakingScheduler import MATCHMAKING_BACKENDS, matchmaking_scheduler
+from .timeControls import DEFAULT_TIME_CONTROL, PAIRING_TICK_SECONDS, TIME_CONTROLS
+from ..models.games import Game
+from ..models.queue import Queue
+from ..models.users import User
+from flask_jwt_extended import create_access_token
+from sqlalchemy import delete, insert, or_
+from datetime import datetime
+import random
+import time
+import uuid
+
+SIMULATED_PASSWORD_HASH = '!simulated'
+SIMULATED_EMAIL_DOMAIN = 'simulated.invalid'
+
+RATING_DISTRIBUTIONS = ('normal', 'uniform')
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(values):
+    """Count, mean, max and PERCENTILES of ``values``."""
+    values = sorted(values)
+    summary = {'count': len(values)}
+    if values:
+        summary['mean'] = sum(values) / len(values)
+        summary['max'] = values[-1]
+        for pct in PERCENTILES:
+            summary[f'p{pct}'] = percentile(values, pct)
+    return summary
+
+
+class MatchmakingSimulation:
+    """One simulated run; call ``setup()``, ``run()``, ``report()`` and ``cleanup()``.
+
+    ``time_controls`` maps a time control key to its share of arrivals.
+    Ratings are drawn from a normal (mean, spread = standard deviation) or
+    uniform (mean +- spread) distribution. After the last arrival the pools
+    keep being paired for at most ``drain_seconds``; whoever is still
+    waiting then counts as unpaired.
+    """
+
+    def __init__(self, app, players=1000, arrival_rate=50.0, rating_distribution='normal',
+                 rating_mean=1500, rating_spread=200, time_controls=None, backend=None,
+                 drain_seconds=60.0, seed=None, progress=None):
+        if rating_distribution not in RATING_DISTRIBUTIONS:
+            raise ValueError(f'Unknown rating distribution {rating_distribution!r}')
+        if backend is not None and backend not in MATCHMAKING_BACKENDS:
+            raise ValueError(f'Unknown matchmaking backend {backend!r}')
+        time_controls = time_controls or {DEFAULT_TIME_CONTROL: 1.0}
+        unknown = [key for key in time_controls if key not in TIME_CONTROLS]
+        if unknown:
+            raise ValueError(f"Unknown time controls: {', '.join(unknown)}")
+
+        self.app = app
+        self.players = players
+        self.arrival_rate = arrival_rate
+        self.rating_distribution = rating_distribution
+        self.rating_mean = rating_mean
+        self.rating_spread = rating_spread
+        self.time_controls = time_controls
+        self.backend = backend
+        self.drain_seconds = drain_seconds
+        self.random = random.Random(seed)
+        self.progress = progress or (lambda message: None)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.user_ids = []
+
+    def _draw_rating(self):
+        if self.rating_distribution == 'uniform':
+            rating = self.random.uniform(self.rating_mean - self.rating_spread, self.rating_mean + self.rating_spread)
+        else:
+            rating = self.random.gauss(self.rating_mean, self.rating_spread)
+        return max(int(round(rating)), 100)
+
+    def setup(self):
+        """Create the synthetic users and plan their arrivals."""
+        now = datetime.utcnow()
+        rows = [{
+            'username': f'sim_{self.run_id}_{i}',
+            'email': f'sim_{self.run_id}_{i}@{SIMULATED_EMAIL_DOMAIN}',
+            'password_hash': SIMULATED_PASSWORD_HASH,
+            'elo': self._draw_rating(),
+            'created_at': now,
+            'updated_at': now,
+        } for i in range(self.players)]
+        created = db.session.execute(
+            insert(User).returning(User.id, User.elo, sort_by_parameter_order=True), rows
+        ).all()
+        db.session.commit()
+        self.user_ids = [uid for uid, _ in created]
+        self.ratings = dict(created)
+
+        keys = list(self.time_controls)
+        weights = [self.time_controls[key] for key in keys]
+        at = 0.0
+        self.arrivals = []
+        for uid in self.user_ids:
+            at += self.random.expovariate(self.arrival_rate)
+            headers = {'Authorization': f'Bearer {create_access_token(identity=str(uid))}'}
+            self.arrivals.append((at, uid, self.random.choices(keys, weights)[0], headers))
+        self.progress(f'created {len(self.user_ids):,} synthetic players (run {self.run_id})')
+
+    def _use_backend(self):
+        """Point the scheduler at fresh queues of the requested backend; returns the old ones."""
+        previous = matchmaking_scheduler.queues
+        if self.backend is not None:
+            queue_class = DatabaseMatchmakingQueue if self.backend == 'database' else MatchmakingIndex
+            matchmaking_scheduler.queues = {key: queue_class(key) for key in TIME_CONTROLS}
+        return previous
+
+    def run(self):
+        """Replay the arrivals in real time while pairing every pool on its tick."""
+        client = self.app.test_client()
+        previous_queues = self._use_backend()
+        matchmaking_scheduler.reset_stats()
+
+        self.join_latencies = []
+        self.join_errors = 0
+        self.arrival_seconds = 0.0
+        self.pass_seconds = []
+        self.waits = {key: [] for key in self.time_controls}
+        self.gaps = []
+        joined_at = {}
+        pools = list(self.time_controls)
+        ticks = {key: PAIRING_TICK_SECONDS[TIME_CONTROLS[key].category] for key in pools}
+
+        started = time.monotonic()
+        next_pass = {key: started + ticks[key] for key in pools}
+        last_report = started
+        deadline = None
+        i = 0
+        try:
+            while True:
+                now = time.monotonic()
+                while i < len(self.arrivals) and started + self.arrivals[i][0] <= now:
+                    _, uid, key, headers = self.arrivals[i]
+                    sent = time.monotonic()
+                    response = client.post('/matchmaking/matchmaking', headers=headers, json={'time_control': key})
+                    self.join_latencies.append(time.monotonic() - sent)
+                    if response.status_code == 201:
+                        joined_at[uid] = sent
+                    else:
+                        self.join_errors += 1
+                    i += 1
+                    self.arrival_seconds = time.monotonic() - started
+
+                for key in pools:
+                    if next_pass[key] > now:
+                        continue
+                    pass_started = time.monotonic()
+                    games = matchmaking_scheduler.run_once(time_control=key)
+                    paired = time.monotonic()
+                    self.pass_seconds.append(paired - pass_started)
+                    for game in games:
+                        if game.white_user_id not in joined_at or game.black_user_id not in joined_at:
+                            continue  # players of a real client, on a database that is not a scratch one
+                        for uid in (game.white_user_id, game.black_user_id):
+                            self.waits[key].append(paired - joined_at.pop(uid))
+                        self.gaps.append(abs(self.ratings[game.white_user_id] - self.ratings[game.black_user_id]))
+                    next_pass[key] = max(next_pass[key] + ticks[key], paired)
+
+                if now - last_report >= 5:
+                    last_report = now
+                    self.progress(f'{now - started:.0f}s: {i:,} joined, {len(self.gaps):,} games, {len(joined_at):,} waiting')
+
+                if i == len(self.arrivals):
+                    if deadline is None:
+                        deadline = now + self.drain_seconds
+                    if not joined_at or now >= deadline:
+                        break
+
+                wake = min(next_pass.values())
+                if i < len(self.arrivals):
+                    wake = min(wake, started + self.arrivals[i][0])
+                time.sleep(max(0.0, wake - time.monotonic()))
+        finally:
+            self.elapsed = time.monotonic() - started
+            self.unpaired = len(joined_at)
+            for uid in list(joined_at):
+                matchmaking_scheduler.leave(uid)
+            self.stats = dict(matchmaking_scheduler.stats)
+            matchmaking_scheduler.queues = previous_queues
+
+    def report(self):
+        """Summary of the run as a plain dict."""
+        games = len(self.gaps)
+        all_waits = [w for waits in self.waits.values() for w in waits]
+        return {
+            'players': self.players,
+            'elapsed_seconds': self.elapsed,
+            'offered_joins_per_second': self.arrival_rate,
+            'joins_per_second': len(self.join_latencies) / self.arrival_seconds if self.arrival_seconds else 0.0,
+            'join_errors': self.join_errors,
+            'games': games,
+            'pairs_per_second': games / self.elapsed if self.elapsed else 0.0,
+            'unpaired': self.unpaired,
+            'join_latency_seconds': summarize(self.join_latencies),
+            'pairing_wait_seconds': summarize(all_waits),
+            'pairing_wait_seconds_by_time_control': {key: summarize(waits) for key, waits in self.waits.items()},
+            'pass_seconds': summarize(self.pass_seconds),
+            'lock_wait_seconds': self.stats['lock_wait_seconds'],
+            'rating_gap': summarize(self.gaps),
+        }
+
+    def cleanup(self):
+        """Delete the synthetic users with their queue rows and games."""
+        if not self.user_ids:
+            return
+        ids = self.user_ids
+        try:
+            for start in range(0, len(ids), 1000):
+                chunk = ids[start:start + 1000]
+                db.session.execute(delete(Queue).where(Queue.user_id.in_(chunk)))
+                db.session.execute(delete(Game).where(or_(Game.white_user_id.in_(chunk), Game.black_user_id.in_(chunk))))
+            for start in range(0, len(ids), 1000):
+                db.session.execute(delete(User).where(User.id.in_(ids[start:start + 1000])))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.progress(f'removed {len(ids):,} synthetic players and their games')
+        self.user_ids = []
@@ -0,0 +1,77 @@
+# backend/api/utils/moveCodec.py
+"""Compact binary encoding of a game's moves and clock usage.
+
+Moves are packed as one big-endian 16-bit word per ply:
+
+    bits 0-5    from square (0-63)
+    bits 6-11   to square (0-63)
+    bits 12-14  promotion piece (0 = none, 1 = knight ... 4 = queen)
+
+Clock usage is a sequence of unsigned LEB128 varints, one per ply, holding the
+milliseconds the mover spent on that move (1-3 bytes for typical moves).
+"""
+import chess
+import struct
+
+
+def encode_move(move):
+    code = move.from_square | (move.to_square << 6)
+    if move.promotion:
+        code |= (move.promotion - 1) << 12
+    return code
+
+
+def decode_move(code):
+    promotion = (code >> 12) & 0x7
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, promotion + 1 if promotion else None)
+
+
+def pack_move(move):
+    """Return the 2-byte encoding of a single chess.Move."""
+    return struct.pack('>H', encode_move(move))
+
+
+def encode_moves(ucis):
+    """Encode an iterable of UCI strings into a move blob."""
+    return b''.join(pack_move(chess.Move.from_uci(uci)) for uci in ucis)
+
+
+def decode_moves(data):
+    """Decode a move blob into a list of chess.Move objects."""
+    if not data:
+        return []
+    return [decode_move(code) for (code,) in struct.iter_unpack('>H', data)]
+
+
+def decode_ucis(data):
+    return [m.uci() for m in decode_moves(data)]
+
+
+def move_count(data):
+    return len(data) // 2 if data else 0
+
+
+def pack_varint(value):
+    value = max(0, int(value))
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def decode_varints(data):
+    values = []
+    value = shift = 0
+    for byte in data or b'':
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
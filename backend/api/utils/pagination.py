@@ -0,0 +1,80 @@
+# backend/api/utils/pagination.py
+"""Opaque cursors for keyset pagination.
+
+A cursor holds the sort key of the last row of a page, e.g. (created_at, id).
+The next page is read with ``WHERE (created_at, id) < :cursor ORDER BY
+created_at DESC, id DESC LIMIT n``, which a composite index on those columns
+answers directly, so every page costs the same however deep it is.
+"""
+from . import db
+from sqlalchemy import func, select, tuple_
+from werkzeug.exceptions import BadRequest
+from datetime import datetime
+import base64
+import json
+
+# The "approximate" total stops counting here.
+APPROX_COUNT_CAP = 1000
+
+
+def encode_cursor(*values):
+    """Opaque, URL-safe cursor for a row with sort key ``values``."""
+    payload = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, size):
+    """Sort key stored in ``cursor``; raises BadRequest if it is not a cursor of ``size`` values."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError
+        return tuple(datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in payload)
+    except (ValueError, TypeError, KeyError):
+        raise BadRequest('Invalid cursor')
+
+
+def after(columns, key, descending=False):
+    """Filter for rows that come after sort key ``key`` in (columns) order."""
+    if descending:
+        return tuple_(*columns) < tuple_(*key)
+    return tuple_(*columns) > tuple_(*key)
+
+
+def page_args(args, default_limit=None, max_limit=None):
+    """Read limit, offset and cursor from request args.
+
+    Returns (limit, offset, cursor); raises BadRequest for bad values or when
+    both offset and cursor are given.
+    """
+    limit = args.get('limit', default_limit, type=int)
+    offset = args.get('offset', type=int)
+    cursor = args.get('cursor') or None
+    if limit is not None and limit < 1:
+        raise BadRequest('limit must be positive')
+    if offset is not None and offset < 0:
+        raise BadRequest('offset must not be negative')
+    if offset is not None and cursor is not None:
+        raise BadRequest('Use either offset or cursor, not both')
+    if limit is not None and max_limit is not None:
+        limit = min(limit, max_limit)
+    return limit, offset, cursor
+
+
+def total_headers(stmt, mode):
+    """X-Total-Count for the rows of ``stmt``.
+
+    ``mode`` 'exact' counts every row; 'approx' stops at APPROX_COUNT_CAP and
+    then also sends ``X-Total-Count-Approximate: true``.
+    """
+    if mode == 'exact':
+        return {'X-Total-Count': db.session.scalar(select(func.count()).select_from(stmt.subquery()))}
+    if mode == 'approx':
+        count = db.session.scalar(select(func.count()).select_from(stmt.limit(APPROX_COUNT_CAP).subquery()))
+        headers = {'X-Total-Count': count}
+        if count >= APPROX_COUNT_CAP:
+            headers['X-Total-Count-Approximate'] = 'true'
+        return headers
+    raise BadRequest("total must be 'exact' or 'approx'")
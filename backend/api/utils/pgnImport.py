@@ -0,0 +1,288 @@
+# backend/api/utils/pgnImport.py
+from . import db
+from .moveCodec import pack_move, pack_varint
+from ..models.games import Game
+from ..models.users import User
+from ..models.elo import EloEntry
+from sqlalchemy import insert
+from datetime import datetime, timedelta
+import chess
+import chess.pgn
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+RESULTS = ('1-0', '0-1', '1/2-1/2')
+# imported accounts cannot log in until the owner resets their password
+IMPORTED_PASSWORD_HASH = '!imported'
+IMPORTED_EMAIL_DOMAIN = 'imported.invalid'
+
+
+class _MainLineVisitor(chess.pgn.BaseVisitor):
+    """Collects headers and main-line moves only; variations are skipped unparsed."""
+
+    def begin_game(self):
+        self.headers = {}
+        self.moves = []
+        self.board = None
+        self.errors = []
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self.moves.append(move)
+        self.board = board
+
+    def handle_error(self, error):
+        self.errors.append(error)
+
+    def result(self):
+        return self
+
+
+def _parse_date(headers):
+    date = headers.get('UTCDate') or headers.get('Date') or ''
+    clock = headers.get('UTCTime') or '00:00:00'
+    try:
+        return datetime.strptime(f"{date} {clock}", '%Y.%m.%d %H:%M:%S')
+    except ValueError:
+        try:
+            return datetime.strptime(date, '%Y.%m.%d')
+        except ValueError:
+            return None
+
+
+def _standard_start(headers):
+    """True unless the game starts from a set-up position or is a variant.
+
+    move_data is replayed from the standard starting position everywhere
+    (export, summaries, live games), so other games cannot be stored.
+    """
+    variant = (headers.get('Variant') or 'Standard').strip().lower()
+    if variant not in ('standard', 'chess', 'normal'):
+        return False
+    return 'FEN' not in headers and headers.get('SetUp', '0').strip() != '1'
+
+
+def _parse_elo(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PgnImporter:
+    """Bulk loader for PGN archives.
+
+    Games are parsed as a stream and written in batches: one multi-row INSERT
+    for the games (returning their ids), one for their Elo entries and one
+    commit per batch. After every commit the file position is written to a
+    ``<file>.import-state`` checkpoint so an interrupted run resumes where the
+    last committed batch ended instead of starting over.
+    """
+
+    def __init__(self, path, batch_size=1000, create_missing=True, default_elo=1200, progress=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.default_elo = default_elo
+        self.progress = progress or (lambda message: None)
+        self.state_path = f"{path}.import-state"
+        self._user_ids = {}
+        self.imported = 0
+        self.skipped = 0
+
+    # ------------------------------------------------------------------
+    # checkpoint
+    # ------------------------------------------------------------------
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {'offset': 0, 'imported': 0, 'skipped': 0}
+        with open(self.state_path) as fh:
+            return json.load(fh)
+
+    def _save_state(self, offset):
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump({'offset': offset, 'imported': self.imported, 'skipped': self.skipped}, fh)
+        os.replace(tmp, self.state_path)
+
+    def reset(self):
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    # ------------------------------------------------------------------
+    # players
+    # ------------------------------------------------------------------
+
+    def _resolve_users(self, names, first_played=None):
+        """Map PGN player names to user ids, creating accounts when allowed.
+
+        ``first_played`` maps a name to the date of its earliest game in the
+        batch; a created account's starting rating entry is dated just
+        before it, so the imported ratings stay the newest entries.
+        """
+        first_played = first_played or {}
+        missing = {n for n in names if n not in self._user_ids}
+        if not missing:
+            return
+
+        for uid, username in db.session.query(User.id, User.username).filter(User.username.in_(missing)):
+            self._user_ids[username] = uid
+        missing -= self._user_ids.keys()
+        if not missing or not self.create_missing:
+            return
+
+        now = datetime.utcnow()
+        rows = [{
+            'username': name,
+            'email': f"{name}@{IMPORTED_EMAIL_DOMAIN}",
+            'password_hash': IMPORTED_PASSWORD_HASH,
+            'elo': self.default_elo,
+            'created_at': now,
+            'updated_at': now,
+        } for name in sorted(missing)]
+        created = db.session.execute(
+            insert(User).returning(User.id, User.username, sort_by_parameter_order=True), rows
+        ).all()
+        for uid, username in created:
+            self._user_ids[username] = uid
+
+        # every account starts with a rating entry, same as signup
+        db.session.execute(insert(EloEntry), [
+            {'user_id': uid, 'game_id': None, 'elo': self.default_elo,
+             'created_at': first_played[username] - timedelta(seconds=1) if username in first_played else now}
+            for uid, username in created
+        ])
+
+    # ------------------------------------------------------------------
+    # games
+    # ------------------------------------------------------------------
+
+    def _to_row(self, parsed):
+        headers = parsed.headers
+        result = headers.get('Result')
+        white = (headers.get('White') or '').strip()[:50]
+        black = (headers.get('Black') or '').strip()[:50]
+        if result not in RESULTS or not white or not black or white == black or parsed.errors:
+            return None
+        if not _standard_start(headers):
+            return None
+
+        white_id = self._user_ids.get(white)
+        black_id = self._user_ids.get(black)
+        if white_id is None or black_id is None:
+            return None
+
+        played_at = _parse_date(headers) or datetime.utcnow()
+        if result == '1-0':
+            winner_id = white_id
+        elif result == '0-1':
+            winner_id = black_id
+        else:
+            winner_id = None
+
+        final_fen = parsed.board.fen() if parsed.board is not None else chess.STARTING_FEN
+
+        return {
+            'game': {
+                'in_progress': False,
+                'current_fen': final_fen,
+                'white_user_id': white_id,
+                'black_user_id': black_id,
+                'winner_id': winner_id,
+                'win_by_resignation': 'resign' in (headers.get('Termination') or '').lower(),
+                'ply_count': len(parsed.moves),
+                'move_data': b''.join(pack_move(m) for m in parsed.moves),
+                # per-move clock usage is unknown for imported games
+                'clock_data': pack_varint(0) * len(parsed.moves),
+                'created_at': played_at,
+                'updated_at': played_at,
+            },
+            'white_elo': _parse_elo(headers.get('WhiteElo')),
+            'black_elo': _parse_elo(headers.get('BlackElo')),
+        }
+
+    def _flush(self, parsed_batch):
+        names = set()
+        first_played = {}
+        for parsed in parsed_batch:
+            played_at = _parse_date(parsed.headers)
+            for tag in ('White', 'Black'):
+                name = (parsed.headers.get(tag) or '').strip()[:50]
+                names.add(name)
+                if played_at is not None and (name not in first_played or played_at < first_played[name]):
+                    first_played[name] = played_at
+        names.discard('')
+        self._resolve_users(names, first_played)
+
+        rows = []
+        for parsed in parsed_batch:
+            row = self._to_row(parsed)
+            if row is None:
+                self.skipped += 1
+            else:
+                rows.append(row)
+
+        if rows:
+            game_ids = db.session.execute(
+                insert(Game).returning(Game.id, sort_by_parameter_order=True),
+                [r['game'] for r in rows]
+            ).scalars().all()
+
+            elo_rows = []
+            for gid, r in zip(game_ids, rows):
+                g = r['game']
+                if r['white_elo'] is not None:
+                    elo_rows.append({'user_id': g['white_user_id'], 'game_id': gid, 'elo': r['white_elo'], 'created_at': g['created_at']})
+                if r['black_elo'] is not None:
+                    elo_rows.append({'user_id': g['black_user_id'], 'game_id': gid, 'elo': r['black_elo'], 'created_at': g['created_at']})
+            if elo_rows:
+                db.session.execute(insert(EloEntry), elo_rows)
+
+        db.session.commit()
+        self.imported += len(rows)
+
+    def run(self):
+        state = self._load_state()
+        self.imported = state['imported']
+        self.skipped = state['skipped']
+        if state['offset']:
+            self.progress(f"resuming at offset {state['offset']} ({self.imported} games already imported)")
+
+        started = time.monotonic()
+        done_this_run = 0
+        with open(self.path, encoding='utf-8-sig', errors='replace') as fh:
+            fh.seek(state['offset'])
+            batch = []
+            while True:
+                parsed = chess.pgn.read_game(fh, Visitor=_MainLineVisitor)
+                if parsed is not None:
+                    batch.append(parsed)
+                if batch and (parsed is None or len(batch) >= self.batch_size):
+                    try:
+                        self._flush(batch)
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception('PGN import batch failed; resume to retry from the last checkpoint')
+                        raise
+                    done_this_run += len(batch)
+                    self._save_state(fh.tell())
+                    elapsed = max(time.monotonic() - started, 1e-9)
+                    self.progress(
+                        f"imported {self.imported} games, skipped {self.skipped} "
+                        f"({done_this_run / elapsed * 60:,.0f} games/min)"
+                    )
+                    batch = []
+                if parsed is None:
+                    break
+
+        return self.imported, self.skipped
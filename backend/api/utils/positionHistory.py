@@ -0,0 +1,77 @@
+# backend/api/utils/positionHistory.py
+from array import array
+from collections import Counter
+import chess.polyglot
+import sys
+
+
+class PositionHistory:
+    """Zobrist keys of every position reached in a game, oldest first.
+
+    Occurrence counts are kept alongside the key list, so asking how often the
+    current position has appeared is a dict lookup instead of a replay of the
+    move stack. Keys are polyglot Zobrist hashes, which already fold in side to
+    move, castling rights and (capturable) en passant squares, i.e. exactly what
+    makes two positions "the same" for repetition purposes.
+
+    Serialized as packed big-endian 64-bit integers (8 bytes per position).
+    """
+
+    def __init__(self, keys=()):
+        self._keys = array('Q', keys)
+        self._counts = Counter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"PositionHistory | Positions: {len(self._keys)} | Distinct: {len(self._counts)}"
+
+    @classmethod
+    def from_board(cls, board):
+        """Build a history by hashing every position along ``board``'s move stack."""
+        replay = board.root()
+        history = cls()
+        history.push(replay)
+        for move in board.move_stack:
+            replay.push(move)
+            history.push(replay)
+        return history
+
+    @classmethod
+    def from_bytes(cls, data):
+        keys = array('Q')
+        keys.frombytes(data or b'')
+        if sys.byteorder == 'little':
+            keys.byteswap()
+        history = cls()
+        history._keys = keys
+        history._counts = Counter(keys)
+        return history
+
+    def to_bytes(self):
+        if sys.byteorder == 'little':
+            keys = array('Q', self._keys)
+            keys.byteswap()
+            return keys.tobytes()
+        return self._keys.tobytes()
+
+    def push(self, board):
+        """Record the position ``board`` is in now; returns how often it has occurred."""
+        key = chess.polyglot.zobrist_hash(board)
+        self._keys.append(key)
+        self._counts[key] += 1
+        return self._counts[key]
+
+    def pop(self):
+        key = self._keys.pop()
+        self._counts[key] -= 1
+        if not self._counts[key]:
+            del self._counts[key]
+        return key
+
+    def repetitions(self):
+        """How many times the current position has occurred (1 if it is new)."""
+        if not self._keys:
+            return 0
+        return self._counts[self._keys[-1]]
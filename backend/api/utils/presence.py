@@ -0,0 +1,170 @@
+# backend/api/utils/presence.py
+from . import db, socketio
+from ..models.friendships import Friendship, FriendshipStatus
+from sqlalchemy import select, union_all
+from datetime import datetime
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def load_friend_ids(user_id):
+    """Ids of ``user_id``'s accepted friends."""
+    accepted = Friendship.status == FriendshipStatus.ACCEPTED
+    rows = db.session.execute(union_all(
+        select(Friendship.user2_id).where((Friendship.user1_id == user_id) & accepted),
+        select(Friendship.user1_id).where((Friendship.user2_id == user_id) & accepted),
+    ))
+    return {friend_id for friend_id, in rows}
+
+
+class PresenceRegistry:
+    """Who is online on this process, kept from socket connects and disconnects.
+
+    Tracks the open sockets of every connected user, when each user was last
+    seen and which game they are playing, so presence lookups never touch
+    the database. The friend ids of online users are loaded once when they
+    come online; changes of online/in-game state are pushed as ``presence``
+    events to the ``user_<id>`` rooms of their online friends.
+
+    Sockets connected to other workers are not visible here; ``authoritative``
+    is False when a Socket.IO message queue is configured, and callers must
+    then not treat "offline" as certain. The game map only covers games
+    started here until the clock scheduler has registered the games already
+    running at startup; see ``knows_all_games``.
+    """
+
+    def __init__(self):
+        self.authoritative = True
+        self._games_seeded = False
+        self._lock = threading.Lock()
+        self._sids = {}
+        self._last_seen = {}
+        self._games = {}
+        self._friends = {}
+        self._offline_listeners = []
+
+    def init_app(self, app):
+        self.authoritative = not app.config.get('SOCKETIO_MESSAGE_QUEUE')
+
+    def on_offline(self, listener):
+        """Call ``listener(user_id)`` after a user's last socket here closes."""
+        self._offline_listeners.append(listener)
+        return listener
+
+    def connect(self, user_id, sid):
+        """Register socket ``sid`` of ``user_id``; returns True if the user came online."""
+        with self._lock:
+            sids = self._sids.setdefault(user_id, set())
+            came_online = not sids
+            sids.add(sid)
+            self._last_seen[user_id] = datetime.utcnow()
+        if came_online:
+            friends = load_friend_ids(user_id)
+            with self._lock:
+                if user_id in self._sids:
+                    self._friends[user_id] = friends
+            self._push(user_id)
+        return came_online
+
+    def disconnect(self, user_id, sid):
+        """Drop socket ``sid`` of ``user_id``; returns True if it was the user's last one."""
+        with self._lock:
+            sids = self._sids.get(user_id)
+            if sids is None or sid not in sids:
+                return False
+            sids.discard(sid)
+            self._last_seen[user_id] = datetime.utcnow()
+            if sids:
+                return False
+            del self._sids[user_id]
+            friends = self._friends.pop(user_id, set())
+        self._push(user_id, friends)
+        for listener in self._offline_listeners:
+            try:
+                listener(user_id)
+            except Exception:
+                logger.exception('Presence offline listener failed for user %s', user_id)
+        return True
+
+    def game_started(self, game_id, user_ids, notify=True):
+        with self._lock:
+            for user_id in user_ids:
+                self._games[user_id] = game_id
+        if notify:
+            for user_id in user_ids:
+                self._push(user_id)
+
+    def game_ended(self, game_id, user_ids):
+        changed = []
+        with self._lock:
+            for user_id in user_ids:
+                if self._games.get(user_id) == game_id:
+                    del self._games[user_id]
+                    changed.append(user_id)
+        for user_id in changed:
+            self._push(user_id)
+
+    def games_seeded(self):
+        """Record that every game running at startup has been passed to ``game_started``."""
+        self._games_seeded = True
+
+    def knows_all_games(self):
+        """True when ``game_of`` is certain: one process, and running games seeded."""
+        return self.authoritative and self._games_seeded
+
+    def friendship_added(self, user_id, friend_id):
+        """Start pushing presence between two new friends, and tell each about the other."""
+        with self._lock:
+            for a, b in ((user_id, friend_id), (friend_id, user_id)):
+                if a in self._friends:
+                    self._friends[a].add(b)
+        self._push(user_id, {friend_id})
+        self._push(friend_id, {user_id})
+
+    def friendship_removed(self, user_id, friend_id):
+        with self._lock:
+            for a, b in ((user_id, friend_id), (friend_id, user_id)):
+                if a in self._friends:
+                    self._friends[a].discard(b)
+
+    def is_online(self, user_id):
+        return user_id in self._sids
+
+    def game_of(self, user_id):
+        """Id of the game ``user_id`` is playing here, or None; only certain when ``authoritative``."""
+        return self._games.get(user_id)
+
+    def lookup(self, user_ids):
+        """Map user id -> {online, connections, in_game, game_id, last_seen} for ``user_ids``."""
+        with self._lock:
+            return {user_id: self._status_locked(user_id) for user_id in user_ids}
+
+    def _status_locked(self, user_id):
+        last_seen = self._last_seen.get(user_id)
+        game_id = self._games.get(user_id)
+        return {
+            'online': user_id in self._sids,
+            'connections': len(self._sids.get(user_id, ())),
+            'in_game': game_id is not None,
+            'game_id': game_id,
+            'last_seen': last_seen.isoformat() if last_seen else None,
+        }
+
+    def _push(self, user_id, friends=None):
+        """Emit ``user_id``'s presence to their online friends (or to ``friends``)."""
+        with self._lock:
+            if friends is None:
+                friends = self._friends.get(user_id, set())
+            targets = [friend_id for friend_id in friends if friend_id in self._sids]
+            status = self._status_locked(user_id)
+        if not targets:
+            return
+        payload = {'user_id': user_id, **status}
+        payload.pop('connections')
+        for friend_id in targets:
+            socketio.emit('presence', payload, to=f"user_{friend_id}")
+
+
+presence = PresenceRegistry()
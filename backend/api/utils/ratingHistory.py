@@ -0,0 +1,135 @@
+# backend/api/utils/ratingHistory.py
+from . import db
+from .downsample import lttb
+from ..models.elo import EloEntry
+from ..models.ratings import DailyRating
+from ..models.users import User
+from sqlalchemy import delete, func, insert, select, update
+from datetime import datetime, time as dtime, timedelta
+
+# Up to this many raw entries in the requested range are read directly (and
+# downsampled); above it the chart is drawn from the daily rollups instead.
+RAW_POINT_LIMIT = 5000
+DEFAULT_POINTS = 500
+MAX_POINTS = 2000
+
+
+def _timestamp(dt):
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+def rating_history(user_id, start=None, end=None, max_points=DEFAULT_POINTS):
+    """Return (source, points) describing ``user_id``'s rating over [start, end).
+
+    ``end`` is exclusive on both paths; a daily point is included when its
+    day starts before ``end``.
+
+    ``source`` is 'raw' when the points come from elo_entries and 'daily' when
+    they come from the daily rollups. Either way at most ``max_points`` points
+    are returned, picked with LTTB so the shape of the curve is preserved.
+    Each point is a dict with ``t``, ``elo`` and, for daily points, the day's
+    ``min_elo``/``max_elo``.
+    """
+    in_range = EloEntry.user_id == user_id
+    if start is not None:
+        in_range &= EloEntry.created_at >= start
+    if end is not None:
+        in_range &= EloEntry.created_at < end
+
+    raw_count = db.session.scalar(select(func.count()).select_from(EloEntry).where(in_range))
+    if raw_count <= RAW_POINT_LIMIT:
+        rows = db.session.execute(
+            select(EloEntry.created_at, EloEntry.elo).where(in_range).order_by(EloEntry.created_at, EloEntry.id)
+        ).all()
+        series = [(_timestamp(at), elo, at, None, None) for at, elo in rows]
+        source = 'raw'
+    else:
+        day_range = DailyRating.user_id == user_id
+        if start is not None:
+            day_range &= DailyRating.day >= start.date()
+        if end is not None:
+            last_day = end.date() if end.time() == dtime.min else end.date() + timedelta(days=1)
+            day_range &= DailyRating.day < last_day
+        rows = db.session.execute(
+            select(DailyRating.day, DailyRating.close_elo, DailyRating.min_elo, DailyRating.max_elo)
+            .where(day_range).order_by(DailyRating.day)
+        ).all()
+        series = []
+        for day, close_elo, min_elo, max_elo in rows:
+            at = datetime.combine(day, dtime.min)
+            series.append((_timestamp(at), close_elo, at, min_elo, max_elo))
+        source = 'daily'
+
+    sampled = lttb(series, max_points)
+    return source, [
+        {'t': at, 'elo': elo, 'min_elo': min_elo, 'max_elo': max_elo}
+        for _, elo, at, min_elo, max_elo in sampled
+    ]
+
+
+def rebuild_daily_ratings(user_ids=None, batch_size=5000, progress=None):
+    """Recompute daily_ratings from elo_entries, for ``user_ids`` or everyone.
+
+    Entries are streamed in (user, time) order, so memory is bounded by one
+    batch of rollup rows. Returns the number of rollup rows written.
+    """
+    progress = progress or (lambda message: None)
+
+    clear = delete(DailyRating)
+    stmt = select(EloEntry.user_id, EloEntry.created_at, EloEntry.elo)
+    if user_ids is not None:
+        clear = clear.where(DailyRating.user_id.in_(user_ids))
+        stmt = stmt.where(EloEntry.user_id.in_(user_ids))
+    stmt = stmt.order_by(EloEntry.user_id, EloEntry.created_at, EloEntry.id).execution_options(yield_per=batch_size)
+
+    db.session.execute(clear)
+
+    written = 0
+    pending = []
+    current = None
+    for user_id, created_at, elo in db.session.execute(stmt):
+        if created_at is None:
+            continue
+        day = created_at.date()
+        if current is not None and current['user_id'] == user_id and current['day'] == day:
+            current['close_elo'] = elo
+            current['min_elo'] = min(current['min_elo'], elo)
+            current['max_elo'] = max(current['max_elo'], elo)
+            current['changes'] += 1
+            continue
+        if current is not None:
+            pending.append(current)
+        current = {'user_id': user_id, 'day': day, 'open_elo': elo, 'close_elo': elo,
+                   'min_elo': elo, 'max_elo': elo, 'changes': 1}
+        if len(pending) >= batch_size:
+            db.session.execute(insert(DailyRating), pending)
+            written += len(pending)
+            pending = []
+            progress(f'wrote {written} daily rows')
+
+    if current is not None:
+        pending.append(current)
+    if pending:
+        db.session.execute(insert(DailyRating), pending)
+        written += len(pending)
+
+    db.session.commit()
+    return written
+
+
+def sync_current_ratings(batch_size=1000, progress=None):
+    """Set users.elo to each user's newest Elo entry.
+
+    Users without any entry keep their current value. Returns (changed,
+    users).
+    """
+    progress = progress or (lambda message: None)
+    latest = EloEntry.get_latest_ratings()
+    current = dict(db.session.query(User.id, User.elo).all())
+    changed = [{'id': uid, 'elo': elo} for uid, elo in latest.items() if uid in current and current[uid] != elo]
+
+    for start in range(0, len(changed), batch_size):
+        db.session.execute(update(User), changed[start:start + batch_size])
+        db.session.commit()
+        progress(f'updated {min(start + batch_size, len(changed))}/{len(changed)} users')
+    return len(changed), len(current)
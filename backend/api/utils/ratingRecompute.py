@@ -0,0 +1,315 @@
+# backend/api/utils/ratingRecompute.py
+"""Offline replay of every finished game under a (possibly new) rating system.
+
+Games are grouped and each group is rated with whole-array operations:
+
+* ``period='game'`` reproduces the online behaviour exactly (each game rated
+  against the players' ratings after their previous game). Games are packed
+  into "waves" in which nobody plays twice; a player's games always land in
+  increasing waves, so rating one wave at a time is the same as replaying the
+  games one by one, but each wave is a single vectorised step.
+* ``period='hour'|'day'|'week'`` rates all games in a time period against the
+  ratings at the start of the period, the classic rating-period model Glicko
+  is defined on.
+
+NumPy is only needed here, so it is imported optionally and the server runs
+without it.
+"""
+from . import db
+from ..models.elo import EloEntry
+from ..models.games import Game
+from ..models.users import User
+from sqlalchemy import delete, insert, select, update
+from array import array
+from datetime import datetime, timedelta
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+PERIOD_SECONDS = {
+    'game': None,
+    'hour': 60 * 60,
+    'day': 24 * 60 * 60,
+    'week': 7 * 24 * 60 * 60,
+}
+
+
+def _rate_pairs(rating, idx, deltas):
+    """Add per-game ``deltas`` to ``rating`` at player indices ``idx`` (summing repeats)."""
+    players, inverse = np.unique(idx, return_inverse=True)
+    rating[players] = np.round(rating[players] + np.bincount(inverse, weights=deltas))
+
+
+class EloSystem:
+    """Elo with an optional higher K-factor for a player's first games."""
+
+    name = 'elo'
+
+    def __init__(self, k=32, provisional_k=None, provisional_games=0):
+        self.k = k
+        self.provisional_k = provisional_k
+        self.provisional_games = provisional_games
+
+    def start(self, initial):
+        self.rating = np.asarray(initial, dtype=np.float64).copy()
+        self.played = np.zeros(len(initial), dtype=np.int64)
+
+    def _k(self, idx):
+        k = np.full(len(idx), float(self.k))
+        if self.provisional_k is not None and self.provisional_games:
+            k[self.played[idx] < self.provisional_games] = self.provisional_k
+        return k
+
+    def rate(self, white, black, white_score, idle_periods=None):
+        rw = self.rating[white]
+        rb = self.rating[black]
+        # same expressions as eloChange so period='game' matches online play
+        expected_white = 1 / (1 + 10 ** ((rb - rw) / 400))
+        expected_black = 1 / (1 + 10 ** ((rw - rb) / 400))
+
+        idx = np.concatenate((white, black))
+        deltas = np.concatenate((
+            self._k(white) * (white_score - expected_white),
+            self._k(black) * ((1 - white_score) - expected_black),
+        ))
+        _rate_pairs(self.rating, idx, deltas)
+        np.add.at(self.played, idx, 1)
+        return self.rating[white], self.rating[black]
+
+    def ratings(self):
+        return self.rating
+
+
+class Glicko2System:
+    """Glicko-2 (Glickman, 2012). Ratings are reported on the Elo scale."""
+
+    name = 'glicko2'
+    SCALE = 173.7178
+    CENTER = 1500.0
+
+    def __init__(self, rd=350.0, volatility=0.06, tau=0.5, epsilon=1e-6):
+        self.rd = rd
+        self.volatility = volatility
+        self.tau = tau
+        self.epsilon = epsilon
+
+    def start(self, initial):
+        n = len(initial)
+        self.mu = (np.asarray(initial, dtype=np.float64) - self.CENTER) / self.SCALE
+        self.phi = np.full(n, self.rd / self.SCALE)
+        self.sigma = np.full(n, self.volatility)
+        self.last_period = np.full(n, -1, dtype=np.int64)
+
+    def _volatility(self, phi, sigma, v, delta):
+        tau2 = self.tau ** 2
+        a = np.log(sigma ** 2)
+        phi2 = phi ** 2
+        d2 = delta ** 2
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (d2 - phi2 - v - ex) / (2 * (phi2 + v + ex) ** 2) - (x - a) / tau2
+
+        A = a.copy()
+        B = np.where(d2 > phi2 + v, np.log(np.maximum(d2 - phi2 - v, 1e-300)), a - self.tau)
+        low = (d2 <= phi2 + v)
+        k = 1
+        while low.any():
+            fb = f(B)
+            low &= fb < 0
+            k += 1
+            B = np.where(low, a - k * self.tau, B)
+
+        fA, fB = f(A), f(B)
+        for _ in range(100):
+            active = np.abs(B - A) > self.epsilon
+            if not active.any():
+                break
+            C = A + (A - B) * fA / (fB - fA)
+            fC = f(C)
+            swap = fC * fB <= 0
+            A = np.where(active & swap, B, A)
+            fA = np.where(active & swap, fB, np.where(active, fA / 2, fA))
+            B = np.where(active, C, B)
+            fB = np.where(active, fC, fB)
+        return np.exp(A / 2)
+
+    def rate(self, white, black, white_score, idle_periods=None):
+        idx = np.concatenate((white, black))
+        opp = np.concatenate((black, white))
+        score = np.concatenate((white_score, 1 - white_score))
+        players, inverse = np.unique(idx, return_inverse=True)
+
+        phi = self.phi[players]
+        if idle_periods is not None:
+            # rating deviation grows by the volatility for every period sat out
+            idle = np.where(self.last_period[players] >= 0, idle_periods - self.last_period[players] - 1, 0)
+            phi = np.sqrt(phi ** 2 + np.maximum(idle, 0) * self.sigma[players] ** 2)
+            self.last_period[players] = idle_periods
+
+        # everyone in the period is rated against opponents' start-of-period values
+        g = 1 / np.sqrt(1 + 3 * self.phi[opp] ** 2 / math.pi ** 2)
+        expected = 1 / (1 + np.exp(-g * (self.mu[idx] - self.mu[opp])))
+        v = 1 / np.bincount(inverse, weights=g ** 2 * expected * (1 - expected))
+        improvement = np.bincount(inverse, weights=g * (score - expected))
+        delta = v * improvement
+
+        sigma = self._volatility(phi, self.sigma[players], v, delta)
+        phi_star = np.sqrt(phi ** 2 + sigma ** 2)
+        new_phi = 1 / np.sqrt(1 / phi_star ** 2 + 1 / v)
+
+        self.mu[players] = self.mu[players] + new_phi ** 2 * improvement
+        self.phi[players] = new_phi
+        self.sigma[players] = sigma
+
+        return self._to_elo(self.mu[white]), self._to_elo(self.mu[black])
+
+    def _to_elo(self, mu):
+        return np.round(mu * self.SCALE + self.CENTER)
+
+    def ratings(self):
+        return self._to_elo(self.mu)
+
+
+RATING_SYSTEMS = {
+    'elo': EloSystem,
+    'glicko2': Glicko2System,
+}
+
+
+class RatingRecompute:
+    """Replays finished games through ``system`` and rewrites elo_entries.
+
+    Call ``load()``, ``compute()`` and, unless it is a dry run, ``write()``.
+    Each step reports its throughput through ``progress``.
+    """
+
+    def __init__(self, system, period='game', default_elo=1200, batch_size=10000, progress=None):
+        if np is None:
+            raise RuntimeError('Recomputing ratings requires numpy (pip install numpy)')
+        if period not in PERIOD_SECONDS:
+            raise ValueError(f'Unknown rating period {period!r}')
+        self.system = system
+        self.period = period
+        self.default_elo = default_elo
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+
+    def _report(self, what, count, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.progress(f'{what} {count:,} games in {elapsed:.1f}s ({count / elapsed:,.0f} games/s)')
+
+    def load(self):
+        """Read every finished game (id, players, result, end time) into arrays."""
+        started = time.monotonic()
+        game_ids, whites, blacks = array('q'), array('q'), array('q')
+        scores, ended = array('d'), array('d')
+        epoch = datetime(1970, 1, 1)
+
+        stmt = select(
+            Game.id, Game.white_user_id, Game.black_user_id, Game.winner_id, Game.updated_at
+        ).where(Game.in_progress == False).order_by(Game.updated_at, Game.id)
+        for gid, white, black, winner, updated_at in db.session.execute(
+            stmt.execution_options(yield_per=self.batch_size)
+        ):
+            game_ids.append(gid)
+            whites.append(white)
+            blacks.append(black)
+            scores.append(0.5 if winner is None else (1.0 if winner == white else 0.0))
+            ended.append((updated_at - epoch).total_seconds() if updated_at else 0.0)
+
+        self.game_ids = np.frombuffer(game_ids, dtype=np.int64)
+        self.ended = np.frombuffer(ended, dtype=np.float64)
+        self.scores = np.frombuffer(scores, dtype=np.float64)
+        players = np.concatenate((np.frombuffer(whites, dtype=np.int64), np.frombuffer(blacks, dtype=np.int64)))
+        self.user_ids, dense = np.unique(players, return_inverse=True)
+        self.white, self.black = dense[:len(game_ids)], dense[len(game_ids):]
+
+        # everyone starts from their signup / import rating (the earliest
+        # entry not tied to a game; later rows overwrite earlier ones here)
+        initial = {uid: elo for uid, elo in db.session.query(EloEntry.user_id, EloEntry.elo).filter(
+            EloEntry.game_id == None
+        ).order_by(EloEntry.created_at.desc(), EloEntry.id.desc())}
+        self.initial = np.array([initial.get(int(uid), self.default_elo) for uid in self.user_ids], dtype=np.float64)
+
+        self._report('loaded', len(self.game_ids), started)
+
+    def _groups(self):
+        """Yield (index array, period number) for each group, in rating order."""
+        n = len(self.game_ids)
+        if self.period == 'game':
+            # wave of a game = one past the latest wave either player was in
+            last = [0] * len(self.user_ids)
+            waves = array('q')
+            for w, b in zip(self.white.tolist(), self.black.tolist()):
+                wave = max(last[w], last[b]) + 1
+                last[w] = last[b] = wave
+                waves.append(wave)
+            waves = np.frombuffer(waves, dtype=np.int64)
+            order = np.argsort(waves, kind='stable')
+            keys = waves[order]
+        else:
+            order = np.arange(n)
+            keys = (self.ended // PERIOD_SECONDS[self.period]).astype(np.int64)
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        for group, group_keys in zip(np.split(order, bounds), np.split(keys, bounds)):
+            if len(group):
+                yield group, None if self.period == 'game' else int(group_keys[0])
+
+    def compute(self):
+        """Rate every game; fills ``white_after``/``black_after`` per game."""
+        started = time.monotonic()
+        self.system.start(self.initial)
+        self.white_after = np.zeros(len(self.game_ids))
+        self.black_after = np.zeros(len(self.game_ids))
+
+        groups = 0
+        for group, period in self._groups():
+            w_after, b_after = self.system.rate(self.white[group], self.black[group], self.scores[group], period)
+            self.white_after[group] = w_after
+            self.black_after[group] = b_after
+            groups += 1
+
+        self.final = dict(zip(self.user_ids.tolist(), self.system.ratings().astype(np.int64).tolist()))
+
+        self._report(f'rated ({groups:,} groups)', len(self.game_ids), started)
+
+    def write(self):
+        """Replace per-game elo_entries and users.elo in one transaction.
+
+        Game summaries are cleared as well; rebuild them with ``rebuild_summaries``.
+        """
+        started = time.monotonic()
+        epoch = datetime(1970, 1, 1)
+        n = len(self.game_ids)
+        game_ids = self.game_ids.tolist()
+        ended = self.ended.tolist()
+        white_ids = self.user_ids[self.white].tolist()
+        black_ids = self.user_ids[self.black].tolist()
+        white_after = self.white_after.astype(np.int64).tolist()
+        black_after = self.black_after.astype(np.int64).tolist()
+        try:
+            db.session.execute(delete(EloEntry).where(EloEntry.game_id != None))
+            # history summaries carry the per-game ratings; rebuilt by the caller
+            db.session.execute(update(Game).where(Game.in_progress == False).values(summary=None, summary_at=None))
+            for start in range(0, n, self.batch_size):
+                rows = []
+                for i in range(start, min(start + self.batch_size, n)):
+                    at = epoch + timedelta(seconds=ended[i])
+                    rows.append({'user_id': white_ids[i], 'game_id': game_ids[i], 'elo': white_after[i], 'created_at': at})
+                    rows.append({'user_id': black_ids[i], 'game_id': game_ids[i], 'elo': black_after[i], 'created_at': at})
+                db.session.execute(insert(EloEntry), rows)
+                self.progress(f'wrote {min(start + self.batch_size, n):,} games')
+
+            final = [{'id': uid, 'elo': elo} for uid, elo in self.final.items()]
+            for start in range(0, len(final), self.batch_size):
+                db.session.execute(update(User), final[start:start + self.batch_size])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._report('wrote', len(self.game_ids), started)
@@ -0,0 +1,43 @@
+# backend/api/utils/timeControls.py
+from collections import namedtuple
+
+TimeControl = namedtuple('TimeControl', ['key', 'category', 'initial_seconds', 'increment_seconds'])
+
+# key -> time control; keys use the usual "minutes+increment" notation
+TIME_CONTROLS = {tc.key: tc for tc in (
+    TimeControl('1+0', 'bullet', 60, 0),
+    TimeControl('2+1', 'bullet', 120, 1),
+    TimeControl('3+0', 'blitz', 180, 0),
+    TimeControl('3+2', 'blitz', 180, 2),
+    TimeControl('5+0', 'blitz', 300, 0),
+    TimeControl('10+0', 'rapid', 600, 0),
+    TimeControl('15+10', 'rapid', 900, 10),
+)}
+
+# the clock every game used before time controls existed
+DEFAULT_TIME_CONTROL = '10+0'
+
+# How often each category's matchmaking pool is paired. Fast games get
+# frequent passes so their players are matched within a fraction of a second.
+PAIRING_TICK_SECONDS = {
+    'bullet': 0.1,
+    'blitz': 0.25,
+    'rapid': 0.5,
+}
+
+
+def game_clock_kwargs(key):
+    """Game column values that set up the clocks for time control ``key``."""
+    tc = TIME_CONTROLS[key]
+    return {
+        'time_control': tc.key,
+        'white_time_left': tc.initial_seconds,
+        'black_time_left': tc.initial_seconds,
+        'increment_seconds': tc.increment_seconds,
+    }
+
+
+def pgn_time_control(key):
+    """PGN TimeControl tag value ("seconds+increment") for ``key``."""
+    tc = TIME_CONTROLS.get(key or DEFAULT_TIME_CONTROL)
+    return f"{tc.initial_seconds}+{tc.increment_seconds}" if tc else None
@@ -0,0 +1,146 @@
+# backend/api/utils/userSearch.py
+from . import db
+from .pagination import after
+from ..models.users import User
+from sqlalchemy import func, select
+from collections import OrderedDict
+import threading
+import time
+
+# Matches counted per search; X-Total-Count reports at most this (or the end
+# of the requested page, when that is further).
+COUNT_CAP = 1000
+# Rows kept per cached prefix; pages inside them are served from memory.
+CACHED_ROWS = 50
+CACHE_SIZE = 10000
+# New users and rating changes show up in cached results within this time.
+CACHE_TTL_SECONDS = 30
+
+
+def normalize(query):
+    return query.strip().lower()
+
+
+def _prefix_end(prefix):
+    """Smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class _Entry:
+    __slots__ = ('rows', 'total', 'expires')
+
+    def __init__(self, rows, total, expires):
+        self.rows = rows
+        self.total = total
+        self.expires = expires
+
+    @property
+    def complete(self):
+        """True when ``rows`` holds every match of the prefix."""
+        return self.total is not None and self.total == len(self.rows)
+
+
+class UserSearch:
+    """Case-insensitive username prefix search with an LRU of hot prefixes.
+
+    Matches are read as one range of the ``username_lower`` index
+    (``prefix <= username_lower < next prefix``), in name order, so an exact
+    match always comes first; the capped match count and the ratings come
+    back in the same query. The first CACHED_ROWS matches of recently typed
+    prefixes are kept in memory. A prefix whose shorter prefix is cached with
+    all of its matches is answered by filtering that entry, so typing on
+    past a rare prefix never touches the database.
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE, ttl_seconds=CACHE_TTL_SECONDS):
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, query, limit, offset=0, after_key=None):
+        """Return (rows, total) for a page of matches of ``query``.
+
+        Rows are (id, username, elo, username_lower) tuples. The page starts
+        at ``offset``, or right after sort key ``after_key`` (username_lower,
+        id) for cursor pagination. ``total`` is the number of matches, capped
+        at COUNT_CAP or the end of the page; it is None for cursor pages and
+        for a page past the last match.
+        """
+        prefix = normalize(query)
+        if after_key is None and offset + limit <= CACHED_ROWS:
+            entry = self._cached(prefix)
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                rows, total = self._query(prefix, CACHED_ROWS, 0)
+                entry = self._store(prefix, rows, total)
+            else:
+                with self._lock:
+                    self.hits += 1
+            page = entry.rows[offset:offset + limit]
+            return page, entry.total if page or offset == 0 else None
+        rows, total = self._query(prefix, limit, offset, after_key)
+        return rows, None if after_key is not None else total
+
+    def _query(self, prefix, limit, offset, after_key=None):
+        window = max(COUNT_CAP, offset + limit)
+        in_range = (User.username_lower >= prefix) & (User.username_lower < _prefix_end(prefix))
+        if after_key is not None:
+            in_range &= after((User.username_lower, User.id), after_key)
+        matches = select(User.id, User.username, User.elo, User.username_lower).where(
+            in_range
+        ).order_by(User.username_lower, User.id).limit(window).subquery()
+        stmt = select(
+            matches.c.id, matches.c.username, matches.c.elo, matches.c.username_lower, func.count().over()
+        ).order_by(matches.c.username_lower, matches.c.id).offset(offset).limit(limit)
+        result = db.session.execute(stmt).all()
+        if result:
+            total = result[0][4]
+        else:
+            total = 0 if offset == 0 else None
+        return [tuple(row[:4]) for row in result], total
+
+    def _cached(self, prefix):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(prefix)
+            if entry is not None and entry.expires > now:
+                self._cache.move_to_end(prefix)
+                return entry
+            for end in range(len(prefix) - 1, 0, -1):
+                shorter = self._cache.get(prefix[:end])
+                if shorter is not None and shorter.expires > now and shorter.complete:
+                    rows = [row for row in shorter.rows if row[3].startswith(prefix)]
+                    entry = _Entry(rows, len(rows), shorter.expires)
+                    self._insert_locked(prefix, entry)
+                    return entry
+        return None
+
+    def _store(self, prefix, rows, total):
+        entry = _Entry(rows, total, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._insert_locked(prefix, entry)
+        return entry
+
+    def _insert_locked(self, prefix, entry):
+        self._cache[prefix] = entry
+        self._cache.move_to_end(prefix)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, username):
+        """Drop cached prefixes of ``username`` (after it was created, renamed or deleted)."""
+        name = normalize(username)
+        with self._lock:
+            for end in range(1, len(name) + 1):
+                self._cache.pop(name[:end], None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+user_search = UserSearch()
@@ -0,0 +1,112 @@
+# backend/api/utils/userStats.py
+from . import db
+from ..models.elo import EloEntry
+from ..models.games import Game
+from ..models.stats import HeadToHead, UserStats
+from sqlalchemy import and_, delete, func, insert, or_, select, union
+
+
+def rebuild_user_stats(user_ids=None, batch_size=5000, progress=None):
+    """Recompute user_stats from finished games, for ``user_ids`` or everyone.
+
+    Games are replayed in the order they ended, so streaks come out the same
+    as if finalize_game had counted them live. Returns the number of users
+    written.
+    """
+    progress = progress or (lambda message: None)
+
+    ended_at = func.coalesce(Game.updated_at, Game.created_at)
+    clear = delete(UserStats)
+    stmt = select(Game.white_user_id, Game.black_user_id, Game.winner_id, ended_at).where(Game.in_progress == False)
+    if user_ids is not None:
+        user_ids = set(user_ids)
+        clear = clear.where(UserStats.user_id.in_(user_ids))
+        stmt = stmt.where(or_(Game.white_user_id.in_(user_ids), Game.black_user_id.in_(user_ids)))
+    stmt = stmt.order_by(ended_at, Game.id).execution_options(yield_per=batch_size)
+
+    rows = {}
+    seen = 0
+    for white_id, black_id, winner_id, at in db.session.execute(stmt):
+        for user_id, color in ((white_id, 'white'), (black_id, 'black')):
+            if user_ids is not None and user_id not in user_ids:
+                continue
+            row = rows.get(user_id)
+            if row is None:
+                row = rows[user_id] = UserStats.blank(user_id)
+            row.count(color, UserStats.outcome_for(user_id, winner_id), at)
+        seen += 1
+        if seen % batch_size == 0:
+            progress(f'counted {seen} games')
+
+    return _replace(UserStats, clear, rows.values(), batch_size, progress, 'users')
+
+
+def rebuild_head_to_head(user_ids=None, batch_size=5000, progress=None):
+    """Recompute head_to_head from finished games, for pairs involving ``user_ids`` or all.
+
+    A game's rating changes are the difference between each player's Elo
+    entry for it and their previous entry. Returns the number of pairs
+    written.
+    """
+    progress = progress or (lambda message: None)
+
+    changes = select(
+        EloEntry.user_id, EloEntry.game_id,
+        (EloEntry.elo - func.lag(EloEntry.elo).over(
+            partition_by=EloEntry.user_id, order_by=(EloEntry.created_at, EloEntry.id)
+        )).label('change')
+    )
+    if user_ids is not None:
+        user_ids = set(user_ids)
+        # lag() is partitioned by user, so reading only the players of the
+        # affected pairs (``user_ids`` and their opponents) gives the same
+        # changes while keeping the window off the rest of elo_entries
+        opponents = union(
+            select(Game.white_user_id).where(Game.black_user_id.in_(user_ids)),
+            select(Game.black_user_id).where(Game.white_user_id.in_(user_ids)),
+        )
+        changes = changes.where(or_(EloEntry.user_id.in_(user_ids), EloEntry.user_id.in_(opponents)))
+    changes = changes.subquery()
+    white = changes.alias('white_change')
+    black = changes.alias('black_change')
+
+    ended_at = func.coalesce(Game.updated_at, Game.created_at)
+    clear = delete(HeadToHead)
+    stmt = select(
+        Game.white_user_id, Game.black_user_id, Game.winner_id,
+        func.coalesce(white.c.change, 0), func.coalesce(black.c.change, 0), ended_at
+    ).outerjoin(
+        white, and_(white.c.game_id == Game.id, white.c.user_id == Game.white_user_id)
+    ).outerjoin(
+        black, and_(black.c.game_id == Game.id, black.c.user_id == Game.black_user_id)
+    ).where(Game.in_progress == False)
+    if user_ids is not None:
+        clear = clear.where(or_(HeadToHead.low_user_id.in_(user_ids), HeadToHead.high_user_id.in_(user_ids)))
+        stmt = stmt.where(or_(Game.white_user_id.in_(user_ids), Game.black_user_id.in_(user_ids)))
+    stmt = stmt.order_by(ended_at, Game.id).execution_options(yield_per=batch_size)
+
+    rows = {}
+    seen = 0
+    for white_id, black_id, winner_id, white_change, black_change, at in db.session.execute(stmt):
+        key = (min(white_id, black_id), max(white_id, black_id))
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = HeadToHead.blank(*key)
+        row.count(white_id, winner_id, white_change, black_change, at)
+        seen += 1
+        if seen % batch_size == 0:
+            progress(f'counted {seen} games')
+
+    return _replace(HeadToHead, clear, rows.values(), batch_size, progress, 'pairs')
+
+
+def _replace(model, clear, rows, batch_size, progress, noun):
+    """Run ``clear`` and insert ``rows`` (unsaved ``model`` objects) in its place."""
+    columns = [column.key for column in model.__table__.columns]
+    pending = [{key: getattr(row, key) for key in columns} for row in rows]
+    db.session.execute(clear)
+    for start in range(0, len(pending), batch_size):
+        db.session.execute(insert(model), pending[start:start + batch_size])
+        progress(f'wrote {min(start + batch_size, len(pending))}/{len(pending)} {noun}')
+    db.session.commit()
+    return len(pending)
@@ -1,5 +1,5 @@
 import os
-from api import create_app
+from api import create_app, start_background_tasks
 from api.utils import socketio
 
 try:
@@ -20,4 +20,12 @@ if __name__ == '__main__':
     port = int(_decouple_config('PORT', 5000, cast=int))
     debug = str(_decouple_config('DEBUG', 'True')).lower() in ('1', 'true', 'yes')
     host = _decouple_config('HOST', '0.0.0.0')
-    socketio.run(app, host=host, port=port, debug=debug)
\ No newline at end of file
+    # with the reloader on, the parent process only watches files; the
+    # child it spawns (WERKZEUG_RUN_MAIN set) serves and runs the loops
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks(app)
+    socketio.run(app, host=host, port=port, debug=debug)
+else:
+    # imported by a WSGI server, e.g. `gunicorn -k eventlet runserver:app`;
+    # start_background_tasks itself skips `flask` CLI commands
+    start_background_tasks(app)
\ No newline at end of file
@@ -2,12 +2,13 @@ import React from 'react';
 import Button from './Button';
 import { Link } from 'react-router-dom';
 
-export default function UserListItem({ user, showElo = false, actions = [] }) {
+export default function UserListItem({ user, showElo = false, status = null, actions = [] }) {
   return (
     <li style={{ marginBottom: '10px', padding: '10px', border: '1px solid #eee', borderRadius: '5px', display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
       <div>
         <strong style={{ display: 'block' }}><Link to={`/profile/${user.id}`}>{user.username}</Link></strong>
         {showElo && <div style={{ color: '#666' }}>Elo: {user.elo}</div>}
+        {status && <div style={{ color: '#666', fontSize: '0.9em' }}>{status}</div>}
       </div>
 
       <div style={{ display: 'flex', gap: '8px', alignItems: 'center' }}>
@@ -6,20 +6,25 @@ export default function usePaginatedFetch(endpoint, { pageSize = 20, params = {}
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [offset, setOffset] = useState(0);
+  // opaque keyset cursor from X-Next-Cursor; pages after the first use it instead of offset
+  const [cursor, setCursor] = useState(null);
   const [hasMore, setHasMore] = useState(true);
   // stringify params to produce a stable dependency key
   const paramsKey = JSON.stringify(params || {});
 
-  const loadPage = useCallback(async (newOffset = 0, replace = false) => {
+  const loadPage = useCallback(async (newOffset = 0, replace = false, pageCursor = null) => {
     setLoading(true);
     setError(null);
     try {
       // use the current params value from closure; loadPage is recreated when paramsKey changes
-      const res = await api.get(endpoint, { params: { ...(params || {}), limit: pageSize, offset: newOffset } });
+      const pageParams = pageCursor ? { cursor: pageCursor } : (newOffset ? { offset: newOffset } : {});
+      const res = await api.get(endpoint, { params: { ...(params || {}), limit: pageSize, ...pageParams } });
       const data = res.data || [];
+      const nextCursor = res.headers?.['x-next-cursor'] || null;
       setItems((prev) => (replace ? data : [...prev, ...data]));
       setHasMore(data.length === pageSize);
       setOffset(newOffset + data.length);
+      setCursor(nextCursor);
     } catch (err) {
       setError(err.response?.data?.message || 'Failed to load');
     } finally {
@@ -31,18 +36,20 @@ export default function usePaginatedFetch(endpoint, { pageSize = 20, params = {}
     // reset when endpoint or params change
     setItems([]);
     setOffset(0);
+    setCursor(null);
     setHasMore(true);
     loadPage(0, true);
   }, [endpoint, paramsKey, loadPage]);
 
   const loadMore = useCallback(() => {
     if (loading || !hasMore) return;
-    loadPage(offset, false);
-  }, [loading, hasMore, loadPage, offset]);
+    loadPage(offset, false, cursor);
+  }, [loading, hasMore, loadPage, offset, cursor]);
 
   const refresh = useCallback(() => {
     setItems([]);
     setOffset(0);
+    setCursor(null);
     setHasMore(true);
     loadPage(0, true);
   }, [loadPage]);
@@ -20,6 +20,8 @@ export default function FriendsList() {
     const { items: friends, loading, error, hasMore, loadMore, refresh } = usePaginatedFetch(`/users/users/${myUserId}/friends`, { pageSize: 20, params: {} });
     const [statusMessage, setStatusMessage] = useState('');
     const [waitingChallenge, setWaitingChallenge] = useState(false);
+    // presence pushed by the server after the list was loaded, by user id
+    const [presence, setPresence] = useState({});
 
 
     const sendChallenge = async (friendId) => {
@@ -84,11 +86,21 @@ export default function FriendsList() {
     // socket will join user room on connect; no need to emit register_user manually
 
     useEffect(() => {
-
         // challenge socket listeners handled by useChallenges hook
-        return () => {};
+        const onPresence = (data) => setPresence((prev) => ({ ...prev, [data.user_id]: data }));
+        socket.on('presence', onPresence);
+        return () => {
+            socket.off('presence', onPresence);
+        };
     },[]);
 
+    const presenceLabel = (friend) => {
+        const p = { ...friend, ...presence[friend.id] };
+        if (p.in_game) return '🟠 Playing';
+        if (p.online) return '🟢 Online';
+        return p.last_seen ? `⚪ Last seen ${new Date(p.last_seen + 'Z').toLocaleString()}` : '⚪ Offline';
+    };
+
     return (
         <div style={{ padding: '20px', maxWidth: '600px', margin: '0 auto' }}>
             <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
@@ -118,6 +130,7 @@ export default function FriendsList() {
                         key={friend.id}
                         user={friend}
                         showElo
+                        status={presenceLabel(friend)}
                         actions={[
                             { label: 'Challenge', variant: 'plain', onClick: () => sendChallenge(friend.id) },
                             { label: '🗑️', variant: 'plain', onClick: () => removeFriend(friend.friendshipId) }
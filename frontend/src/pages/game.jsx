@@ -124,19 +124,6 @@ export default function Game() {
     return () => clearInterval(timer);
   }, [chessPosition]); // Reset interval when position changes
 
-  useEffect(() => {
-    const checkTimeout = async () => {
-      if (whiteTime <= 0 || blackTime <= 0) {
-        try {
-          await api.post(`/games/games/${gameId}/claim-timeout`);
-        } catch (err) {
-          console.log("Timeout claim failed or already processed");
-        }
-      }
-    };
-    checkTimeout();
-  }, [whiteTime, blackTime, gameId]);
-
   // Format seconds to MM:SS
   const formatTime = (seconds) => {
     const mins = Math.floor(seconds / 60);
@@ -147,8 +134,11 @@ export default function Game() {
   // 3. SEND MOVE TO BACKEND
   const submitMove = async (moveUCI) => {
     try {
-      // We use the 'put' route you created: /games/<game_id>/<move>
-      await api.put(`/games/games/${gameId}/${moveUCI}`);
+      // Moves go over the already-authenticated socket; the server acks with the new state
+      const ack = await new Promise((resolve) => {
+        socket.emit("make_move", { gameId, move: moveUCI }, resolve);
+      });
+      if (!ack?.ok) throw new Error(ack?.message || "Move rejected");
     } catch (error) {
       console.error("Move rejected by server:", error);
       // Revert board if server rejects it
@@ -38,6 +38,32 @@ export default function WaitingRoom() {
     };
   },[navigate]);
 
+  useEffect(() => {
+    // queue position and estimated wait are pushed while we wait; no polling
+    const showStatus = (data) => {
+      if (data?.game_id) {
+        handleStart(data);
+      } else if (data?.queued) {
+        const eta = data.estimated_wait_seconds;
+        // a fresh join has no position until the next push
+        setMessage(`Waiting for an opponent (${data.time_control})... ` +
+          (data.position != null ? `#${data.position} of ${data.waiting}` : '') +
+          (eta != null ? `, about ${Math.ceil(eta)}s` : ''));
+      }
+    };
+    // after (re)connecting, ask for the current status in case start_game was missed
+    const requestStatus = () => socket.emit("queue_status", {}, showStatus);
+
+    socket.on("queue_status", showStatus);
+    socket.on("connect", requestStatus);
+    requestStatus();
+
+    return () => {
+      socket.off("queue_status", showStatus);
+      socket.off("connect", requestStatus);
+    };
+  }, [handleStart]);
+
   useEffect(() => {
     // socket will join user room on connect; no need to emit register_user manually
     if (myUserId && socket && socket.connect) {